@@ -106,6 +106,11 @@ with MicrophoneStream(rate, chunk) as stream:
             print(response)
 
     except KeyboardInterrupt:
-        # Ends the websocket connection.
-        streamclient.client.send("EOS")
-        pass
+        # Sends the audio already captured followed by EOS, and waits up to 5 seconds
+        # for the last hypotheses before closing the websocket connection.
+        report = streamclient.finish(timeout=5)
+        for response in report.responses:
+            print(response)
+        if not report.closed:
+            print('Seconds of audio without a final hypothesis: {}'.format(
+                report.unfinalized_seconds))
@@ -55,6 +55,7 @@ setup(
     py_modules=[os.path.splitext(os.path.basename(path))[0] for path in glob('src/*.py')],
     include_package_data=True,
     install_requires=requirements,
+    extras_require={'numpy': ['numpy>=1.17']},
     zip_safe=False,
     license='MIT license',
     keywords='rev_ai',
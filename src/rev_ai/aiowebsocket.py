@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""Minimal asyncio websocket client used by the asynchronous streaming client"""
+
+import asyncio
+import base64
+import hashlib
+import os
+import ssl
+import struct
+
+from . import framing
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+
+class WebSocketHandshakeError(Exception):
+    """Raised when the server refuses to upgrade the connection to a websocket"""
+
+    def __init__(self, status, headers, body=b''):
+        """
+        :param status: HTTP status code returned by the server
+        :param headers: response headers
+        :param body: response body, if any
+        """
+        Exception.__init__(self, 'Handshake status {}; Server Response : {}'.format(
+            status, body.decode('utf-8', 'replace')))
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class AsyncWebSocket:
+    """Client side of a websocket connection running on an asyncio event loop"""
+
+    def __init__(self, reader, writer):
+        """Constructor. Use AsyncWebSocket.connect to open a connection.
+
+        :param reader: asyncio.StreamReader of the connection
+        :param writer: asyncio.StreamWriter of the connection
+        """
+        self.reader = reader
+        self.writer = writer
+        self.closed = False
+        self.write_lock = asyncio.Lock()
+
+    @classmethod
+    async def connect(cls, url, ssl_context=None, timeout=None):
+        """Opens a websocket connection
+
+        :param url: ws:// or wss:// url to connect to
+        :param ssl_context: optional ssl.SSLContext used for wss:// urls
+        :param timeout: optional seconds to wait for the handshake
+        :raises: WebSocketHandshakeError, OSError, asyncio.TimeoutError
+        """
+        return await asyncio.wait_for(cls._connect(url, ssl_context), timeout)
+
+    @classmethod
+    async def _connect(cls, url, ssl_context):
+        parsed = urlparse(url)
+        secure = parsed.scheme == 'wss'
+        if parsed.scheme not in ('ws', 'wss'):
+            raise ValueError('url must use the ws or wss scheme')
+        port = parsed.port or (443 if secure else 80)
+        if secure and ssl_context is None:
+            ssl_context = ssl.create_default_context()
+        reader, writer = await asyncio.open_connection(
+            parsed.hostname, port, ssl=ssl_context if secure else None)
+
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        path = (parsed.path or '/') + ('?' + parsed.query if parsed.query else '')
+        host = parsed.hostname if parsed.port is None else '{}:{}'.format(parsed.hostname, port)
+        writer.write((
+            'GET {} HTTP/1.1\r\n'
+            'Host: {}\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            'Sec-WebSocket-Key: {}\r\n'
+            'Sec-WebSocket-Version: 13\r\n\r\n').format(path, host, key).encode('utf-8'))
+        await writer.drain()
+
+        try:
+            status, headers = await _read_response_head(reader)
+            if status != 101:
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+                raise WebSocketHandshakeError(status, headers, body)
+            expected = base64.b64encode(hashlib.sha1(
+                (key + framing.HANDSHAKE_GUID).encode('ascii')).digest()).decode('ascii')
+            if headers.get('sec-websocket-accept') != expected:
+                raise WebSocketHandshakeError(status, headers, b'invalid Sec-WebSocket-Accept')
+        except BaseException:
+            writer.close()
+            raise
+        return cls(reader, writer)
+
+    async def send_binary(self, data):
+        """Sends binary data in a single frame"""
+        await self.send_frame(framing.OPCODE_BINARY, data)
+
+    async def send(self, text):
+        """Sends text in a single frame"""
+        await self.send_frame(framing.OPCODE_TEXT, text)
+
+    async def send_frame(self, opcode, payload):
+        """Sends a masked frame and waits until the transport buffer has drained"""
+        frame = framing.encode_frame(opcode, payload)
+        async with self.write_lock:
+            self.writer.write(frame)
+            await self.writer.drain()
+
+    async def recv_data(self):
+        """Receives the next message.
+
+        Fragmented messages are reassembled and pings are answered. Close frames are
+        returned to the caller, which should stop reading afterwards.
+
+        :returns: tuple of the opcode and the payload bytes of the message
+        """
+        message_opcode = None
+        fragments = []
+        while True:
+            fin, opcode, data = await self._recv_frame()
+            if opcode == framing.OPCODE_PING:
+                await self.send_frame(framing.OPCODE_PONG, data)
+                continue
+            if opcode == framing.OPCODE_PONG:
+                continue
+            if opcode == framing.OPCODE_CLOSE:
+                self.closed = True
+                return opcode, data
+            if opcode != framing.OPCODE_CONTINUATION:
+                message_opcode = opcode
+            fragments.append(data)
+            if fin:
+                return message_opcode, b''.join(fragments)
+
+    async def _recv_frame(self):
+        fin, opcode, masked, length = framing.parse_header(await self.reader.readexactly(2))
+        if length == 126:
+            length = struct.unpack('!H', await self.reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', await self.reader.readexactly(8))[0]
+        mask_key = await self.reader.readexactly(4) if masked else None
+        data = await self.reader.readexactly(length) if length else b''
+        if mask_key is not None:
+            data = framing.mask_payload(mask_key, data)
+        return fin, opcode, data
+
+    async def close(self, code=1000, reason=''):
+        """Sends a close frame and closes the connection"""
+        if not self.closed:
+            self.closed = True
+            try:
+                await self.send_frame(framing.OPCODE_CLOSE,
+                                      framing.encode_close_payload(code, reason))
+            except (ConnectionError, RuntimeError):
+                pass
+        self.abort()
+
+    def abort(self):
+        """Closes the connection immediately"""
+        self.closed = True
+        self.writer.close()
+
+
+async def _read_response_head(reader):
+    status_line = (await reader.readline()).decode('latin-1').strip()
+    parts = status_line.split(' ', 2)
+    if len(parts) < 2 or not parts[1].isdigit():
+        raise WebSocketHandshakeError(0, {}, status_line.encode('utf-8'))
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1')
+        if line in ('\r\n', '\n', ''):
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return int(parts[1]), headers
@@ -7,8 +7,11 @@ from . import utils
 from .baseclient import BaseClient
 from .models import Account, CaptionType, Job, Transcript
 from .models.asynchronous.summarization_options import SummarizationOptions
+from .models.asynchronous.silence_trim_options import SilenceTrimOptions
 from .models.asynchronous.summary import Summary
 from .models.asynchronous.translation_options import TranslationOptions
+from .multipart import MultipartMediaBody
+from .silence_trimming import trim_silence
 
 try:
     from urllib.parse import urljoin
@@ -190,7 +193,8 @@ class RevAiAPIClient(BaseClient):
             speakers_count=None,
             diarization_type=None,
             summarization_config: SummarizationOptions = None,
-            translation_config: TranslationOptions = None):
+            translation_config: TranslationOptions = None,
+            silence_trim_config: SilenceTrimOptions = None):
         """Submit a local file for transcription.
         Note that the content type is inferred if not provided.
 
@@ -240,6 +244,9 @@ class RevAiAPIClient(BaseClient):
         :param diarization_type: Use to specify diarization type.
         :param summarization_config: Use to request transcript summary.
         :param translation_config: Use to request transcript translation.
+        :param silence_trim_config: Use to remove long silences from a PCM WAV file before it
+            is uploaded. The returned job then has an offset_map which should be passed to
+            get_transcript_object to get timestamps on the timeline of the original file.
         :returns: raw response data
         :raises: HTTPError, ValueError
         """
@@ -273,9 +280,13 @@ class RevAiAPIClient(BaseClient):
                                                    summarization_config=summarization_config,
                                                    translation_config=translation_config)
 
+        offset_map = None
         with open(filename, 'rb') as f:
+            media = f
+            if silence_trim_config:
+                media, offset_map = trim_silence(f, silence_trim_config)
             files = {
-                'media': (filename, f),
+                'media': (filename, media),
                 'options': (None, json.dumps(payload, sort_keys=True))
             }
 
@@ -285,6 +296,139 @@ class RevAiAPIClient(BaseClient):
                 files=files
             )
 
+        job = Job.from_json(response.json())
+        job.offset_map = offset_map
+        return job
+
+    def submit_job_media(
+            self,
+            media,
+            filename=None,
+            content_length=None,
+            metadata=None,
+            callback_url=None,
+            skip_diarization=False,
+            skip_punctuation=False,
+            speaker_channels_count=None,
+            custom_vocabularies=None,
+            filter_profanity=False,
+            remove_disfluencies=False,
+            delete_after_seconds=None,
+            language=None,
+            custom_vocabulary_id=None,
+            transcriber=None,
+            verbatim=None,
+            rush=None,
+            test_mode=None,
+            segments_to_transcribe=None,
+            speaker_names=None,
+            notification_config=None,
+            skip_postprocessing=False,
+            remove_atmospherics=False,
+            speakers_count=None,
+            diarization_type=None,
+            summarization_config: SummarizationOptions = None,
+            translation_config: TranslationOptions = None):
+        """Submit media from an in-memory buffer, a file-like object or an iterable of
+        chunks for transcription. The media is streamed to Rev AI without being written to
+        disk or read into memory as a whole. When the length of the media cannot be determined
+        the upload uses chunked transfer encoding.
+
+        :param media: bytes, bytearray, memoryview, mmap or any other object supporting the
+            buffer protocol, a readable file-like object, or an iterable yielding bytes
+        :param filename: optional name of the media, inferred from file-like objects
+        :param content_length: optional length of the media in bytes, used to send a
+            Content-Length for iterables
+        :param metadata: info to associate with the transcription job
+        :param callback_url: callback url to invoke on job completion as a webhook
+        .. deprecated:: 2.16.0
+                Use notification_config instead
+        :param skip_diarization: should Rev AI skip diarization when transcribing this file
+        :param skip_punctuation: should Rev AI skip punctuation when transcribing this file
+        :param speaker_channels_count: the number of speaker channels in the
+            audio. If provided the given audio will have each channel
+            transcribed separately and each channel will be treated as a single
+            speaker. Valid values are integers 1-8 inclusive.
+        :param custom_vocabularies: a collection of phrase dictionaries.
+            Including custom vocabulary will inform and bias the speech
+            recognition to find those phrases. Each dictionary has the key
+            "phrases" which maps to a list of strings, each of which represents
+            a phrase you would like the speech recognition to bias itself toward.
+            Cannot be used with the custom_vocabulary_id parameter
+        :param filter_profanity: whether to mask profane words
+        :param remove_disfluencies: whether to exclude filler words like "uh"
+        :param delete_after_seconds: number of seconds after job completion when job is auto-deleted
+        :param language: specify language using the one of the supported ISO 639-1 (2-letter) or
+            ISO 639-3 (3-letter) language codes as defined in the API Reference
+        :param custom_vocabulary_id: The id of a pre-completed custom vocabulary
+            submitted through the custom vocabularies api. Cannot be used with the
+            custom_vocabularies parameter.
+        :param transcriber: type of transcriber to use to transcribe the media file
+        :param verbatim: Only available with "human" transcriber.
+            Whether human transcriber transcribes every syllable.
+        :param rush: Only available with "human" transcriber.
+            Whether job is given higher priority to be worked on sooner for higher pricing.
+        :param test_mode: Only available with "human" transcriber.
+            Whether human transcription job is mocked and no transcription actually happens.
+        :param segments_to_transcribe: Only available with "human" transcriber.
+            Sections of transcript needed to be transcribed.
+        :param speaker_names: Only available with "human" transcriber.
+            Human readable names of speakers in the file.
+        :param notification_config: CustomerUrlData object containing the callback url to
+            invoke on job completion as a webhook and optional authentication headers to use when
+            calling the callback url
+        :param skip_postprocessing: skip all text postprocessing (punctuation, capitalization, ITN)
+        :param remove_atmospherics: Atmospherics such as <laugh>, <affirmative>, etc. will not
+            appear in the transcript.
+        :param speakers_count: Use to specify the total number of unique speakers in the audio.
+        :param diarization_type: Use to specify diarization type.
+        :param summarization_config: Use to request transcript summary.
+        :param translation_config: Use to request transcript translation.
+        :returns: raw response data
+        :raises: HTTPError, ValueError
+        """
+        if media is None:
+            raise ValueError('media must be provided')
+
+        payload = self._create_job_options_payload(media_url=None,
+                                                   metadata=metadata,
+                                                   callback_url=callback_url,
+                                                   skip_diarization=skip_diarization,
+                                                   skip_punctuation=skip_punctuation,
+                                                   speaker_channels_count=speaker_channels_count,
+                                                   custom_vocabularies=custom_vocabularies,
+                                                   filter_profanity=filter_profanity,
+                                                   remove_disfluencies=remove_disfluencies,
+                                                   delete_after_seconds=delete_after_seconds,
+                                                   language=language,
+                                                   custom_vocabulary_id=custom_vocabulary_id,
+                                                   transcriber=transcriber,
+                                                   verbatim=verbatim,
+                                                   rush=rush,
+                                                   test_mode=test_mode,
+                                                   segments_to_transcribe=segments_to_transcribe,
+                                                   speaker_names=speaker_names,
+                                                   source_config=None,
+                                                   notification_config=notification_config,
+                                                   skip_postprocessing=skip_postprocessing,
+                                                   remove_atmospherics=remove_atmospherics,
+                                                   speakers_count=speakers_count,
+                                                   diarization_type=diarization_type,
+                                                   summarization_config=summarization_config,
+                                                   translation_config=translation_config)
+
+        body = MultipartMediaBody(media,
+                                  json.dumps(payload, sort_keys=True),
+                                  filename=filename,
+                                  content_length=content_length)
+
+        response = self._make_http_request(
+            "POST",
+            urljoin(self.base_url, 'jobs'),
+            headers={'Content-Type': body.content_type},
+            data=body
+        )
+
         return Job.from_json(response.json())
 
     def get_job_details(self, id_):
@@ -317,6 +461,19 @@ class RevAiAPIClient(BaseClient):
         :returns: list of jobs response data
         :raises: HTTPError
         """
+        return [Job.from_json(job) for job in self.get_list_of_jobs_json(limit, starting_after)]
+
+    def get_list_of_jobs_json(self, limit=None, starting_after=None):
+        """Get a list of transcription jobs submitted within the last week as json.
+        See get_list_of_jobs for details.
+
+        :param limit: optional, limits the number of jobs returned,
+                      if none, a default of 100 jobs is returned, max limit if 1000
+        :param starting_after: optional, returns jobs created after the job with this id,
+                               exclusive (job with this id is not included)
+        :returns: list of jobs as raw json
+        :raises: HTTPError
+        """
         params = []
         if limit is not None:
             params.append('limit={}'.format(limit))
@@ -329,7 +486,7 @@ class RevAiAPIClient(BaseClient):
             urljoin(self.base_url, 'jobs{}'.format(query))
         )
 
-        return [Job.from_json(job) for job in response.json()]
+        return response.json()
 
     def get_transcript_text(self, id_):
         """Get the transcript of a specific job as plain text.
@@ -407,10 +564,12 @@ class RevAiAPIClient(BaseClient):
 
         return response
 
-    def get_transcript_object(self, id_):
+    def get_transcript_object(self, id_, offset_map=None):
         """Get the transcript of a specific job as a python object`.
 
         :param id_: id of job to be requested
+        :param offset_map: optional OffsetMap of a job submitted with silence trimming, used to
+            map timestamps back to the original media
         :returns: transcript data as a python object
         :raises: HTTPError
         """
@@ -423,7 +582,8 @@ class RevAiAPIClient(BaseClient):
             headers={'Accept': self.rev_json_content_type}
         )
 
-        return Transcript.from_json(response.json())
+        transcript = Transcript.from_json(response.json())
+        return offset_map.remap_transcript(transcript) if offset_map else transcript
 
     def get_captions(self, id_, content_type=CaptionType.SRT, channel_id=None):
         """Get the captions output of a specific job and return it as plain text
@@ -703,11 +863,13 @@ class RevAiAPIClient(BaseClient):
 
         return response
 
-    def get_translated_transcript_object(self, id_, language):
+    def get_translated_transcript_object(self, id_, language, offset_map=None):
         """Get the translated transcript of a specific job as a python object`.
 
         :param id_: id of job to be requested
         :param language: requested language
+        :param offset_map: optional OffsetMap of a job submitted with silence trimming, used to
+            map timestamps back to the original media
         :returns: transcript data as a python object
         :raises: HTTPError
         """
@@ -720,7 +882,8 @@ class RevAiAPIClient(BaseClient):
             headers={'Accept': self.rev_json_content_type}
         )
 
-        return Transcript.from_json(response.json())
+        transcript = Transcript.from_json(response.json())
+        return offset_map.remap_transcript(transcript) if offset_map else transcript
 
     def _create_job_options_payload(
             self,
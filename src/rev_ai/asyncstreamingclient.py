@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""Asynchronous StreamingClient running on an asyncio event loop"""
+
+import asyncio
+import json
+
+from . import framing
+from .audio import byte_view
+from .aiowebsocket import AsyncWebSocket
+from .models.streaming.hypothesis import parse_streaming_response
+from .rechunker import AudioRechunker
+from .streamingclient import _build_streaming_url, on_error, on_close, on_connected
+
+
+class AsyncRevAiStreamingClient:
+    def __init__(self,
+                 access_token,
+                 config,
+                 version='v1',
+                 on_error=on_error,
+                 on_close=on_close,
+                 on_connected=on_connected):
+        """Constructor for the asynchronous Streaming Client.
+
+        Unlike RevAiStreamingClient, no threads are used. Audio is read from an async
+        iterable and responses are returned through an async iterator, so that many sessions
+        can share one event loop.
+
+        :param access_token: access token which authorizes all requests and
+            links them to your account. Generated on the settings page of your
+            account dashboard on Rev AI.
+        :param config: a MediaConfig object containing audio information.
+            See MediaConfig.py for more information
+        :param version (optional): version of the streaming api to be used
+        :param on_error (optional): function to be called when receiving an
+            error from the server
+        :param on_close (optional): function to be called when the websocket
+            closes
+        :param on_connected (optional): function to be called when the websocket
+            connects successfully
+        """
+        if not access_token:
+            raise ValueError('access_token must be provided')
+
+        if not config:
+            raise ValueError('config must be provided')
+
+        self.access_token = access_token
+        self.config = config
+        self.base_url = 'wss://api.rev.ai/speechtotext/{}/stream'. \
+            format(version)
+        self.on_error = on_error
+        self.on_close = on_close
+        self.on_connected = on_connected
+        self.client = None
+        self.send_task = None
+        self.metrics = None
+        self.vad = None
+        self.url_options = {}
+
+    async def start(self,
+                    generator,
+                    metadata=None,
+                    custom_vocabulary_id=None,
+                    filter_profanity=None,
+                    remove_disfluencies=None,
+                    delete_after_seconds=None,
+                    detailed_partials=None,
+                    start_ts=None,
+                    transcriber=None,
+                    language=None,
+                    skip_postprocessing=None,
+                    parsed=False,
+                    chunk_seconds=None,
+                    metrics=None,
+                    vad=None,
+                    converter=None):
+        """Connects the websocket and starts a task sending the audio
+        :param generator: async iterable, or iterable, of binary audio data
+        :param metadata: metadata to be attached to streaming job
+        :param custom_vocabulary_id: id of custom vocabulary to be used with this streaming job
+        :param filter_profanity: whether to mask profane words
+        :param remove_disfluencies: whether to exclude filler words like "uh"
+        :param delete_after_seconds: number of seconds after job completion when job is auto-deleted
+        :param detailed_partials: whether to receive timestamps and confidence scores
+        :param start_ts: number of seconds to offset all hypotheses timings
+        :param transcriber: type of transcriber to use to transcribe the media file
+        :param language: language to use for the streaming job
+        :param skip_postprocessing: skip all text postprocessing on final hypotheses
+        :param parsed: whether to yield StreamingPartial and StreamingFinal objects instead of
+            the raw json strings. Each message is decoded only once either way
+        :param chunk_seconds: optional duration, computed from the config, to coalesce or
+            split the audio into before it is sent
+        :param metrics: optional StreamingMetrics recording the latencies and throughput of
+            this session
+        :param vad: optional VoiceActivityGate dropping long silences before the audio is
+            sent. Timestamps of the hypotheses returned are mapped back to the original audio
+        :param converter: optional AudioConverter the audio is converted with before anything
+            else. The session is started with the target config of the converter, which
+            replaces the config of the client
+        :returns: async iterator of the responses of the server as strings
+        """
+        if generator is None:
+            raise ValueError('generator must be provided')
+        if self.send_task is not None and not self.send_task.done():
+            raise RuntimeError('Data is still being sent and will interfere with the responses.')
+
+        if converter is not None:
+            self.config = converter.target
+
+        await self._open(metrics,
+                         metadata=metadata,
+                         custom_vocabulary_id=custom_vocabulary_id,
+                         filter_profanity=filter_profanity,
+                         remove_disfluencies=remove_disfluencies,
+                         delete_after_seconds=delete_after_seconds,
+                         detailed_partials=detailed_partials,
+                         start_ts=start_ts,
+                         transcriber=transcriber,
+                         language=language,
+                         skip_postprocessing=skip_postprocessing)
+        return self._stream(generator, parsed, chunk_seconds, vad, converter)
+
+    async def connect(self,
+                      metadata=None,
+                      custom_vocabulary_id=None,
+                      filter_profanity=None,
+                      remove_disfluencies=None,
+                      delete_after_seconds=None,
+                      detailed_partials=None,
+                      start_ts=None,
+                      transcriber=None,
+                      language=None,
+                      skip_postprocessing=None,
+                      metrics=None,
+                      timeout=None):
+        """Connects the websocket and waits for the connected message, so that the audio
+            can be streamed with stream as soon as it is available. Audio produced in the
+            meantime should be queued by the caller, as PooledStreamingSession does
+        :param metadata: metadata to be attached to streaming job
+        :param custom_vocabulary_id: id of custom vocabulary to be used with this streaming job
+        :param filter_profanity: whether to mask profane words
+        :param remove_disfluencies: whether to exclude filler words like "uh"
+        :param delete_after_seconds: number of seconds after job completion when job is auto-deleted
+        :param detailed_partials: whether to receive timestamps and confidence scores
+        :param start_ts: number of seconds to offset all hypotheses timings
+        :param transcriber: type of transcriber to use to transcribe the media file
+        :param language: language to use for the streaming job
+        :param skip_postprocessing: skip all text postprocessing on final hypotheses
+        :param metrics: optional StreamingMetrics recording the latencies and throughput of
+            this session
+        :param timeout: optional seconds to wait for the connection and connected message
+        :returns: id of the streaming job
+        :raises: ConnectionError if the server closes the connection first
+        """
+        if self.send_task is not None and not self.send_task.done():
+            raise RuntimeError('Data is still being sent and will interfere with the responses.')
+        options = dict(metadata=metadata,
+                       custom_vocabulary_id=custom_vocabulary_id,
+                       filter_profanity=filter_profanity,
+                       remove_disfluencies=remove_disfluencies,
+                       delete_after_seconds=delete_after_seconds,
+                       detailed_partials=detailed_partials,
+                       start_ts=start_ts,
+                       transcriber=transcriber,
+                       language=language,
+                       skip_postprocessing=skip_postprocessing)
+        try:
+            return await asyncio.wait_for(self._connect(metrics, options), timeout)
+        except asyncio.TimeoutError:
+            if self.client is not None:
+                self.client.abort()
+            raise
+
+    def stream(self, generator, parsed=False, chunk_seconds=None, vad=None, converter=None):
+        """Starts a task sending the audio of a session opened with connect
+        :param generator: async iterable, or iterable, of binary audio data
+        :param parsed: whether to yield StreamingPartial and StreamingFinal objects instead of
+            the raw json strings
+        :param chunk_seconds: optional duration to coalesce or split the audio into
+        :param vad: optional VoiceActivityGate dropping long silences before the audio is sent
+        :param converter: optional AudioConverter the audio is converted with before anything
+            else. The session must have been connected with its target config
+        :returns: async iterator of the responses of the server
+        :raises: ValueError if connect was not called
+        """
+        if generator is None:
+            raise ValueError('generator must be provided')
+        if self.client is None or self.client.closed:
+            raise ValueError('connect must be called before stream')
+        if self.send_task is not None and not self.send_task.done():
+            raise RuntimeError('Data is still being sent and will interfere with the responses.')
+        if converter is not None:
+            converter.check_target(self.config)
+        return self._stream(generator, parsed, chunk_seconds, vad, converter)
+
+    async def _connect(self, metrics, options):
+        await self._open(metrics, **options)
+        while True:
+            opcode, data = await self.client.recv_data()
+            if opcode == framing.OPCODE_CLOSE:
+                code, reason = framing.decode_close_payload(data)
+                self.client.abort()
+                raise ConnectionError(
+                    'Connection closed. Code : {}; Reason : {}'.format(code, reason))
+            if opcode == framing.OPCODE_TEXT:
+                data_dict = json.loads(data.decode('utf-8'))
+                if data_dict['type'] == 'connected':
+                    if self.metrics is not None:
+                        self.metrics.connected()
+                    self.on_connected(data_dict['id'])
+                    return data_dict['id']
+
+    async def _open(self, metrics, **url_options):
+        """Builds the url of the session and connects the websocket"""
+        self.url_options = url_options
+        url = _build_streaming_url(self.base_url, self.access_token, self.config,
+                                   **self.url_options)
+
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.connecting(url_options.get('start_ts'))
+
+        try:
+            self.client = await AsyncWebSocket.connect(url)
+        except Exception as e:
+            self.on_error(e)
+            raise
+
+    def _stream(self, generator, parsed, chunk_seconds, vad, converter):
+        """Wraps the generator in the audio processing requested and starts sending it"""
+        if converter is not None:
+            if hasattr(generator, '__aiter__'):
+                generator = converter.stream_async(generator)
+            else:
+                generator = converter.stream(generator)
+
+        self.vad = vad
+        if vad is not None:
+            if hasattr(generator, '__aiter__'):
+                generator = vad.gate_async(generator)
+            else:
+                generator = vad.gate(generator)
+
+        if chunk_seconds is not None:
+            rechunker = AudioRechunker(self.config, chunk_seconds)
+            if hasattr(generator, '__aiter__'):
+                generator = rechunker.rechunk_async(generator)
+            else:
+                generator = rechunker.rechunk(generator)
+
+        self.send_task = asyncio.ensure_future(self._send_data(generator))
+        return self._get_response_generator(parsed)
+
+    async def end(self):
+        """Stops sending audio and closes the websocket."""
+        if self.send_task is not None:
+            self.send_task.cancel()
+        if self.client is not None:
+            self.client.abort()
+
+    async def _send_data(self, generator):
+        """Sends the audio of an async iterable, or iterable, followed by EOS."""
+        try:
+            if hasattr(generator, '__aiter__'):
+                async for chunk in generator:
+                    await self._send_chunk(chunk, generator)
+            else:
+                for chunk in generator:
+                    await self._send_chunk(chunk, generator)
+            await self.client.send('EOS')
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            if not self.client.closed:
+                self.on_error(e)
+        except Exception:
+            # end the responses so that the error is raised to the consumer
+            self.client.abort()
+            raise
+
+    async def _send_chunk(self, chunk, generator):
+        chunk = byte_view(chunk)
+        if self.metrics is not None:
+            self.metrics.chunk_sent(len(chunk), getattr(generator, 'queue_depth', None))
+        await self.client.send_binary(chunk)
+
+    async def _get_response_generator(self, parsed=False):
+        """An async generator of responses from the server. Yields the data decoded.
+        Errors raised while sending audio are raised once the responses end.
+        :param parsed: whether to yield hypothesis objects instead of json strings
+        """
+        try:
+            while True:
+                try:
+                    opcode, data = await self.client.recv_data()
+                except asyncio.IncompleteReadError:
+                    break
+                if opcode == framing.OPCODE_TEXT:
+                    data = data.decode('utf-8')
+                    data_dict = json.loads(data)
+                    if data_dict['type'] == 'connected':
+                        if self.metrics is not None:
+                            self.metrics.connected()
+                        self.on_connected(data_dict['id'])
+                        continue
+                    if self.metrics is not None:
+                        self.metrics.message_received(data_dict)
+                    if self.vad is not None:
+                        data_dict = self.vad.remap_hypothesis(
+                            data_dict, self.url_options.get('start_ts') or 0)
+                        data = json.dumps(data_dict)
+                    if parsed:
+                        yield parse_streaming_response(data_dict)
+                    else:
+                        yield data
+                elif opcode == framing.OPCODE_CLOSE:
+                    code, reason = framing.decode_close_payload(data)
+                    if code is not None:
+                        self.on_close(code, reason)
+                    break
+                else:
+                    yield ''
+        finally:
+            if not self.send_task.done():
+                self.send_task.cancel()
+            self.client.abort()
+            if self.metrics is not None:
+                self.metrics.closed()
+
+        if self.send_task.done() and not self.send_task.cancelled() \
+                and self.send_task.exception() is not None:
+            raise self.send_task.exception()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""PCM audio helpers shared by the async and streaming clients.
+
+NumPy is used when it is installed and a pure python fallback is used otherwise.
+"""
+
+import sys
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# array typecodes of signed little endian integer samples keyed by sample width in bytes
+_ARRAY_TYPECODES = {2: 'h', 4: 'i'}
+
+# array typecodes of little endian floating point samples keyed by sample width in bytes
+_FLOAT_TYPECODES = {4: 'f', 8: 'd'}
+
+# raw streaming formats of little endian samples, mapped to their width and whether they
+# are floating point
+PCM_FORMATS = {
+    'U8': (1, False),
+    'S16LE': (2, False),
+    'S24LE': (3, False),
+    'S32LE': (4, False),
+    'F32LE': (4, True),
+    'F64LE': (8, True)
+}
+
+
+def byte_view(data):
+    """Returns a flat memoryview of the bytes of a buffer, such as a memoryview of another
+    format, an mmap or a NumPy array, without copying them unless they are not contiguous.
+    bytes and bytearray are returned as they are, and so are objects that are not buffers.
+    """
+    if isinstance(data, (bytes, bytearray)):
+        return data
+    try:
+        view = memoryview(data)
+    except TypeError:
+        return data
+    if not view.c_contiguous:
+        return memoryview(view.tobytes())
+    if view.format == 'B' and view.ndim == 1:
+        return view
+    return view.cast('B')
+
+
+def pcm_format(config):
+    """Returns the sample width in bytes and whether samples are floating point for the
+    format of a MediaConfig
+
+    :raises: ValueError if the format is not one of PCM_FORMATS
+    """
+    if config.format not in PCM_FORMATS:
+        raise ValueError('format must be one of {}'.format(', '.join(sorted(PCM_FORMATS))))
+    return PCM_FORMATS[config.format]
+
+
+def full_scale(sample_width, floating=False):
+    """Returns the largest magnitude of a PCM sample of the given width in bytes"""
+    if floating:
+        return 1.0
+    return float(1 << (8 * sample_width - 1))
+
+
+def db_to_mean_square(threshold_db, sample_width, floating=False):
+    """Converts a level in dBFS to the mean square of samples at that level"""
+    return (full_scale(sample_width, floating) * 10 ** (threshold_db / 20.0)) ** 2
+
+
+def frame_mean_squares(data, sample_width, frame_size, floating=False, work=None):
+    """Returns the mean square of the samples of each frame of interleaved PCM audio.
+
+    Samples of all channels in a frame are averaged together. The last frame may be shorter
+    than the others.
+
+    :param data: bytes-like object containing little endian PCM samples. 8 bit samples are
+        unsigned, wider integer samples are signed
+    :param sample_width: width of a sample in bytes, 1 to 4, or 4 and 8 for floating point
+    :param frame_size: number of samples, over all channels, in a frame
+    :param floating: whether samples are floating point
+    :param work: optional float64 NumPy array the samples are decoded into, when it holds
+        them all, instead of a new array
+    :returns: list of mean squares, one per frame
+    """
+    if floating and sample_width not in _FLOAT_TYPECODES:
+        raise ValueError('sample_width of floating point samples must be 4 or 8')
+    if not floating and sample_width not in (1, 2, 3, 4):
+        raise ValueError('sample_width must be between 1 and 4')
+    if frame_size <= 0:
+        raise ValueError('frame_size must be positive')
+
+    if np is not None:
+        return _frame_mean_squares_numpy(data, sample_width, frame_size, floating, work)
+    return _frame_mean_squares_python(data, sample_width, frame_size, floating)
+
+
+def decode_samples(data, sample_width, out, floating=False):
+    """Decodes little endian PCM samples into a NumPy float array without scaling them.
+    8 bit samples are centred on zero.
+
+    :param out: float32 or float64 array of at least as many samples as data
+    :returns: the part of out holding the samples
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    raw = raw[:len(raw) - len(raw) % sample_width]
+    out = out[:len(raw) // sample_width]
+    if floating:
+        out[:] = raw.view('<f{}'.format(sample_width))
+    elif sample_width == 1:
+        np.subtract(raw, 128.0, out=out, casting='unsafe')
+    elif sample_width == 3:
+        triplets = raw.reshape(-1, 3)
+        # the signed top byte carries the sign, so no array of 32 bit values is needed
+        np.multiply(triplets[:, 2].view(np.int8), 256.0, out=out, casting='unsafe')
+        np.add(out, triplets[:, 1], out=out, casting='unsafe')
+        np.multiply(out, 256.0, out=out, casting='unsafe')
+        np.add(out, triplets[:, 0], out=out, casting='unsafe')
+    else:
+        out[:] = raw.view('<i{}'.format(sample_width))
+    return out
+
+
+def _decode_numpy(data, sample_width, floating=False):
+    out = np.empty(memoryview(data).nbytes // sample_width, dtype=np.float64)
+    return decode_samples(data, sample_width, out, floating)
+
+
+def _frame_mean_squares_numpy(data, sample_width, frame_size, floating=False, work=None):
+    if work is not None and len(work) >= memoryview(data).nbytes // sample_width:
+        samples = decode_samples(data, sample_width, work, floating)
+    else:
+        samples = _decode_numpy(data, sample_width, floating)
+    if not len(samples):
+        return []
+    np.multiply(samples, samples, out=samples)
+    whole = len(samples) - len(samples) % frame_size
+    mean_squares = samples[:whole].reshape(-1, frame_size).mean(axis=1).tolist()
+    if whole < len(samples):
+        mean_squares.append(float(samples[whole:].mean()))
+    return mean_squares
+
+
+def _decode_python(data, sample_width, floating=False):
+    data = memoryview(data).cast('B')
+    data = data[:len(data) - len(data) % sample_width]
+    if floating:
+        samples = array(_FLOAT_TYPECODES[sample_width])
+        samples.frombytes(data)
+        if sys.byteorder == 'big':
+            samples.byteswap()
+        return samples
+    if sample_width == 1:
+        return [sample - 128 for sample in data]
+    if sample_width == 3:
+        return [int.from_bytes(data[i:i + 3], 'little', signed=True)
+                for i in range(0, len(data), 3)]
+    samples = array(_ARRAY_TYPECODES[sample_width])
+    samples.frombytes(data)
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples
+
+
+def _frame_mean_squares_python(data, sample_width, frame_size, floating=False):
+    samples = _decode_python(data, sample_width, floating)
+    mean_squares = []
+    for start in range(0, len(samples), frame_size):
+        frame = samples[start:start + frame_size]
+        mean_squares.append(sum(sample * sample for sample in frame) / len(frame))
+    return mean_squares
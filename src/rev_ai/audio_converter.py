@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""Conversion of raw streamed audio between sample formats, rates and channel counts"""
+
+import math
+
+from .audio import byte_view, decode_samples, np, pcm_format
+from .models.streaming.mediaconfig import MediaConfig
+
+# zero crossings of the windowed sinc on each side of the polyphase filter
+_SINC_ZERO_CROSSINGS = 8
+
+# output samples per channel computed at once. Chunks are converted in blocks of the input
+# samples that make them, so that the work arrays can be allocated by the constructor
+_BLOCK_OUTPUT_SAMPLES = 4096
+
+
+class AudioConverter:
+    """Converts interleaved PCM audio described by a source MediaConfig to a target one.
+
+    Channels are averaged down to mono, or mono is copied to every target channel. Audio is
+    resampled with a polyphase filter, either a windowed sinc low-pass or linear
+    interpolation, and quantized to the target format. The state of the filter is kept
+    between chunks, so chunks can be of any size.
+
+    NumPy is required. Chunks are converted in blocks of a bounded number of samples, which
+    are written into work arrays allocated by the constructor.
+    """
+
+    def __init__(self, source_config, target_config, method='polyphase'):
+        """
+        :param source_config: MediaConfig of the audio produced by the capture
+        :param target_config: MediaConfig of the audio to stream. Values it leaves out are
+            taken from the source
+        :param method: 'polyphase' for a windowed sinc filter or 'linear' for linear
+            interpolation
+        :raises: ValueError, ImportError if numpy is not installed
+        """
+        if np is None:
+            raise ImportError('numpy must be installed to convert audio')
+        if method not in ('polyphase', 'linear'):
+            raise ValueError('method must be polyphase or linear')
+        for config in (source_config, target_config):
+            if config.layout not in (None, 'interleaved'):
+                raise ValueError('only interleaved audio can be converted')
+        if not source_config.rate:
+            raise ValueError('source_config must provide the rate')
+
+        self.source = source_config
+        self.target = MediaConfig('audio/x-raw',
+                                  'interleaved',
+                                  int(target_config.rate or source_config.rate),
+                                  target_config.format or source_config.format,
+                                  int(target_config.channels or source_config.channels or 1))
+        self.source_width, self.source_floating = pcm_format(source_config)
+        self.target_width, self.target_floating = pcm_format(self.target)
+        self.source_channels = int(source_config.channels or 1)
+        self.target_channels = self.target.channels
+        if self.target_channels not in (1, self.source_channels) and self.source_channels != 1:
+            raise ValueError('audio can only be converted to mono, from mono, or to the same '
+                             'number of channels')
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+        divisor = math.gcd(int(source_config.rate), self.target.rate)
+        self.up = self.target.rate // divisor
+        self.down = int(source_config.rate) // divisor
+        phases, self._delay = _polyphase_filter(self.up, self.down, method)
+        self._taps = phases.shape[1]
+        self._work_channels = 1 if self.target_channels == 1 else self.source_channels
+        # absolute index of the first input sample kept in the window and of the next
+        # output sample
+        self._history_start = -(self._taps - 1)
+        self._history_length = self._taps - 1
+        self._next_output = 0
+        self._carry = b''
+        self._allocate(phases)
+
+    def _allocate(self, phases):
+        """Allocates the work arrays of a block"""
+        resampling = not self.up == self.down == 1
+        # zeros fed through the filter by flush
+        padding = self._delay // self.up + self._taps if resampling else 0
+        self._block_frames = max(_BLOCK_OUTPUT_SAMPLES * self.down // self.up, padding, 1)
+        # most outputs a block makes, with the history ahead of it
+        outputs = -(-(self._block_frames + self._taps) * self.up // self.down) + 1
+        block_outputs = outputs if resampling else self._block_frames
+
+        self._decoded = np.empty((self._block_frames, self.source_channels), dtype=np.float32)
+        if self.target_channels == 1 and self.source_channels > 1:
+            self._mixed = np.empty((self._block_frames, 1), dtype=np.float32)
+        if resampling:
+            # input samples kept from the previous blocks followed by those of the block
+            self._window = np.zeros((self._taps - 1 + self._block_frames, self._work_channels),
+                                    dtype=np.float32)
+            self._padding = np.zeros((padding, self._work_channels), dtype=np.float32)
+            # output m is computed from the input samples before (m * down + delay) // up
+            # with the coefficients of phase (m * down + delay) % up, both of which repeat
+            # every up outputs, so a block starting at m reads them from index m % up
+            first = np.arange(self.up + outputs, dtype=np.int64) * self.down + self._delay
+            self._offsets = first // self.up
+            self._weights = phases[first % self.up]
+            self._tap_offsets = np.arange(self._taps)
+            self._bases = np.empty(outputs, dtype=np.intp)
+            self._indices = np.empty((outputs, self._taps), dtype=np.intp)
+            self._gathered = np.empty((outputs, self._taps), dtype=np.float32)
+            self._resampled = np.empty((outputs, self._work_channels), dtype=np.float32)
+        if self.target_channels > 1 and self._work_channels == 1:
+            self._repeated = np.empty((block_outputs, self.target_channels), dtype=np.float32)
+        samples = block_outputs * self.target_channels
+        if self.target_floating:
+            self._quantized = np.empty(samples, dtype='<f{}'.format(self.target_width))
+        else:
+            self._scaled = np.empty(samples, dtype=np.float64)
+            quantized_type = {1: np.uint8, 3: '<i4'}.get(self.target_width,
+                                                         '<i{}'.format(self.target_width))
+            self._quantized = np.empty(samples, dtype=quantized_type)
+
+    def check_target(self, config):
+        """Raises a ValueError unless config describes the converted audio
+
+        :param config: MediaConfig a streaming client was created with
+        """
+        if config.get_content_type_string() != self.target.get_content_type_string():
+            raise ValueError('config must be the target of the converter: {}'.format(
+                self.target.get_content_type_string()))
+
+    def convert(self, data):
+        """Returns the converted audio of a chunk. Samples split across chunks are kept for
+        the next one."""
+        data = memoryview(byte_view(data))
+        self.bytes_in += len(data)
+        frame_bytes = self.source_width * self.source_channels
+        outputs = []
+        if self._carry:
+            needed = frame_bytes - len(self._carry)
+            if len(data) < needed:
+                self._carry += bytes(data)
+                return b''
+            self._convert_frames(self._carry + bytes(data[:needed]), outputs)
+            data = data[needed:]
+        whole = len(data) - len(data) % frame_bytes
+        self._carry = bytes(data[whole:])
+        self._convert_frames(data[:whole], outputs)
+        return outputs[0] if len(outputs) == 1 else b''.join(outputs)
+
+    def flush(self):
+        """Returns the audio still held back by the filter"""
+        if self.up == self.down == 1:
+            return b''
+        # number of input samples received, and of output samples they make
+        end = self._history_start + self._history_length
+        return self._emit(self._resample(self._padding, limit=-(-end * self.up // self.down)))
+
+    def stream(self, generator):
+        """Converts the audio of an iterable"""
+        for data in generator:
+            chunk = self.convert(data)
+            if chunk:
+                yield chunk
+        chunk = self.flush()
+        if chunk:
+            yield chunk
+
+    async def stream_async(self, generator):
+        """Converts the audio of an async iterable"""
+        async for data in generator:
+            chunk = self.convert(data)
+            if chunk:
+                yield chunk
+        chunk = self.flush()
+        if chunk:
+            yield chunk
+
+    def _convert_frames(self, data, outputs):
+        """Converts whole frames block by block, appending the audio made to outputs"""
+        block_bytes = self._block_frames * self.source_width * self.source_channels
+        for start in range(0, len(data), block_bytes):
+            samples = self._decode(data[start:start + block_bytes])
+            output = self._emit(self._resample(self._mix(samples)))
+            if output:
+                outputs.append(output)
+
+    def _decode(self, data):
+        """Returns the samples of at most a block as a float32 (frames, channels) array scaled
+        to [-1, 1]"""
+        frames = len(data) // (self.source_width * self.source_channels)
+        samples = self._decoded[:frames]
+        decode_samples(data, self.source_width, samples.reshape(-1), self.source_floating)
+        if not self.source_floating:
+            samples *= 1.0 / (1 << (8 * self.source_width - 1))
+        return samples
+
+    def _mix(self, samples):
+        if self.target_channels == 1 and self.source_channels > 1:
+            mixed = self._mixed[:len(samples)]
+            np.mean(samples, axis=1, keepdims=True, out=mixed)
+            return mixed
+        return samples
+
+    def _output_count(self, end):
+        """Returns the number of output samples that only need input samples before end"""
+        # output m needs input samples up to (m * down + delay) // up
+        return max(0, (end * self.up - self._delay + self.down - 1) // self.down)
+
+    def _resample(self, samples, limit=None):
+        if self.up == self.down == 1:
+            self._next_output += len(samples)
+            return samples
+        filled = self._history_length + len(samples)
+        window = self._window[:filled]
+        window[self._history_length:] = samples
+        end = self._history_start + filled
+        count = self._output_count(end) - self._next_output
+        if limit is not None:
+            count = min(count, limit - self._next_output)
+        count = max(count, 0)
+
+        cycles, phase = divmod(self._next_output, self.up)
+        bases = self._bases[:count]
+        np.add(self._offsets[phase:phase + count], cycles * self.down - self._history_start,
+               out=bases)
+        # samples each output is computed from, newest first
+        indices = self._indices[:count]
+        np.subtract(bases[:, None], self._tap_offsets, out=indices)
+        np.clip(indices, 0, filled - 1, out=indices)
+        weights = self._weights[phase:phase + count]
+        gathered = self._gathered[:count]
+        output = self._resampled[:count]
+        for channel in range(self._work_channels):
+            np.take(window[:, channel], indices, out=gathered)
+            np.einsum('ij,ij->i', gathered, weights, out=output[:, channel])
+        self._next_output += count
+
+        keep_from = (self._next_output * self.down + self._delay) // self.up - (self._taps - 1)
+        keep_from = min(max(keep_from, self._history_start), end)
+        kept = window[keep_from - self._history_start:]
+        self._window[:len(kept)] = kept
+        self._history_start = keep_from
+        self._history_length = len(kept)
+        return output
+
+    def _emit(self, samples):
+        if self.target_channels > 1 and samples.shape[1] == 1:
+            repeated = self._repeated[:len(samples)]
+            repeated[:] = samples
+            samples = repeated
+        flat = samples.reshape(-1)
+        quantized = self._quantized[:len(flat)]
+        if self.target_floating:
+            quantized[:] = flat
+            output = quantized.tobytes()
+        else:
+            scale = float(1 << (8 * self.target_width - 1))
+            scaled = self._scaled[:len(flat)]
+            np.multiply(flat, scale, out=scaled)
+            np.rint(scaled, out=scaled)
+            np.clip(scaled, -scale, scale - 1, out=scaled)
+            if self.target_width == 1:
+                scaled += 128
+            np.copyto(quantized, scaled, casting='unsafe')
+            if self.target_width == 3:
+                output = quantized.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+            else:
+                output = quantized.tobytes()
+        self.bytes_out += len(output)
+        return output
+
+
+def _polyphase_filter(up, down, method):
+    """Returns the filter split into up phases, as an (up, taps) array of which each row
+    lists the coefficients applied to the newest input sample first, and its delay in
+    samples at the upsampled rate"""
+    if up == down == 1:
+        return np.ones((1, 1), dtype=np.float32), 0
+    factor = max(up, down)
+    if method == 'linear':
+        # triangle spanning one input sample on each side
+        half = up
+        n = np.arange(-half + 1, half)
+        coefficients = 1.0 - np.abs(n) / float(up)
+    else:
+        half = _SINC_ZERO_CROSSINGS * factor
+        n = np.arange(-half + 1, half)
+        coefficients = np.sinc(n / float(factor)) * np.kaiser(len(n), 8.0) * up / float(factor)
+    delay = half - 1
+    taps = -(-len(coefficients) // up)
+    padded = np.zeros(taps * up)
+    padded[:len(coefficients)] = coefficients
+    # phase p applies coefficients p, p + up, p + 2 up... to samples base, base - 1, ...
+    return padded.reshape(taps, up).T.astype(np.float32).copy(), delay
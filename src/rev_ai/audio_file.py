@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Memory-mapped PCM audio files streamed by the streaming clients"""
+
+import mmap
+import os
+import struct
+
+from .models.streaming.mediaconfig import MediaConfig
+
+# WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT and WAVE_FORMAT_EXTENSIBLE format tags
+_WAVE_PCM = 1
+_WAVE_FLOAT = 3
+_WAVE_EXTENSIBLE = 0xFFFE
+
+# raw streaming formats keyed by whether samples are floating point and their width in bits
+_WAVE_FORMATS = {
+    (False, 8): 'U8',
+    (False, 16): 'S16LE',
+    (False, 24): 'S24LE',
+    (False, 32): 'S32LE',
+    (True, 32): 'F32LE',
+    (True, 64): 'F64LE'
+}
+
+
+class AudioFile:
+    """PCM audio of a WAV or raw file, memory-mapped so that its chunks are memoryview slices
+    of the file rather than copies read into memory.
+
+    The MediaConfig of WAV files is derived from their header, and only the samples of their
+    data chunk are returned. Raw files are described by the config they are opened with.
+    """
+
+    def __init__(self, path, config=None):
+        """
+        :param path: path to a WAV file, or to a file of raw interleaved PCM samples
+        :param config: MediaConfig of a raw file, which must provide the rate and a raw
+            format such as S16LE. Ignored for WAV files
+        :raises: ValueError if the file is not PCM audio, or no config describes a raw file
+        """
+        self.path = path
+        self.data = None
+        self._map = None
+        self._file = open(path, 'rb')
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) \
+                if size else None
+            view = memoryview(self._map) if self._map is not None else memoryview(b'')
+            if view[:4] == b'RIFF' and view[8:12] == b'WAVE':
+                self.config, start, end = _parse_wav(view)
+            elif config is None or not config.get_bytes_per_second():
+                raise ValueError('config must provide the rate and a raw format for files '
+                                 'which are not WAV')
+            else:
+                self.config, start, end = config, 0, size
+            frame_size = self.config.get_sample_width() * int(self.config.channels or 1)
+            end -= (end - start) % frame_size
+            self.data = view[start:end]
+            view.release()
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def duration(self):
+        """Duration of the audio in seconds"""
+        return len(self.data) / float(self.config.get_bytes_per_second())
+
+    def chunks(self, chunk_seconds=0.1):
+        """Yields the audio in memoryview slices of chunk_seconds, the last one possibly
+        shorter, whose frames are never split
+
+        :param chunk_seconds: duration of each chunk
+        :raises: ValueError
+        """
+        if chunk_seconds <= 0:
+            raise ValueError('chunk_seconds must be positive')
+        frame_size = self.config.get_sample_width() * int(self.config.channels or 1)
+        size = max(1, int(self.config.rate * chunk_seconds)) * frame_size
+        for start in range(0, len(self.data), size):
+            yield self.data[start:start + size]
+
+    def close(self):
+        """Closes the file. The mapping is only unmapped once no chunk refers to it anymore,
+        which may be after close if chunks are still queued or kept by the caller"""
+        if self.data is not None:
+            self.data.release()
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _parse_wav(view):
+    """Returns the MediaConfig and the start and end offsets of the samples of a WAV file"""
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(view):
+        chunk_id = view[offset:offset + 4].tobytes()
+        chunk_size = struct.unpack_from('<I', view, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b'fmt ':
+            fmt = view[body:body + chunk_size]
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError('WAV file has no fmt chunk before its data')
+            # headers of files written while recording may not hold the final size
+            return _wav_config(fmt), body, min(len(view), body + chunk_size)
+        # chunks are padded to an even size
+        offset = body + chunk_size + chunk_size % 2
+    raise ValueError('WAV file has no data chunk')
+
+
+def _wav_config(fmt):
+    """Returns the MediaConfig of the fmt chunk of a WAV file"""
+    if len(fmt) < 16:
+        raise ValueError('WAV fmt chunk is too short')
+    tag, channels, rate, _, _, bits = struct.unpack_from('<HHIIHH', fmt)
+    if tag == _WAVE_EXTENSIBLE and len(fmt) >= 26:
+        # the format tag is the first field of the sub format GUID
+        tag = struct.unpack_from('<H', fmt, 24)[0]
+    if tag not in (_WAVE_PCM, _WAVE_FLOAT) or (tag == _WAVE_FLOAT, bits) not in _WAVE_FORMATS:
+        raise ValueError('WAV file must hold PCM or floating point samples of a supported '
+                         'width, not format {} with {} bits'.format(tag, bits))
+    if not channels or not rate:
+        raise ValueError('WAV file must have channels and a rate')
+    return MediaConfig('audio/x-raw', 'interleaved', rate,
+                       _WAVE_FORMATS[(tag == _WAVE_FLOAT, bits)], channels)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Bounded, optionally real-time paced, queue of audio sent by the streaming client"""
+
+import threading
+import time
+
+from .audio import byte_view
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# marks the end of the audio in the queue
+_END = object()
+
+
+class AudioSender:
+    """Queue of audio chunks between a producer and the websocket.
+
+    Producers add chunks with put, or feed from a generator, and block once max_queue_size
+    chunks are waiting. Iterating the sender yields the chunks in order until close is
+    called. When realtime is set, chunks are released no faster than the audio plays,
+    as derived from the MediaConfig, times speedup.
+    """
+
+    def __init__(self, config=None, max_queue_size=32, realtime=False, speedup=1.0):
+        """
+        :param config: MediaConfig of the audio, required for real-time pacing
+        :param max_queue_size: number of chunks waiting to be sent before producers block
+        :param realtime: whether to pace the chunks at the rate the audio plays
+        :param speedup: factor by which paced audio is sent faster than real time
+        :raises: ValueError
+        """
+        if max_queue_size < 1:
+            raise ValueError('max_queue_size must be at least 1')
+        if speedup <= 0:
+            raise ValueError('speedup must be positive')
+        self.bytes_per_second = config.get_bytes_per_second() if config else None
+        if realtime and not self.bytes_per_second:
+            raise ValueError('config must provide the rate and a raw format for real-time pacing')
+
+        self.realtime = realtime
+        self.speedup = speedup
+        self.max_queue_depth = 0
+        self.chunks_sent = 0
+        self.bytes_sent = 0
+        self.blocked_seconds = 0.0
+        self.lag_seconds = 0.0
+        self._queue = queue.Queue(max_queue_size)
+        self._closed = False
+        self._stopping = False
+        self._error = None
+        self._feed_thread = None
+
+    @property
+    def queue_depth(self):
+        """Number of chunks waiting to be sent"""
+        return self._queue.qsize()
+
+    @property
+    def seconds_sent(self):
+        """Duration of the audio sent so far, or None if the config does not define it"""
+        if not self.bytes_per_second:
+            return None
+        return self.bytes_sent / float(self.bytes_per_second)
+
+    def put(self, chunk, timeout=None):
+        """Adds a chunk of audio, waiting while the queue is full
+
+        :param chunk: binary audio data
+        :param timeout: optional seconds to wait for room in the queue
+        :raises: queue.Full if timeout elapsed, ValueError if the sender is closed
+        """
+        if self._closed:
+            raise ValueError('sender is closed')
+        self._put(byte_view(chunk), timeout)
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+    def close(self, timeout=None):
+        """Marks the end of the audio. Chunks already queued are still sent."""
+        if not self._closed:
+            self._closed = True
+            self._put(_END, timeout)
+
+    def stop(self, timeout=None):
+        """Stops reading the generator being fed and closes the sender, so that only the
+        chunks already queued are still sent. The chunk the generator is producing, if any,
+        is dropped."""
+        self._stopping = True
+        self.close(timeout)
+
+    def discard(self):
+        """Closes the sender and drops the chunks queued, for when nothing consumes it
+        anymore, such as after its session ended. Producers waiting for room in the queue are
+        released, later puts raise ValueError and iterating the sender ends."""
+        self._closed = True
+        self._stopping = True
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        try:
+            self._queue.put_nowait(_END)
+        except queue.Full:
+            pass
+
+    def feed(self, generator):
+        """Puts every chunk of a generator, then closes the sender. Errors raised by the
+        generator are raised again to the consumer of the sender."""
+        try:
+            for chunk in generator:
+                if self._stopping:
+                    break
+                self.put(chunk)
+        except Exception as e:
+            if not self._stopping:
+                self._error = e
+        finally:
+            self.close()
+
+    def start_feeding(self, generator):
+        """Feeds a generator from a background thread"""
+        self._feed_thread = threading.Thread(target=self.feed, args=[generator])
+        self._feed_thread.daemon = True
+        self._feed_thread.start()
+        return self
+
+    def _put(self, item, timeout):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            start = time.monotonic()
+            try:
+                self._queue.put(item, timeout=timeout)
+            finally:
+                self.blocked_seconds += time.monotonic() - start
+
+    def __iter__(self):
+        start = None
+        while True:
+            chunk = self._queue.get()
+            if chunk is _END:
+                break
+            if self.realtime:
+                now = time.monotonic()
+                if start is None:
+                    start = now
+                due = start + self.bytes_sent / float(self.bytes_per_second * self.speedup)
+                if due > now:
+                    time.sleep(due - now)
+                    self.lag_seconds = 0.0
+                else:
+                    self.lag_seconds = now - due
+            self.chunks_sent += 1
+            self.bytes_sent += len(chunk)
+            yield chunk
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""Fan-out of multi-channel audio to one streaming session per channel"""
+
+import threading
+from collections import namedtuple
+
+from .audio_sender import AudioSender
+from .models.streaming import MediaConfig
+from .models.streaming.live_transcript import MultiChannelLiveTranscript
+from .streamingclient import RevAiStreamingClient
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# marks the end of the responses of a channel
+_END = object()
+
+# seconds to wait for the thread splitting the audio once every session has ended
+_SPLIT_JOIN_SECONDS = 5
+
+ChannelResponse = namedtuple('ChannelResponse', ['channel', 'speaker', 'hypothesis'])
+
+
+class ChannelSplitter:
+    """Splits interleaved raw PCM into the audio of each channel.
+
+    With NumPy, the frames are viewed as a (frames, channels, sample width) array of bytes and
+    each channel is a strided slice of it. Without it, each byte of a sample is copied with
+    extended slicing. Bytes of an incomplete frame are kept for the next chunk.
+    """
+
+    def __init__(self, config):
+        """
+        :param config: MediaConfig of interleaved raw audio with more than one channel
+        :raises: ValueError
+        """
+        self.sample_width = config.get_sample_width()
+        self.channels = int(config.channels or 1)
+        if not self.sample_width:
+            raise ValueError('config must be of a raw format such as S16LE')
+        if config.layout not in (None, 'interleaved'):
+            raise ValueError('config must be of interleaved audio')
+        self.frame_size = self.sample_width * self.channels
+        self.channel_config = MediaConfig(config.content_type, config.layout, config.rate,
+                                          config.format, 1)
+        self._remainder = b''
+
+    def split(self, chunk):
+        """Returns a list of the audio of each channel in a chunk
+
+        :param chunk: bytes-like object of interleaved frames
+        """
+        if self._remainder:
+            chunk = self._remainder + bytes(chunk)
+        usable = len(chunk) - len(chunk) % self.frame_size
+        self._remainder = bytes(chunk[usable:])
+        if np is not None:
+            frames = np.frombuffer(chunk, dtype=np.uint8, count=usable).reshape(
+                -1, self.channels, self.sample_width)
+            return [frames[:, channel].tobytes() for channel in range(self.channels)]
+
+        data = memoryview(chunk)[:usable].tobytes()
+        parts = []
+        for channel in range(self.channels):
+            part = bytearray(usable // self.channels)
+            for byte in range(self.sample_width):
+                part[byte::self.sample_width] = \
+                    data[channel * self.sample_width + byte::self.frame_size]
+            parts.append(bytes(part))
+        return parts
+
+
+def on_error(error):
+    raise error
+
+
+def on_close(channel, code, reason):
+    print('Channel {} closed. Code : {}; Reason : {}'.format(channel, code, reason))
+
+
+def on_connected(channel, job_id):
+    print('Channel {} connected, Job ID : {}'.format(channel, job_id))
+
+
+class MultiChannelStreamingClient:
+    """Streams each channel of interleaved audio to its own streaming session, as the
+    streaming api transcribes a single speaker stream per session.
+
+    The channels are split from a single generator and queued to each session, and the
+    hypotheses of all sessions are returned through one generator and assembled into a
+    speaker labelled MultiChannelLiveTranscript.
+    """
+
+    def __init__(self,
+                 access_token,
+                 config,
+                 speakers=None,
+                 version='v1',
+                 on_error=on_error,
+                 on_close=on_close,
+                 on_connected=on_connected,
+                 max_queue_size=32):
+        """
+        :param access_token: access token which authorizes all requests and
+            links them to your account. Generated on the settings page of your
+            account dashboard on Rev AI.
+        :param config: MediaConfig of the interleaved raw audio
+        :param speakers: optional list of the display names of the speaker of each channel
+        :param version (optional): version of the streaming api to be used
+        :param on_error (optional): function to be called with errors of any session
+        :param on_close (optional): function to be called with the channel, code and reason
+            when the websocket of a channel closes
+        :param on_connected (optional): function to be called with the channel and job id
+            when the session of a channel starts
+        :param max_queue_size: number of chunks queued per channel before the audio waits
+        """
+        self.splitter = ChannelSplitter(config)
+        self.config = config
+        self.on_error = on_error
+        self.on_close = on_close
+        self.on_connected = on_connected
+        self.max_queue_size = max_queue_size
+        self.speakers = speakers
+        self.transcript = MultiChannelLiveTranscript(self.splitter.channels, speakers)
+        self.clients = []
+        for channel in range(self.splitter.channels):
+            client = RevAiStreamingClient(
+                access_token, self.splitter.channel_config, version, on_error,
+                lambda code, reason, channel=channel: self.on_close(channel, code, reason),
+                lambda job_id, channel=channel: self.on_connected(channel, job_id))
+            self.clients.append(client)
+        self._error = None
+
+    @property
+    def channels(self):
+        return self.splitter.channels
+
+    def start(self, generator, **start_options):
+        """Starts a session per channel and the thread splitting the audio between them
+
+        :param generator: generator object that yields interleaved binary audio data
+        :param start_options: options of RevAiStreamingClient.start, such as metadata or
+            language, applied to every session
+        :returns: generator of ChannelResponse, holding the channel, speaker label and
+            StreamingPartial or StreamingFinal of each hypothesis as it arrives
+        """
+        if not generator:
+            raise ValueError('generator must be provided')
+        if 'parsed' in start_options:
+            raise ValueError('hypotheses of multi-channel sessions are always parsed')
+
+        self.transcript = MultiChannelLiveTranscript(self.channels, self.speakers)
+        self._error = None
+        senders = [AudioSender(max_queue_size=self.max_queue_size)
+                   for _ in range(self.channels)]
+        responses = queue.Queue()
+        for channel, client in enumerate(self.clients):
+            threading.Thread(target=self._read_responses, daemon=True, args=[
+                channel, client.start(senders[channel], parsed=True, **start_options),
+                responses, senders[channel]]).start()
+
+        self.split_thread = threading.Thread(target=self._split, args=[generator, senders])
+        self.split_thread.daemon = True
+        self.split_thread.start()
+        return self._get_response_generator(responses)
+
+    def end(self):
+        """Ends the sessions of every channel"""
+        for client in self.clients:
+            client.end()
+
+    def _split(self, generator, senders):
+        running = list(senders)
+        try:
+            for chunk in generator:
+                for sender, part in zip(senders, self.splitter.split(chunk)):
+                    if part and sender in running:
+                        try:
+                            sender.put(part)
+                        except ValueError:
+                            # the session of the channel ended and its sender was discarded
+                            running.remove(sender)
+                if not running:
+                    break
+        except Exception as e:
+            self._error = e
+        finally:
+            for sender in running:
+                sender.close()
+
+    @staticmethod
+    def _read_responses(channel, responses, out, sender):
+        try:
+            for response in responses:
+                out.put((channel, response))
+        except Exception as e:
+            out.put((channel, e))
+        finally:
+            # the audio of a session which ended early is no longer sent, so that it does not
+            # hold back the audio of the other channels
+            sender.discard()
+        out.put((channel, _END))
+
+    def _get_response_generator(self, responses):
+        """Yields the hypotheses of all channels, raising errors of the audio or of the
+        sessions once every session has ended"""
+        running = self.channels
+        error = None
+        while running:
+            channel, response = responses.get()
+            if response is _END:
+                running -= 1
+            elif isinstance(response, Exception):
+                error = response
+            else:
+                hypothesis = self.transcript.update(channel, response)
+                if hypothesis is not None:
+                    yield ChannelResponse(channel, self.transcript.speaker_label(channel),
+                                          hypothesis)
+        self.split_thread.join(_SPLIT_JOIN_SECONDS)
+        if error is not None:
+            raise error
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""Websocket frame encoding and decoding as defined by RFC 6455"""
+
+import os
+import struct
+
+from .audio import byte_view
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xa
+
+# GUID appended to the handshake key to compute Sec-WebSocket-Accept
+HANDSHAKE_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+# implementation used to mask payloads: NumPy XORs 32 bit words when it is installed, and
+# python XORs blocks of the payload as big integers otherwise
+MASK_BACKEND = 'numpy' if np is not None else 'python'
+
+# payloads shorter than this are masked in python, as NumPy costs more to set up
+_NUMPY_MIN_LENGTH = 256
+
+# bytes masked at a time in python, a multiple of 4 so that every block starts with the first
+# byte of the mask key
+_PYTHON_BLOCK_SIZE = 1024
+
+
+def mask_payload(mask_key, data):
+    """Returns the payload XORed with the 4 byte mask key
+
+    :param mask_key: 4 bytes mask key
+    :param data: bytes-like payload
+    """
+    length = len(data)
+    if not length:
+        return b''
+    if np is None or length < _NUMPY_MIN_LENGTH:
+        return _mask_python(mask_key, data)
+    masked = bytearray(length)
+    mask_payload_into(mask_key, data, masked)
+    return bytes(masked)
+
+
+def mask_payload_into(mask_key, data, out, offset=0):
+    """Writes the payload XORed with the 4 byte mask key into a buffer
+
+    :param mask_key: 4 bytes mask key
+    :param data: bytes-like payload
+    :param out: writable bytes-like buffer, such as a bytearray, the payload fits in
+    :param offset: position in out to write the payload at
+    """
+    length = len(data)
+    if np is None or length < _NUMPY_MIN_LENGTH:
+        # masked block by block, so that only a block is allocated at a time
+        data = memoryview(byte_view(data))
+        for start in range(0, length, _PYTHON_BLOCK_SIZE):
+            block = data[start:start + _PYTHON_BLOCK_SIZE]
+            out[offset + start:offset + start + len(block)] = _mask_python(mask_key, block)
+        return
+    whole = length - length % 4
+    source = np.frombuffer(data, dtype=np.uint8, count=length)
+    target = np.frombuffer(out, dtype=np.uint8, count=length, offset=offset)
+    # both views share the byte order, so XORing words XORs each byte with its key byte
+    np.bitwise_xor(source[:whole].view(np.uint32), np.frombuffer(mask_key, dtype=np.uint32),
+                   out=target[:whole].view(np.uint32))
+    for index in range(whole, length):
+        target[index] = source[index] ^ mask_key[index % 4]
+
+
+def _mask_python(mask_key, data):
+    length = len(data)
+    repeated = (mask_key * (length // 4 + 1))[:length]
+    masked = int.from_bytes(data, 'little') ^ int.from_bytes(repeated, 'little')
+    return masked.to_bytes(length, 'little')
+
+
+def encode_header(opcode, length, mask_key=None, fin=True):
+    """Returns the header of a frame
+
+    :param opcode: opcode of the frame
+    :param length: length of the payload in bytes
+    :param mask_key: 4 bytes mask key, required for frames sent by clients
+    :param fin: whether this is the final fragment of a message
+    """
+    first = (0x80 if fin else 0) | opcode
+    mask_bit = 0x80 if mask_key is not None else 0
+    if length < 126:
+        header = struct.pack('!BB', first, mask_bit | length)
+    elif length < 1 << 16:
+        header = struct.pack('!BBH', first, mask_bit | 126, length)
+    else:
+        header = struct.pack('!BBQ', first, mask_bit | 127, length)
+    return header + mask_key if mask_key is not None else header
+
+
+def encode_frame(opcode, payload, mask=True, mask_key=None):
+    """Returns a complete frame. Masked payloads are written straight into the frame.
+
+    :param opcode: opcode of the frame
+    :param payload: bytes-like payload, or str for text frames
+    :param mask: whether to mask the payload, as clients must
+    :param mask_key: 4 bytes mask key. A random one is used by default
+    """
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    payload = byte_view(payload)
+    if not mask:
+        return encode_header(opcode, len(payload)) + bytes(payload)
+    if mask_key is None:
+        mask_key = os.urandom(4)
+    header = encode_header(opcode, len(payload), mask_key)
+    frame = bytearray(len(header) + len(payload))
+    frame[:len(header)] = header
+    mask_payload_into(mask_key, payload, frame, len(header))
+    return frame
+
+
+class FrameEncoder:
+    """Encodes masked frames into a buffer reused from one frame to the next.
+
+    The header is packed and the payload masked straight into the buffer, which only grows
+    when a payload does not fit, so encoding a frame does not allocate in proportion to its
+    payload.
+    """
+
+    def __init__(self, capacity=65536):
+        """
+        :param capacity: initial size of the buffer in bytes
+        """
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+
+    @property
+    def capacity(self):
+        return len(self._buffer)
+
+    def encode(self, opcode, payload, mask_key=None):
+        """Returns a memoryview of the frame, which is only valid until the next call
+
+        :param opcode: opcode of the frame
+        :param payload: bytes-like payload of any format
+        :param mask_key: 4 bytes mask key. A random one is used by default
+        """
+        payload = byte_view(payload)
+        length = len(payload)
+        if mask_key is None:
+            mask_key = os.urandom(4)
+        if length < 126:
+            header_length = 6
+        elif length < 1 << 16:
+            header_length = 8
+        else:
+            header_length = 14
+        size = header_length + length
+        if size > len(self._buffer):
+            self._buffer = bytearray(max(size, 2 * len(self._buffer)))
+            self._view = memoryview(self._buffer)
+
+        first = 0x80 | opcode
+        if length < 126:
+            struct.pack_into('!BB4s', self._buffer, 0, first, 0x80 | length, mask_key)
+        elif length < 1 << 16:
+            struct.pack_into('!BBH4s', self._buffer, 0, first, 0x80 | 126, length, mask_key)
+        else:
+            struct.pack_into('!BBQ4s', self._buffer, 0, first, 0x80 | 127, length, mask_key)
+        mask_payload_into(mask_key, payload, self._buffer, header_length)
+        return self._view[:size]
+
+
+def encode_close_payload(code, reason=''):
+    """Returns the payload of a close frame"""
+    return struct.pack('!H', code) + reason.encode('utf-8')
+
+
+def decode_close_payload(data):
+    """Returns the (code, reason) of a close frame payload, or (None, None) if it has no code"""
+    if not data or len(data) < 2:
+        return None, None
+    return struct.unpack('!H', data[:2])[0], bytes(data[2:]).decode('utf-8', 'replace')
+
+
+def parse_header(header):
+    """Parses the first two bytes of a frame
+
+    :returns: tuple of fin, opcode, whether the payload is masked, and the 7 bit length
+    """
+    return bool(header[0] & 0x80), header[0] & 0x0f, bool(header[1] & 0x80), header[1] & 0x7f
@@ -76,6 +76,20 @@ class GenericApiClient(BaseClient):
         :returns: list of jobs response data
         :raises: HTTPError
         """
+        return [self.parse_job_info(job)
+                for job in self.get_list_of_jobs_json(limit, starting_after)]
+
+    def get_list_of_jobs_json(self, limit=None, starting_after=None):
+        """Get a list of jobs submitted within the last 30 days as json.
+        See get_list_of_jobs for details.
+
+        :param limit: optional, limits the number of jobs returned,
+                      if none, a default of 100 jobs is returned, max limit if 1000
+        :param starting_after: optional, returns jobs created after the job with this id,
+                               exclusive (job with this id is not included)
+        :returns: list of jobs as raw json
+        :raises: HTTPError
+        """
         params = []
         if limit is not None:
             params.append('limit={}'.format(limit))
@@ -88,7 +102,7 @@ class GenericApiClient(BaseClient):
             urljoin(self.base_url, 'jobs{}'.format(query))
         )
 
-        return [self.parse_job_info(job) for job in response.json()]
+        return response.json()
 
     def _get_result_json(self, id_, params):
         """Get the result of a job. This method is special in that it is intended to be hidden by
@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+"""Local orchestration of many Rev AI jobs with futures"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+
+from requests.exceptions import ConnectionError, HTTPError, Timeout
+
+from .apiclient import RevAiAPIClient
+from .models import JobStatus
+from .models.asynchronous.summarization_job_status import SummarizationJobStatus
+from .models.asynchronous.translation_job_status import TranslationJobStatus
+
+# States of a result while its job is being processed
+PENDING = 'pending'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class JobFailedError(Exception):
+    """Raised by the future of a job which failed on Rev AI"""
+
+    def __init__(self, job, message=None):
+        """
+        :param job: last known state of the job which failed
+        :param message: optional description of the failure
+        """
+        Exception.__init__(self, message or 'job {} failed: {}'.format(
+            job.id, getattr(job, 'failure_detail', None) or getattr(job, 'failure', None)))
+        self.job = job
+
+
+class TranscriptResult:
+    """Resolves a speech to text job to its Transcript object"""
+
+    def state(self, job):
+        if job.status == JobStatus.FAILED:
+            return FAILED
+        if job.status in (JobStatus.TRANSCRIBED, JobStatus.COMPLETED):
+            return READY
+        return PENDING
+
+    def fetch(self, client, job):
+        return client.get_transcript_object(job.id, offset_map=getattr(job, 'offset_map', None))
+
+
+class SummaryResult(TranscriptResult):
+    """Resolves a speech to text job submitted with summarization_config to its Summary"""
+
+    def state(self, job):
+        state = TranscriptResult.state(self, job)
+        if state != READY:
+            return state
+        if job.summarization is None or job.summarization.status == SummarizationJobStatus.FAILED:
+            return FAILED
+        if job.summarization.status == SummarizationJobStatus.COMPLETED:
+            return READY
+        return PENDING
+
+    def fetch(self, client, job):
+        return client.get_transcript_summary_object(job.id)
+
+
+class TranslationResult(TranscriptResult):
+    """Resolves a speech to text job submitted with translation_config to the Transcript
+    translated to a language"""
+
+    def __init__(self, language):
+        """
+        :param language: language of the translated transcript
+        """
+        self.language = language
+
+    def state(self, job):
+        state = TranscriptResult.state(self, job)
+        if state != READY:
+            return state
+        target_languages = job.translation.target_languages if job.translation else []
+        target = next((tl for tl in target_languages if tl.language == self.language), None)
+        if target is None or target.status == TranslationJobStatus.FAILED:
+            return FAILED
+        if target.status == TranslationJobStatus.COMPLETED:
+            return READY
+        return PENDING
+
+    def fetch(self, client, job):
+        return client.get_translated_transcript_object(
+            job.id, self.language, offset_map=getattr(job, 'offset_map', None))
+
+
+class InsightsResult(TranscriptResult):
+    """Resolves a job of one of the insights or language identification apis to its result
+    object"""
+
+    def __init__(self, **params):
+        """
+        :param params: optional parameters of the client's get_result_object such as threshold
+            or filter_for
+        """
+        self.params = params
+
+    def fetch(self, client, job):
+        return client.get_result_object(job.id, **self.params)
+
+
+class _TrackedJob:
+    """Book keeping of a job submitted through the JobManager"""
+
+    __slots__ = ('future', 'client', 'submit', 'args', 'kwargs', 'result', 'job', 'attempts',
+                 'needs_details', 'busy')
+
+    def __init__(self, future, client, submit, args, kwargs, result):
+        self.future = future
+        self.client = client
+        self.submit = submit
+        self.args = args
+        self.kwargs = kwargs
+        self.result = result
+        self.job = None
+        self.attempts = 0
+        self.needs_details = False
+        self.busy = False
+
+
+class JobManager:
+    """Submits jobs and resolves futures to their final results.
+
+    A single scheduler thread refreshes the status of all jobs, fetching results of finished
+    jobs and retrying failed requests. Status of many jobs of the same client is refreshed
+    with one get_list_of_jobs request, falling back to get_job_details for jobs missing from
+    the list. HTTP requests are run on a small thread pool with a concurrency cap per stage.
+
+    Example::
+
+        with JobManager() as manager:
+            future = manager.submit(client.submit_job_url, 'https://example.com/file.mp3')
+            transcript = future.result()
+    """
+
+    def __init__(self,
+                 poll_interval=10.0,
+                 max_jobs=1000,
+                 max_concurrent_submits=4,
+                 max_concurrent_polls=4,
+                 max_concurrent_fetches=4,
+                 max_retries=3,
+                 retry_backoff=1.0,
+                 list_limit=1000):
+        """Constructor
+
+        :param poll_interval: seconds between status refreshes of a job
+        :param max_jobs: maximum number of unresolved jobs. submit blocks when it is reached
+        :param max_concurrent_submits: maximum number of job submissions in flight
+        :param max_concurrent_polls: maximum number of status requests in flight
+        :param max_concurrent_fetches: maximum number of result requests in flight
+        :param max_retries: number of times a failed status or result request is retried
+        :param retry_backoff: seconds before the first retry, doubled on every further retry
+        :param list_limit: number of jobs requested per get_list_of_jobs call
+        """
+        if poll_interval <= 0:
+            raise ValueError('poll_interval must be positive')
+        if min(max_jobs, max_concurrent_submits, max_concurrent_polls,
+               max_concurrent_fetches) <= 0:
+            raise ValueError('max_jobs and concurrency caps must be positive')
+
+        self.poll_interval = poll_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.list_limit = list_limit
+        self._caps = {'submit': max_concurrent_submits,
+                      'poll': max_concurrent_polls,
+                      'fetch': max_concurrent_fetches}
+        self._in_flight = {stage: 0 for stage in self._caps}
+        self._capacity = threading.BoundedSemaphore(max_jobs)
+        self._condition = threading.Condition()
+        self._to_submit = deque()
+        self._to_fetch = deque()
+        self._schedule = []
+        self._sequence = itertools.count()
+        self._tracked = set()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=sum(self._caps.values()),
+                                            thread_name_prefix='rev_ai-job-manager')
+        self._scheduler = threading.Thread(target=self._run, name='rev_ai-job-scheduler',
+                                           daemon=True)
+        self._scheduler.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, submit_method, *args, result=None, **kwargs):
+        """Submits a job and returns a future resolving to its final result.
+
+        :param submit_method: bound submit method of a client, such as
+            RevAiAPIClient.submit_job_url or TopicExtractionClient.submit_job_from_text
+        :param args: positional arguments of the submit method
+        :param result: optional TranscriptResult, SummaryResult, TranslationResult or
+            InsightsResult describing the result of the job. Defaults to the Transcript for
+            speech to text jobs and to the result object for other apis
+        :param kwargs: keyword arguments of the submit method
+        :returns: concurrent.futures.Future resolving to the result, or raising
+            JobFailedError or the HTTPError of the last failed request
+        :raises: ValueError, RuntimeError
+        """
+        client = getattr(submit_method, '__self__', None)
+        if client is None:
+            raise ValueError('submit_method must be a bound method of a client')
+        if result is None:
+            result = TranscriptResult() if isinstance(client, RevAiAPIClient) \
+                else InsightsResult()
+
+        self._capacity.acquire()
+        future = Future()
+        with self._condition:
+            if self._closed:
+                self._capacity.release()
+                raise RuntimeError('cannot submit jobs after close')
+            tracked = _TrackedJob(future, client, submit_method, args, kwargs, result)
+            self._tracked.add(tracked)
+            self._to_submit.append(tracked)
+            self._condition.notify()
+        future.add_done_callback(lambda _: self._capacity.release())
+        return future
+
+    def close(self, wait=True):
+        """Stops accepting jobs and shuts the scheduler down.
+
+        :param wait: whether to wait for all futures to resolve. Otherwise unresolved futures
+            are cancelled
+        """
+        with self._condition:
+            self._closed = True
+            if not wait:
+                for tracked in self._tracked:
+                    tracked.future.cancel()
+            self._condition.notify()
+        self._scheduler.join()
+        self._executor.shutdown(wait=True)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._discard_cancelled()
+                if self._closed and not self._tracked:
+                    return
+                tasks, timeout = self._next_tasks(time.monotonic())
+                if not tasks:
+                    self._condition.wait(timeout)
+                    continue
+            for task in tasks:
+                self._executor.submit(*task)
+
+    def _discard_cancelled(self):
+        for tracked in [t for t in self._tracked if t.future.cancelled() and not t.busy]:
+            self._tracked.discard(tracked)
+
+    def _next_tasks(self, now):
+        """Returns the tasks to start now and the time to wait for the next one.
+        Must be called with the condition held."""
+        tasks = []
+        while self._to_submit and self._has_capacity('submit'):
+            tracked = self._to_submit.popleft()
+            if not tracked.future.cancelled():
+                tasks.append(self._start('submit', self._submit_job, tracked))
+
+        while self._to_fetch and self._has_capacity('fetch'):
+            tracked = self._to_fetch.popleft()
+            if not tracked.future.cancelled():
+                tasks.append(self._start('fetch', self._fetch_result, tracked))
+
+        due = {}
+        while self._schedule and self._schedule[0][0] <= now and self._has_capacity('poll'):
+            _, _, tracked = heapq.heappop(self._schedule)
+            if tracked.future.cancelled():
+                continue
+            group = due.setdefault(id(tracked.client), [])
+            if not group:
+                # reserve the request which refreshes this client's group
+                self._in_flight['poll'] += 1
+            group.append(tracked)
+        for group in due.values():
+            self._in_flight['poll'] -= 1
+            listed = [t for t in group if not t.needs_details]
+            if len(listed) > 1:
+                tasks.append(self._start('poll', self._refresh_listed, listed))
+                group = [t for t in group if t.needs_details]
+            for tracked in group:
+                if self._has_capacity('poll'):
+                    tasks.append(self._start('poll', self._refresh_details, tracked))
+                else:
+                    self._schedule_poll(tracked, now)
+
+        timeout = None
+        if self._schedule and self._has_capacity('poll'):
+            timeout = max(0.0, self._schedule[0][0] - now)
+        return tasks, timeout
+
+    def _has_capacity(self, stage):
+        return self._in_flight[stage] < self._caps[stage]
+
+    def _start(self, stage, target, argument):
+        self._in_flight[stage] += 1
+        for tracked in argument if isinstance(argument, list) else [argument]:
+            tracked.busy = True
+        return self._run_stage, stage, target, argument
+
+    def _run_stage(self, stage, target, argument):
+        try:
+            target(argument)
+        finally:
+            with self._condition:
+                self._in_flight[stage] -= 1
+                for tracked in argument if isinstance(argument, list) else [argument]:
+                    tracked.busy = False
+                self._condition.notify()
+
+    def _schedule_poll(self, tracked, at):
+        heapq.heappush(self._schedule, (at, next(self._sequence), tracked))
+
+    def _submit_job(self, tracked):
+        try:
+            job = tracked.submit(*tracked.args, **tracked.kwargs)
+        except Exception as err:
+            self._resolve(tracked, exception=err)
+            return
+        tracked.args = tracked.kwargs = None
+        self._update(tracked, job)
+
+    def _refresh_listed(self, group):
+        try:
+            jobs = {job.id: job for job in group[0].client.get_list_of_jobs(limit=self.list_limit)}
+        except Exception:
+            jobs = {}
+        for tracked in group:
+            job = jobs.get(tracked.job.id)
+            if job is None:
+                tracked.needs_details = True
+                with self._condition:
+                    self._schedule_poll(tracked, time.monotonic())
+            else:
+                self._update(tracked, job)
+
+    def _refresh_details(self, tracked):
+        try:
+            job = tracked.client.get_job_details(tracked.job.id)
+        except Exception as err:
+            self._retry(tracked, err)
+            return
+        tracked.needs_details = False
+        self._update(tracked, job)
+
+    def _fetch_result(self, tracked):
+        try:
+            value = tracked.result.fetch(tracked.client, tracked.job)
+        except Exception as err:
+            self._retry(tracked, err)
+            return
+        self._resolve(tracked, value=value)
+
+    def _update(self, tracked, job):
+        if tracked.job is not None and getattr(tracked.job, 'offset_map', None) is not None:
+            job.offset_map = tracked.job.offset_map
+        tracked.job = job
+        state = tracked.result.state(job)
+        if state == FAILED:
+            self._resolve(tracked, exception=JobFailedError(job))
+            return
+        with self._condition:
+            if state == READY:
+                self._to_fetch.append(tracked)
+            else:
+                tracked.attempts = 0
+                self._schedule_poll(tracked, time.monotonic() + self.poll_interval)
+
+    def _retry(self, tracked, err):
+        """Refreshes the job again after a backoff, or fails its future once retries run out"""
+        tracked.attempts += 1
+        if tracked.attempts > self.max_retries or not _is_retryable(err):
+            self._resolve(tracked, exception=err)
+            return
+        with self._condition:
+            tracked.needs_details = True
+            self._schedule_poll(
+                tracked, time.monotonic() + self.retry_backoff * 2 ** (tracked.attempts - 1))
+
+    def _resolve(self, tracked, value=None, exception=None):
+        with self._condition:
+            self._tracked.discard(tracked)
+        try:
+            if exception is not None:
+                tracked.future.set_exception(exception)
+            else:
+                tracked.future.set_result(value)
+        except InvalidStateError:
+            # the future was cancelled by the caller
+            pass
+
+
+def _is_retryable(err):
+    """Returns whether a failed request may succeed when retried"""
+    if isinstance(err, (ConnectionError, Timeout)):
+        return True
+    if isinstance(err, HTTPError):
+        response = err.response
+        return response is None or response.status_code == 429 or response.status_code >= 500
+    return False
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Local SQLite mirror of the jobs of a Rev AI account"""
+
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+from .apiclient import RevAiAPIClient
+from .models import Job, JobStatus
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    api TEXT NOT NULL,
+    id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_on TEXT NOT NULL,
+    completed_on TEXT,
+    metadata TEXT,
+    json TEXT NOT NULL,
+    PRIMARY KEY (api, id)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (api, status, created_on);
+CREATE INDEX IF NOT EXISTS jobs_created_on ON jobs (api, created_on);
+CREATE INDEX IF NOT EXISTS jobs_metadata ON jobs (api, metadata, created_on);
+"""
+
+
+class JobStore:
+    """Mirrors the jobs returned by get_list_of_jobs into a local SQLite database.
+
+    Jobs of the speech to text api and of any of the insights apis can be kept in the same
+    store, each under the name of its api. Once synced, jobs can be queried by status,
+    creation date and metadata without paginating through the api.
+
+    Example::
+
+        with JobStore('jobs.db') as store:
+            store.sync(client)
+            failed = store.query(client, status=JobStatus.FAILED, since=week_ago,
+                                 metadata='campaign-42')
+    """
+
+    def __init__(self, path, page_size=1000):
+        """Constructor
+
+        :param path: path of the SQLite database file, created if missing. ':memory:' keeps the
+            store in memory
+        :param page_size: number of jobs requested per get_list_of_jobs call, at most 1000
+        """
+        if not path:
+            raise ValueError('path must be provided')
+        self.page_size = page_size
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Closes the database connection"""
+        self.connection.close()
+
+    def sync(self, client):
+        """Fetches jobs created since the last sync and refreshes jobs which were in progress.
+
+        The api lists jobs newest first and only pages towards older jobs, so sync can not
+        resume after the newest job id it knows. Pages of get_list_of_jobs are instead read
+        from the newest job back to the creation date of the newest job already in the store,
+        or further back when older jobs in the store were still in progress. Each page is
+        written in a single transaction.
+
+        :param client: RevAiAPIClient or client of one of the insights apis
+        :returns: number of jobs written
+        :raises: HTTPError
+        """
+        api = _api_name(client)
+        stop_before = self._sync_boundary(api)
+        written = 0
+        starting_after = None
+        while True:
+            page = client.get_list_of_jobs_json(self.page_size, starting_after)
+            if not page:
+                break
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO jobs '
+                    '(api, id, status, created_on, completed_on, metadata, json) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(api, job['id'], job['status'].lower(), job['created_on'],
+                      job.get('completed_on'), job.get('metadata'), json.dumps(job))
+                     for job in page])
+            written += len(page)
+            if len(page) < self.page_size or \
+                    (stop_before is not None and page[-1]['created_on'] < stop_before):
+                break
+            starting_after = page[-1]['id']
+        return written
+
+    def query(self, client, status=None, since=None, until=None, metadata=None, limit=None):
+        """Returns jobs from the store, newest first.
+
+        :param client: client whose jobs are queried, used to parse the stored jobs
+        :param status: optional JobStatus or status string the jobs must have
+        :param since: optional datetime or ISO 8601 string, only jobs created at or after it
+        :param until: optional datetime or ISO 8601 string, only jobs created before it
+        :param metadata: optional metadata the jobs must have
+        :param limit: optional maximum number of jobs returned
+        :returns: list of job objects of the client's api
+        """
+        clauses = ['api = ?']
+        params = [_api_name(client)]
+        if status is not None:
+            clauses.append('status = ?')
+            params.append(_status_value(status))
+        if since is not None:
+            clauses.append('created_on >= ?')
+            params.append(_timestamp(since))
+        if until is not None:
+            clauses.append('created_on < ?')
+            params.append(_timestamp(until))
+        if metadata is not None:
+            clauses.append('metadata = ?')
+            params.append(metadata)
+        sql = 'SELECT json FROM jobs WHERE {} ORDER BY created_on DESC'.format(
+            ' AND '.join(clauses))
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        parse = _job_parser(client)
+        return [parse(json.loads(row[0])) for row in self.connection.execute(sql, params)]
+
+    def _sync_boundary(self, api):
+        """Returns the creation date sync must reach back to, or None for a full sync"""
+        newest = self.connection.execute(
+            'SELECT MAX(created_on) FROM jobs WHERE api = ?', (api,)).fetchone()[0]
+        oldest_in_progress = self.connection.execute(
+            'SELECT MIN(created_on) FROM jobs WHERE api = ? AND status = ?',
+            (api, JobStatus.IN_PROGRESS.value)).fetchone()[0]
+        if newest is None:
+            return None
+        return min(newest, oldest_in_progress) if oldest_in_progress else newest
+
+
+def _api_name(client):
+    """Returns the name of the api a client talks to, e.g. speechtotext or topic_extraction"""
+    return urlparse(client.base_url).path.strip('/').split('/')[0]
+
+
+def _job_parser(client):
+    if isinstance(client, RevAiAPIClient):
+        return Job.from_json
+    return client.parse_job_info
+
+
+def _status_value(status):
+    return status.value if isinstance(status, JobStatus) else str(status).lower()
+
+
+def _timestamp(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.strftime('%Y-%m-%dT%H:%M:%S')
+    return value
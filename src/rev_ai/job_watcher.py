@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Asynchronous stream of job status transitions"""
+
+import asyncio
+import heapq
+import itertools
+
+from .models import JobStatus
+
+
+async def watch_jobs(client,
+                     ids,
+                     min_interval=1.0,
+                     max_interval=60.0,
+                     backoff=1.5,
+                     list_limit=1000,
+                     max_list_pages=5,
+                     max_concurrent_requests=8,
+                     executor=None):
+    """Asynchronous iterator of the status transitions of many jobs.
+
+    Yields a (job_id, old_status, new_status, job) event the first time each job is seen,
+    with old_status None, and every time its status changes afterwards. Iteration ends once
+    every job has left the in progress status.
+
+    A single scheduler refreshes all jobs. When several jobs are due at once their status is
+    read from pages of get_list_of_jobs and only jobs missing from those pages are requested
+    one by one with get_job_details. Each job is refreshed at its own interval, which starts
+    at min_interval, grows by backoff every time the status is unchanged and is reset when
+    it changes. Jobs due within min_interval of each other are refreshed together. Requests
+    are run in an executor since the clients are blocking.
+
+    :param client: RevAiAPIClient or any client of the insights apis
+    :param ids: ids of the jobs to watch
+    :param min_interval: seconds between refreshes of a job which just changed status
+    :param max_interval: maximum seconds between refreshes of a job
+    :param backoff: factor the interval of a job grows by when its status is unchanged
+    :param list_limit: number of jobs requested per get_list_of_jobs page
+    :param max_list_pages: maximum number of get_list_of_jobs pages read per refresh
+    :param max_concurrent_requests: maximum number of get_job_details requests in flight
+    :param executor: optional concurrent.futures executor to run requests in. Defaults to the
+        event loop's default executor
+    :raises: HTTPError
+    """
+    if min_interval <= 0 or max_interval < min_interval:
+        raise ValueError('intervals must be positive and min_interval at most max_interval')
+    if backoff < 1:
+        raise ValueError('backoff must be at least 1')
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_concurrent_requests)
+    sequence = itertools.count()
+    statuses = {}
+    intervals = {}
+    schedule = []
+    for id_ in dict.fromkeys(ids):
+        intervals[id_] = min_interval
+        heapq.heappush(schedule, (loop.time(), next(sequence), id_))
+
+    async def call(method, *args):
+        return await loop.run_in_executor(executor, lambda: method(*args))
+
+    async def job_details(id_):
+        async with semaphore:
+            return await call(client.get_job_details, id_)
+
+    async def refresh(due):
+        jobs = {}
+        if len(due) > 1:
+            missing = set(due)
+            starting_after = None
+            for _ in range(max_list_pages):
+                page = await call(client.get_list_of_jobs, list_limit, starting_after)
+                for job in page:
+                    if job.id in missing:
+                        jobs[job.id] = job
+                        missing.discard(job.id)
+                if not missing or len(page) < list_limit:
+                    break
+                starting_after = page[-1].id
+        missing = [id_ for id_ in due if id_ not in jobs]
+        for job in await asyncio.gather(*[job_details(id_) for id_ in missing]):
+            jobs[job.id] = job
+        return jobs
+
+    while schedule:
+        delay = schedule[0][0] - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        # jobs due shortly are refreshed early so that they share the list requests
+        horizon = loop.time() + min_interval
+        due = []
+        while schedule and schedule[0][0] <= horizon:
+            due.append(heapq.heappop(schedule)[2])
+
+        jobs = await refresh(due)
+        for id_ in due:
+            job = jobs[id_]
+            old_status = statuses.get(id_)
+            if old_status is None or job.status != old_status:
+                statuses[id_] = job.status
+                intervals[id_] = min_interval
+                yield id_, old_status, job.status, job
+            else:
+                intervals[id_] = min(max_interval, intervals[id_] * backoff)
+            if job.status == JobStatus.IN_PROGRESS:
+                heapq.heappush(schedule, (loop.time() + intervals[id_], next(sequence), id_))
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""Spotting of keyword phrases in streaming hypotheses with an Aho-Corasick automaton"""
+
+import json
+import string
+from collections import deque, namedtuple
+
+from .models.streaming.hypothesis import StreamingFinal, StreamingHypothesis, \
+    parse_streaming_response
+
+KeywordMatch = namedtuple('KeywordMatch', ['phrase', 'start_ts', 'end_ts', 'final'])
+
+_STRIP = string.punctuation + string.whitespace
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over the words of a list of phrases.
+
+    Phrases are matched on whole words, ignoring the punctuation around them and, unless
+    case_sensitive is set, their case. The automaton is compiled once and can be shared by
+    the KeywordSpotters of many sessions.
+    """
+
+    def __init__(self, phrases, case_sensitive=False):
+        """
+        :param phrases: iterable of the phrases to spot
+        :param case_sensitive: whether words have to match in case
+        :raises: ValueError if no phrase has a word
+        """
+        self.case_sensitive = case_sensitive
+        self.phrases = []
+        # transitions, failure link and phrases ending at every state
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for phrase in phrases:
+            words = self.words(phrase)
+            if not words:
+                continue
+            state = 0
+            for word in words:
+                following = self._goto[state].get(word)
+                if following is None:
+                    following = len(self._goto)
+                    self._goto[state][word] = following
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = following
+            # phrases with the same words are spotted once, as the first of them
+            if not self._output[state]:
+                self._output[state] = ((len(self.phrases), len(words)),)
+                self.phrases.append(phrase)
+        if not self.phrases:
+            raise ValueError('phrases must contain at least one word')
+        self._link()
+
+    @property
+    def states(self):
+        return len(self._goto)
+
+    def words(self, text):
+        """Returns the normalized words of a text"""
+        words = (word.strip(_STRIP) for word in text.split())
+        if not self.case_sensitive:
+            words = (word.lower() for word in words)
+        return [word for word in words if word]
+
+    def normalize(self, word):
+        """Returns a word as it is matched, or an empty string for punctuation"""
+        word = word.strip(_STRIP)
+        return word if self.case_sensitive else word.lower()
+
+    def step(self, state, word):
+        """Returns the state reached from state with a normalized word"""
+        while True:
+            following = self._goto[state].get(word)
+            if following is not None:
+                return following
+            if state == 0:
+                return 0
+            state = self._fail[state]
+
+    def output(self, state):
+        """Returns the (phrase index, number of words) of the phrases ending at a state"""
+        return self._output[state]
+
+    def scan(self, text):
+        """Returns the phrases found in a text, in the order they end"""
+        state = 0
+        found = []
+        for word in self.words(text):
+            state = self.step(state, word)
+            found.extend(self.phrases[index] for index, _ in self._output[state])
+        return found
+
+    def _link(self):
+        """Sets the failure links breadth first, and extends the output of every state with
+        the output of its failure link"""
+        pending = deque()
+        for following in self._goto[0].values():
+            pending.append(following)
+        while pending:
+            state = pending.popleft()
+            for word, following in self._goto[state].items():
+                pending.append(following)
+                fallback = self._fail[state]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[following] = self._goto[fallback].get(word, 0)
+                self._output[following] += self._output[self._fail[following]]
+
+
+class KeywordSpotter:
+    """Spots the phrases of a KeywordAutomaton in the hypotheses of one streaming session.
+
+    Partial hypotheses repeat the words of the utterance so far, so the automaton state after
+    every word is kept and only the words that differ from the previous partial are scanned.
+    A phrase in partials is reported once it has been seen at the same position in debounce
+    consecutive partials, so that words revised by a later partial are not reported. Every
+    phrase in a final hypothesis is reported with final set, including the ones reported
+    from partials before.
+    """
+
+    def __init__(self, phrases, debounce=2, case_sensitive=False):
+        """
+        :param phrases: KeywordAutomaton, or iterable of phrases to compile into one
+        :param debounce: number of consecutive partials a phrase must be seen in before it is
+            reported, or 0 to only report phrases of final hypotheses
+        :param case_sensitive: whether words have to match in case, when phrases are compiled
+        :raises: ValueError
+        """
+        if debounce < 0:
+            raise ValueError('debounce must not be negative')
+        if not isinstance(phrases, KeywordAutomaton):
+            phrases = KeywordAutomaton(phrases, case_sensitive)
+        self.automaton = phrases
+        self.debounce = debounce
+        self.words_scanned = 0
+        self.matches = []
+        self._reset()
+
+    def update(self, response):
+        """Scans a response of a streaming client
+
+        :param response: json string, decoded dict, StreamingPartial or StreamingFinal.
+            Other messages are ignored
+        :returns: list of the KeywordMatch reported for this response
+        """
+        if isinstance(response, (str, bytes)):
+            if not response:
+                return []
+            response = json.loads(response)
+        if isinstance(response, dict):
+            response = parse_streaming_response(response)
+        if not isinstance(response, StreamingHypothesis):
+            return []
+
+        words = [(self.automaton.normalize(element.value), element)
+                 for element in response.elements if element.type_ != 'punct']
+        words = [(word, element) for word, element in words if word]
+        found = self._scan(words)
+        final = isinstance(response, StreamingFinal)
+
+        reported = []
+        if final:
+            reported = [self._match(key, words, True) for key in sorted(found, key=_end_first)]
+            self._reset()
+        elif self.debounce:
+            self._seen = {key: self._seen.get(key, 0) + 1 for key in found}
+            for key in sorted(found, key=_end_first):
+                if self._seen[key] >= self.debounce and key not in self._reported:
+                    self._reported.add(key)
+                    reported.append(self._match(key, words, False))
+        self.matches.extend(reported)
+        return reported
+
+    def _scan(self, words):
+        """Advances the automaton over the words that differ from the previous hypothesis
+        and returns the (phrase index, position of its last word) of every phrase found"""
+        common = 0
+        limit = min(len(words), len(self._words))
+        while common < limit and words[common][0] == self._words[common]:
+            common += 1
+        if common < len(self._words):
+            del self._words[common:]
+            del self._states[common + 1:]
+            self._found = set(key for key in self._found if key[1][0] < common)
+
+        state = self._states[-1]
+        for end in range(common, len(words)):
+            state = self.automaton.step(state, words[end][0])
+            self._words.append(words[end][0])
+            self._states.append(state)
+            self._found.update((index, (end, size))
+                               for index, size in self.automaton.output(state))
+        self.words_scanned += len(words) - common
+        return self._found
+
+    def _match(self, key, words, final):
+        index, (end, size) = key
+        return KeywordMatch(self.automaton.phrases[index], words[end - size + 1][1].timestamp,
+                            words[end][1].end_timestamp, final)
+
+    def _reset(self):
+        """Starts a new utterance, as the partials after a final only cover the audio after
+        it"""
+        self._words = []
+        self._states = [0]
+        self._found = set()
+        self._seen = {}
+        self._reported = set()
+
+
+def _end_first(key):
+    index, (end, size) = key
+    return end, -size, index
@@ -7,3 +7,5 @@ from .job_status import JobStatus
 from .account import Account
 from .transcript import Transcript, Monologue, Element
 from .speaker_name import SpeakerName
+from .offset_map import OffsetMap
+from .silence_trim_options import SilenceTrimOptions
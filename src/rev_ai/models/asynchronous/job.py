@@ -2,6 +2,7 @@
 """Job model"""
 from .summarization_options import Summarization
 from .job_status import JobStatus
+from .offset_map import OffsetMap
 from .translation_options import Translation
 
 
@@ -32,7 +33,8 @@ class Job:
             speakers_count=None,
             diarization_type=None,
             summarization: Summarization = None,
-            translation: Translation = None):
+            translation: Translation = None,
+            offset_map: OffsetMap = None):
         """
         :param id_: unique id of job
         :param created_on: date and time at which this job was started
@@ -64,6 +66,10 @@ class Job:
             appear in the transcript.
         :param speakers_count: Use to specify the total number of unique speakers in the audio.
         :param diarization_type: Use to specify diarization type.
+        :param summarization: summarization options and status if requested
+        :param translation: translation options and status if requested
+        :param offset_map: client side OffsetMap of the silences removed before upload, only set
+            on jobs submitted with silence trimming
         """
         self.id = id_
         self.created_on = created_on
@@ -93,6 +99,7 @@ class Job:
         self.diarization_type = diarization_type
         self.summarization = summarization
         self.translation = translation
+        self.offset_map = offset_map
 
     def __eq__(self, other):
         """Override default equality operator"""
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Offset map model"""
+
+from bisect import bisect_left, bisect_right
+
+from .transcript import Element, Monologue, Transcript
+
+
+class OffsetMap:
+    """Maps times in media that had silences removed back to times in the original media.
+
+    The map is a list of kept segments, each given as the time the segment starts in the
+    trimmed media and the time it starts in the original media.
+    """
+
+    def __init__(self, segments):
+        """
+        :param segments: list of (trimmed_start, original_start) pairs in seconds, ordered by
+            trimmed_start
+        """
+        self.segments = [tuple(segment) for segment in segments]
+        self._trimmed_starts = [trimmed for trimmed, _ in self.segments]
+
+    def __eq__(self, other):
+        """Override default equality operator"""
+        if isinstance(other, self.__class__):
+            return self.segments == other.segments
+        return False
+
+    def append(self, trimmed_start, original_start):
+        """Adds a segment starting after the existing ones. The segment is stored before its
+        start is indexed, so that a map being extended can be read from another thread."""
+        self.segments.append((trimmed_start, original_start))
+        self._trimmed_starts.append(trimmed_start)
+
+    def to_original(self, timestamp, is_end=False):
+        """Returns the time in the original media of a time in the trimmed media
+
+        :param timestamp: time in seconds in the trimmed media
+        :param is_end: whether the time ends an interval. End times falling exactly on the
+            boundary between two segments are mapped to the end of the earlier segment
+        """
+        if timestamp is None or not self.segments:
+            return timestamp
+        if is_end:
+            index = bisect_left(self._trimmed_starts, timestamp) - 1
+        else:
+            index = bisect_right(self._trimmed_starts, timestamp) - 1
+        trimmed_start, original_start = self.segments[max(index, 0)]
+        return original_start + (timestamp - trimmed_start)
+
+    def remap_transcript(self, transcript):
+        """Returns a copy of the transcript with timestamps on the original timeline
+
+        :param transcript: Transcript of the trimmed media
+        """
+        return Transcript([
+            Monologue(
+                monologue.speaker,
+                [Element(element.type_,
+                         element.value,
+                         self.to_original(element.timestamp),
+                         self.to_original(element.end_timestamp, is_end=True),
+                         element.confidence) for element in monologue.elements],
+                monologue.speaker_info)
+            for monologue in transcript.monologues])
+
+    def to_dict(self):
+        """Returns the raw form of the offset map so that it can be stored"""
+        return {'segments': [list(segment) for segment in self.segments]}
+
+    @classmethod
+    def from_json(cls, json):
+        """Alternate constructor used for parsing json"""
+        if json is None:
+            return None
+        return cls(json.get('segments', []))
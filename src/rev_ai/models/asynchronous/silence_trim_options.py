@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Silence trimming request options"""
+
+
+class SilenceTrimOptions:
+    """Options for removing long silences from PCM WAV media before it is uploaded."""
+
+    def __init__(
+            self,
+            threshold_db: float = -45.0,
+            min_silence_seconds: float = 1.0,
+            padding_seconds: float = 0.2,
+            frame_seconds: float = 0.02):
+        """
+        :param threshold_db: frames with an RMS level below this many dBFS are silent
+        :param min_silence_seconds: only silences at least this long are cut
+        :param padding_seconds: silence kept on each side of a cut so words are not clipped
+        :param frame_seconds: duration of the frames the energy is computed over
+        """
+        if frame_seconds <= 0:
+            raise ValueError('frame_seconds must be positive')
+        if padding_seconds < 0:
+            raise ValueError('padding_seconds must not be negative')
+        if min_silence_seconds < 2 * padding_seconds:
+            raise ValueError('min_silence_seconds must be at least twice padding_seconds')
+
+        self.threshold_db = threshold_db
+        self.min_silence_seconds = min_silence_seconds
+        self.padding_seconds = padding_seconds
+        self.frame_seconds = frame_seconds
@@ -2,3 +2,5 @@
 """Streaming Models"""
 
 from .mediaconfig import MediaConfig
+from .hypothesis import StreamingElement, StreamingHypothesis, StreamingPartial, StreamingFinal
+from .live_transcript import LiveTranscript, MultiChannelLiveTranscript
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Streaming hypothesis models"""
+
+
+class StreamingElement:
+    """Word or punctuation of a streaming hypothesis"""
+
+    __slots__ = ('type_', 'value', 'timestamp', 'end_timestamp', 'confidence')
+
+    def __init__(self, type_, value, timestamp=None, end_timestamp=None, confidence=None):
+        """
+        :param type_: type of element: text, punct, or unknown
+        :param value: value of the element
+        :param timestamp: time at which this element starts in the audio. Only present on
+            partials when detailed_partials is enabled
+        :param end_timestamp: time at which this element ends in the audio
+        :param confidence: confidence in this output
+        """
+        self.type_ = type_
+        self.value = value
+        self.timestamp = timestamp
+        self.end_timestamp = end_timestamp
+        self.confidence = confidence
+
+    def __eq__(self, other):
+        """Override default equality operator"""
+        if isinstance(other, self.__class__):
+            return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+        return False
+
+    def __repr__(self):
+        return '{}({!r}, {!r}, {!r}, {!r}, {!r})'.format(
+            self.__class__.__name__, self.type_, self.value, self.timestamp,
+            self.end_timestamp, self.confidence)
+
+    def to_dict(self):
+        """Returns the raw form of the element as the api returns them"""
+        json = {'type': self.type_, 'value': self.value}
+        if self.timestamp is not None:
+            json['ts'] = self.timestamp
+        if self.end_timestamp is not None:
+            json['end_ts'] = self.end_timestamp
+        if self.confidence is not None:
+            json['confidence'] = self.confidence
+        return json
+
+    @classmethod
+    def from_json(cls, json):
+        """Alternate constructor used for parsing json"""
+        return cls(
+            json.get('type'),
+            json.get('value'),
+            json.get('ts'),
+            json.get('end_ts'),
+            json.get('confidence'))
+
+
+class StreamingHypothesis:
+    """Base of the hypotheses sent by the streaming api"""
+
+    __slots__ = ('timestamp', 'end_timestamp', 'elements')
+
+    type_ = None
+
+    def __init__(self, timestamp, end_timestamp, elements):
+        """
+        :param timestamp: time at which the hypothesis starts in the audio
+        :param end_timestamp: time at which the hypothesis ends in the audio
+        :param elements: list of StreamingElement
+        """
+        self.timestamp = timestamp
+        self.end_timestamp = end_timestamp
+        self.elements = elements
+
+    def __eq__(self, other):
+        """Override default equality operator"""
+        if isinstance(other, self.__class__):
+            return self.timestamp == other.timestamp \
+                and self.end_timestamp == other.end_timestamp \
+                and self.elements == other.elements
+        return False
+
+    def __repr__(self):
+        return '{}({!r}, {!r}, {!r})'.format(
+            self.__class__.__name__, self.timestamp, self.end_timestamp, self.elements)
+
+    def to_dict(self):
+        """Returns the raw form of the hypothesis as the api returns them"""
+        return {'type': self.type_, 'ts': self.timestamp, 'end_ts': self.end_timestamp,
+                'elements': [element.to_dict() for element in self.elements]}
+
+    @classmethod
+    def from_json(cls, json):
+        """Alternate constructor used for parsing json"""
+        return cls(
+            json.get('ts'),
+            json.get('end_ts'),
+            [StreamingElement.from_json(element) for element in json.get('elements', [])])
+
+
+class StreamingPartial(StreamingHypothesis):
+    """Partial hypothesis, which may be revised by later hypotheses"""
+
+    __slots__ = ()
+
+    type_ = 'partial'
+
+
+class StreamingFinal(StreamingHypothesis):
+    """Final hypothesis of a section of audio"""
+
+    __slots__ = ()
+
+    type_ = 'final'
+
+
+def parse_streaming_response(json):
+    """Returns the StreamingPartial or StreamingFinal of a decoded streaming response, or the
+    decoded response itself if its type is unknown"""
+    type_ = json.get('type')
+    if type_ == StreamingFinal.type_:
+        return StreamingFinal.from_json(json)
+    if type_ == StreamingPartial.type_:
+        return StreamingPartial.from_json(json)
+    return json
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""Live transcript assembled from streaming hypotheses"""
+
+import bisect
+import json
+
+from ..asynchronous.transcript import Transcript, Monologue, Element, SpeakerInfo
+from .hypothesis import StreamingHypothesis, StreamingFinal, parse_streaming_response
+
+
+class LiveTranscript:
+    """Transcript kept up to date as streaming responses arrive.
+
+    Final hypotheses are appended and the latest partial hypothesis replaces the previous
+    one. The final text is kept as one string extended with the text of each final, so that
+    an update only costs the size of the message, and current_text is that string followed by
+    the latest partial.
+    """
+
+    def __init__(self, speaker=0):
+        """
+        :param speaker: speaker of the monologue returned by to_transcript
+        """
+        self.speaker = speaker
+        self.elements = []
+        self.finals = 0
+        self.partial = None
+        self._final_text = ''
+        self._partial_text = ''
+        self._current_text = ''
+        self._dirty = False
+
+    @property
+    def final_length(self):
+        """Number of characters of the final text"""
+        return len(self._final_text)
+
+    def update(self, response):
+        """Adds a response of a streaming client
+
+        :param response: json string, decoded dict, StreamingPartial or StreamingFinal.
+            Other messages are ignored
+        :returns: the hypothesis, or None if the response was not a hypothesis
+        """
+        if isinstance(response, (str, bytes)):
+            if not response:
+                return None
+            response = json.loads(response)
+        if isinstance(response, dict):
+            response = parse_streaming_response(response)
+        if not isinstance(response, StreamingHypothesis):
+            return None
+
+        if isinstance(response, StreamingFinal):
+            self.elements.extend(response.elements)
+            self.finals += 1
+            text = hypothesis_text(response)
+            if text:
+                self._final_text += ' ' + text if self._final_text else text
+            self.partial = None
+            self._partial_text = ''
+        else:
+            self.partial = response
+            self._partial_text = hypothesis_text(response)
+        self._dirty = True
+        return response
+
+    def final_text(self):
+        """Returns the text of the final hypotheses"""
+        return self._final_text
+
+    def text_since(self, offset):
+        """Returns the text of the final hypotheses after offset characters. Passing the
+        final_length read after the previous call returns the text finalized since.
+
+        :param offset: number of characters of the final text already consumed
+        :raises: ValueError if offset is not within the final text
+        """
+        if not 0 <= offset <= self.final_length:
+            raise ValueError('offset must be between 0 and final_length')
+        return self._final_text[offset:]
+
+    def partial_text(self):
+        """Returns the text of the latest partial hypothesis"""
+        return self._partial_text
+
+    def current_text(self):
+        """Returns the text of the final hypotheses followed by the latest partial"""
+        if self._dirty:
+            if self._final_text and self._partial_text:
+                self._current_text = self._final_text + ' ' + self._partial_text
+            else:
+                self._current_text = self._final_text or self._partial_text
+            self._dirty = False
+        return self._current_text
+
+    def to_transcript(self, include_partial=False):
+        """Returns the transcript in the models used by the asynchronous api
+
+        :param include_partial: whether to include the elements of the latest partial
+        """
+        elements = self.elements
+        if include_partial and self.partial is not None:
+            elements = elements + self.partial.elements
+        return Transcript([Monologue(self.speaker, _transcript_elements(elements))])
+
+
+class MultiChannelLiveTranscript:
+    """Live transcript of audio whose channels are transcribed by separate sessions, such as
+    the agent and customer of a call.
+
+    Each channel keeps its own LiveTranscript, whose speaker is the index of the channel.
+    Final hypotheses of all channels are also kept ordered by their timestamp, so that the
+    merged transcript reads as turns of the speakers even though the sessions answer at
+    their own pace.
+    """
+
+    def __init__(self, channels, speakers=None):
+        """
+        :param channels: number of channels
+        :param speakers: optional list of the display names of the speaker of each channel
+        :raises: ValueError
+        """
+        if channels < 1:
+            raise ValueError('channels must be at least 1')
+        if speakers is not None and len(speakers) != channels:
+            raise ValueError('speakers must name every channel')
+        self.speakers = list(speakers) if speakers is not None else None
+        self.channels = [LiveTranscript(channel) for channel in range(channels)]
+        # (timestamp, channel, arrival) keys and StreamingFinal of every final, sorted
+        self._keys = []
+        self._finals = []
+
+    def update(self, channel, response):
+        """Adds a response of the session of a channel
+
+        :param channel: index of the channel
+        :param response: response accepted by LiveTranscript.update
+        :returns: the hypothesis, or None if the response was not a hypothesis
+        """
+        hypothesis = self.channels[channel].update(response)
+        if isinstance(hypothesis, StreamingFinal) and hypothesis.elements:
+            key = (hypothesis.timestamp or 0, channel, len(self._keys))
+            index = bisect.bisect(self._keys, key)
+            self._keys.insert(index, key)
+            self._finals.insert(index, hypothesis)
+        return hypothesis
+
+    def speaker_label(self, channel):
+        """Returns the display name of the speaker of a channel"""
+        if self.speakers is not None:
+            return self.speakers[channel]
+        return 'Speaker {}'.format(channel)
+
+    def turns(self, include_partials=False):
+        """Returns the (channel, text) of the turns of the speakers, ordered by timestamp.
+        Consecutive finals of a channel make one turn.
+
+        :param include_partials: whether to end with the latest partial of every channel
+        """
+        turns = []
+        for (_, channel, _), final in zip(self._keys, self._finals):
+            text = hypothesis_text(final)
+            if turns and turns[-1][0] == channel:
+                turns[-1] = (channel, turns[-1][1] + ' ' + text)
+            else:
+                turns.append((channel, text))
+        if include_partials:
+            partials = sorted((live.partial.timestamp or 0, channel)
+                              for channel, live in enumerate(self.channels)
+                              if live.partial is not None and live.partial_text())
+            turns.extend((channel, self.channels[channel].partial_text())
+                         for _, channel in partials)
+        return turns
+
+    def current_text(self):
+        """Returns the turns, with the latest partials, as lines labelled with the speaker"""
+        return '\n'.join('{}: {}'.format(self.speaker_label(channel), text)
+                         for channel, text in self.turns(include_partials=True))
+
+    def to_transcript(self):
+        """Returns the final hypotheses as a Transcript with a monologue per turn, the speaker
+        of which is the index of the channel"""
+        monologues = []
+        for (_, channel, _), final in zip(self._keys, self._finals):
+            if monologues and monologues[-1].speaker == channel:
+                monologues[-1].elements.extend(_transcript_elements(final.elements))
+                continue
+            speaker_info = None
+            if self.speakers is not None:
+                speaker_info = SpeakerInfo(str(channel), self.speakers[channel])
+            monologues.append(Monologue(channel, _transcript_elements(final.elements),
+                                        speaker_info))
+        return Transcript(monologues)
+
+
+def _transcript_elements(elements):
+    """Returns StreamingElements as the Elements of the asynchronous api"""
+    return [Element(element.type_, element.value, element.timestamp, element.end_timestamp,
+                    element.confidence)
+            for element in elements]
+
+
+def hypothesis_text(hypothesis):
+    """Returns the text of a hypothesis. Finals carry their own spacing as punctuation
+    elements while the words of partials are separated by spaces."""
+    values = [element.value for element in hypothesis.elements]
+    if any(element.type_ == 'punct' for element in hypothesis.elements):
+        return ''.join(values).strip()
+    return ' '.join(values)
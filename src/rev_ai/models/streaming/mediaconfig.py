@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 """Media Config Model """
 
+import re
+
 
 class MediaConfig:
     def __init__(self, content_type='audio/*', layout=None, rate=None,
@@ -29,3 +31,21 @@ class MediaConfig:
             (';rate={}'.format(self.rate) if self.rate else '') + \
             (';format={}'.format(self.format) if self.format else '') + \
             (';channels={}'.format(self.channels) if self.channels else '')
+
+    def get_sample_width(self):
+        """Returns the number of bytes of one sample of one channel, or None if the format is
+            not a raw format such as S16LE or F32LE
+        """
+        match = re.match(r'^[SUF](8|16|24|32|64)(LE|BE)?$', self.format or '')
+        if not match:
+            return None
+        return int(match.group(1)) // 8
+
+    def get_bytes_per_second(self):
+        """Returns the number of bytes of one second of audio, or None if it can not be
+            derived from the rate, channels and format
+        """
+        sample_width = self.get_sample_width()
+        if not sample_width or not self.rate:
+            return None
+        return int(self.rate) * int(self.channels or 1) * sample_width
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Streaming multipart request bodies used to upload media to Rev AI"""
+
+import io
+import os
+import uuid
+
+from .audio import byte_view
+
+# Size of the chunks read from file-like media sources
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class MultipartMediaBody:
+    """Iterable multipart/form-data body containing job options and a media part.
+
+    The media is never read into memory as a whole. It can be any of the following:
+
+    * an object supporting the buffer protocol, such as bytes, bytearray, memoryview or mmap
+    * a readable file-like object
+    * an iterable yielding chunks of bytes
+
+    The length of the body is known when the media is a buffer, when it is a seekable file or
+    when content_length is provided. Otherwise the length is None, len() raises a TypeError and
+    the body is sent with chunked transfer encoding.
+    """
+
+    def __init__(self, media, options, filename=None, content_length=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        """Constructor
+
+        :param media: media source to upload
+        :param options: serialized job options sent in the "options" part
+        :param filename: optional name of the media, inferred from the media source when possible
+        :param content_length: optional length of the media in bytes. Required to send a
+            Content-Length for iterables, ignored for buffers
+        :param chunk_size: size of the chunks read from file-like media
+        """
+        if media is None:
+            raise ValueError('media must be provided')
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be positive')
+
+        self.boundary = uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        self._media = media
+        self._buffer = _as_buffer(media)
+        self._media_length = self._get_media_length(content_length)
+        self._head = self._build_head(options, filename or _infer_filename(media))
+        self._tail = '\r\n--{}--\r\n'.format(self.boundary).encode('utf-8')
+        self._consumed = False
+
+    @property
+    def content_type(self):
+        """Value of the Content-Type header for this body"""
+        return 'multipart/form-data; boundary={}'.format(self.boundary)
+
+    @property
+    def length(self):
+        """Total length of the body in bytes, or None if the media length is unknown"""
+        if self._media_length is None:
+            return None
+        return len(self._head) + self._media_length + len(self._tail)
+
+    def __bool__(self):
+        return True
+
+    def __len__(self):
+        length = self.length
+        if length is None:
+            raise TypeError('length of the media is unknown')
+        return length
+
+    def __iter__(self):
+        if self._consumed:
+            raise RuntimeError('multipart body can only be iterated once')
+        self._consumed = True
+
+        yield self._head
+        for chunk in self._iter_media():
+            if len(chunk):
+                yield chunk
+        yield self._tail
+
+    def _iter_media(self):
+        if self._buffer is not None:
+            try:
+                for start in range(0, len(self._buffer), self.chunk_size):
+                    yield self._buffer[start:start + self.chunk_size]
+            finally:
+                # release the export so that the caller can close or resize the media
+                self._buffer.release()
+        elif hasattr(self._media, 'read'):
+            while True:
+                chunk = self._media.read(self.chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        else:
+            for chunk in self._media:
+                yield chunk
+
+    def _get_media_length(self, content_length):
+        if self._buffer is not None:
+            return self._buffer.nbytes
+        if content_length is not None:
+            return content_length
+        if hasattr(self._media, 'read'):
+            return _remaining_file_length(self._media)
+        return None
+
+    def _build_head(self, options, filename):
+        return (
+            '--{0}\r\n'
+            'Content-Disposition: form-data; name="options"\r\n\r\n'
+            '{1}\r\n'
+            '--{0}\r\n'
+            'Content-Disposition: form-data; name="media"; filename="{2}"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n'
+        ).format(self.boundary, options, filename.replace('"', '%22')).encode('utf-8')
+
+
+def _as_buffer(media):
+    """Returns a flat byte memoryview of the media if it supports the buffer protocol. Media
+    that is not contiguous, such as a sliced NumPy array, is copied"""
+    try:
+        return memoryview(byte_view(media))
+    except TypeError:
+        return None
+
+
+def _remaining_file_length(file):
+    """Returns the number of bytes left to read in a file-like object, or None if unknown"""
+    try:
+        position = file.tell()
+        try:
+            size = os.fstat(file.fileno()).st_size
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            size = file.seek(0, io.SEEK_END)
+            file.seek(position)
+        return max(0, size - position)
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def _infer_filename(media):
+    name = getattr(media, 'name', None)
+    if isinstance(name, str) and name:
+        return os.path.basename(name)
+    return 'media'
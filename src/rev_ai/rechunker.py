@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Re-chunking of streamed audio into chunks of a fixed duration"""
+
+from .ring_buffer import RingBuffer
+
+
+class AudioRechunker:
+    """Coalesces small chunks and splits large ones so that every chunk sent, but the last,
+    holds the same duration of audio.
+
+    Audio is staged in a RingBuffer allocated once, so coalescing many small frames does not
+    allocate intermediate objects.
+    """
+
+    def __init__(self, config=None, chunk_seconds=0.1, chunk_size=None, reuse_buffer=False):
+        """
+        :param config: MediaConfig of the audio, used to compute the chunk size from
+            chunk_seconds
+        :param chunk_seconds: duration of audio in each chunk
+        :param chunk_size: number of bytes in each chunk, for formats the duration can not
+            be computed from. Takes precedence over chunk_seconds
+        :param reuse_buffer: whether to yield memoryviews of a single output buffer, which
+            are only valid until the next chunk is requested, instead of new bytes objects
+        :raises: ValueError
+        """
+        if chunk_size is None:
+            bytes_per_second = config.get_bytes_per_second() if config else None
+            if not bytes_per_second:
+                raise ValueError('config must provide the rate and a raw format '
+                                 'when chunk_size is not provided')
+            if chunk_seconds <= 0:
+                raise ValueError('chunk_seconds must be positive')
+            frame_size = config.get_sample_width() * int(config.channels or 1)
+            chunk_size = max(frame_size,
+                             int(bytes_per_second * chunk_seconds) // frame_size * frame_size)
+        elif chunk_size < 1:
+            raise ValueError('chunk_size must be at least 1')
+
+        self.chunk_size = chunk_size
+        self.reuse_buffer = reuse_buffer
+        self._ring = RingBuffer(chunk_size * 2)
+        self._out = bytearray(chunk_size)
+        self._out_view = memoryview(self._out)
+
+    def feed(self, data):
+        """Adds audio, yielding every chunk it completes"""
+        data = memoryview(data).cast('B')
+        while len(data):
+            written = self._ring.write(data)
+            data = data[written:]
+            while len(self._ring) >= self.chunk_size:
+                yield self._read(self.chunk_size)
+
+    def flush(self):
+        """Yields the audio left over in the buffer, if any"""
+        if len(self._ring):
+            yield self._read(len(self._ring))
+
+    def rechunk(self, generator):
+        """Re-chunks the audio of an iterable"""
+        for data in generator:
+            for chunk in self.feed(data):
+                yield chunk
+        for chunk in self.flush():
+            yield chunk
+
+    async def rechunk_async(self, generator):
+        """Re-chunks the audio of an async iterable"""
+        async for data in generator:
+            for chunk in self.feed(data):
+                yield chunk
+        for chunk in self.flush():
+            yield chunk
+
+    def _read(self, size):
+        if not self.reuse_buffer:
+            return self._ring.read(size)
+        self._ring.read_into(self._out_view, size)
+        return self._out_view[:size]
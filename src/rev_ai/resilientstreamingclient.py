@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""StreamingClient which reconnects and resumes when the websocket drops"""
+
+import json
+import threading
+import time
+
+import six
+import websocket
+
+from . import framing
+from .audio import byte_view
+from .models.streaming.hypothesis import parse_streaming_response
+from .ring_buffer import RingBuffer
+from .streamingclient import RevAiStreamingClient, _WebSocket, _build_streaming_url, on_error, \
+    on_close, on_connected
+
+# close codes after which the session is resumed rather than ended
+RECONNECT_CLOSE_CODES = (1001, 1006, 1011, 1012, 1013, 1014)
+
+# tolerance, in seconds, when comparing hypothesis timestamps
+_EPSILON = 1e-6
+
+
+class ResilientRevAiStreamingClient(RevAiStreamingClient):
+    def __init__(self,
+                 access_token,
+                 config,
+                 version='v1',
+                 on_error=on_error,
+                 on_close=on_close,
+                 on_connected=on_connected,
+                 max_reconnects=5,
+                 replay_seconds=30.0,
+                 reconnect_backoff=0.5):
+        """Constructor for the resilient Streaming Client.
+
+        The most recent replay_seconds of audio sent are kept in a ring buffer. If the
+        connection drops, a new streaming job is started with start_ts set to the end of the
+        last final hypothesis and the audio after it is sent again. Hypotheses that overlap
+        audio already finalized are dropped, so responses continue through the same
+        generator with consistent timestamps.
+
+        :param access_token: access token which authorizes all requests and
+            links them to your account. Generated on the settings page of your
+            account dashboard on Rev AI.
+        :param config: a MediaConfig object of raw audio, from which the duration of the
+            audio sent is computed
+        :param version (optional): version of the streaming api to be used
+        :param on_error (optional): function to be called when receiving an
+            error from the server, or when reconnecting failed
+        :param on_close (optional): function to be called when the websocket
+            closes
+        :param on_connected (optional): function to be called when the websocket
+            connects, including after every reconnection
+        :param max_reconnects (optional): number of consecutive failed attempts to
+            reconnect before giving up
+        :param replay_seconds (optional): seconds of audio kept to be sent again
+        :param reconnect_backoff (optional): seconds to wait before the first attempt to
+            reconnect, doubled after each failed attempt
+        """
+        RevAiStreamingClient.__init__(self, access_token, config, version, on_error, on_close,
+                                      on_connected)
+        if replay_seconds <= 0:
+            raise ValueError('replay_seconds must be positive')
+
+        self.replay_seconds = replay_seconds
+        self._set_config(config)
+        self.max_reconnects = max_reconnects
+        self.reconnect_backoff = reconnect_backoff
+        self.reconnects = 0
+        self._send_lock = threading.Lock()
+        self._bytes_sent = 0
+        self._eos_sent = False
+        self._ended = False
+        self._last_final_end = None
+
+    def start(self, generator, *args, **kwargs):
+        """Function to connect the websocket to the URL and start the response
+            thread. Takes the same parameters as RevAiStreamingClient.start
+        """
+        self._reset()
+        return RevAiStreamingClient.start(self, generator, *args, **kwargs)
+
+    def connect(self, *args, **kwargs):
+        """Connects the websocket and waits for the connected message. Takes the same
+            parameters as RevAiStreamingClient.connect
+        """
+        self._reset()
+        return RevAiStreamingClient.connect(self, *args, **kwargs)
+
+    def _reset(self):
+        self.reconnects = 0
+        self._replay.clear()
+        self._bytes_sent = 0
+        self._eos_sent = False
+        self._ended = False
+        self._last_final_end = None
+
+    def _set_config(self, config):
+        """Sets the config of the audio and sizes the replay buffer for it
+        :raises: ValueError unless the config is of raw audio
+        """
+        bytes_per_second = config.get_bytes_per_second()
+        if not bytes_per_second:
+            raise ValueError('config must provide the rate and a raw format to replay audio')
+        RevAiStreamingClient._set_config(self, config)
+        self.bytes_per_second = bytes_per_second
+        self.frame_size = config.get_sample_width() * int(config.channels or 1)
+        replay_size = int(self.bytes_per_second * self.replay_seconds)
+        self._replay = RingBuffer(max(self.frame_size, replay_size - replay_size % self.frame_size))
+
+    def end(self):
+        """Function to end the streaming service, close the websocket.
+        """
+        self._ended = True
+        self._connected = False
+        self.client.abort()
+
+    def _send_data(self, generator):
+        """Sends the audio, keeping it for replay. Errors sending are left to the response
+        generator, which reconnects and sends the audio again.
+        :param generator: enumerator object that yields binary audio data
+        """
+        for chunk in generator:
+            if self._abandoned:
+                return
+            chunk = byte_view(chunk)
+            if self.metrics is not None:
+                self.metrics.chunk_sent(len(chunk), getattr(generator, 'queue_depth', None))
+            if self.recorder is not None:
+                self.recorder.sent(websocket.ABNF.OPCODE_BINARY, chunk)
+            with self._send_lock:
+                self._replay.write(chunk, overwrite=True)
+                self._bytes_sent += len(chunk)
+                _quietly(self.client.send_binary, chunk)
+            if self._stop_sending:
+                break
+
+        if self._abandoned:
+            return
+        if self.recorder is not None:
+            self.recorder.sent(websocket.ABNF.OPCODE_TEXT, b'EOS')
+        with self._send_lock:
+            self._eos_sent = True
+            _quietly(self.client.send, 'EOS')
+
+    def _get_response_generator(self, parsed=False):
+        """A generator of responses from the server, across reconnections.
+        :param parsed: whether to yield hypothesis objects instead of json strings
+        """
+        attempts = 0
+        while True:
+            try:
+                with self.client.readlock:
+                    opcode, data = self.client.recv_data()
+            except (websocket.WebSocketException, OSError) as e:
+                if self._ended:
+                    return
+                opcode, error = None, e
+
+            if self.recorder is not None and opcode is not None:
+                self.recorder.received(opcode, data)
+            if opcode == websocket.ABNF.OPCODE_TEXT:
+                if six.PY3:
+                    data = data.decode('utf-8')
+                data_dict = json.loads(data)
+                if data_dict['type'] == 'connected':
+                    if self.metrics is not None:
+                        self.metrics.connected()
+                    self.on_connected(data_dict['id'])
+                    continue
+                if data_dict['type'] in ('partial', 'final'):
+                    attempts = 0
+                    deduplicated = self._deduplicate(data_dict)
+                    if deduplicated is None:
+                        continue
+                    if deduplicated is not data_dict:
+                        data_dict, data = deduplicated, json.dumps(deduplicated)
+                    if data_dict['type'] == 'final' and data_dict.get('end_ts') is not None:
+                        self._last_final_end = data_dict['end_ts']
+                if self.metrics is not None:
+                    self.metrics.message_received(data_dict)
+                if self.vad is not None:
+                    data_dict = self.vad.remap_hypothesis(
+                        data_dict, self.url_options.get('start_ts') or 0)
+                    data = json.dumps(data_dict)
+                yield parse_streaming_response(data_dict) if parsed else data
+                continue
+            elif opcode == websocket.ABNF.OPCODE_CLOSE:
+                code, reason = framing.decode_close_payload(data)
+                if self._ended or code not in RECONNECT_CLOSE_CODES:
+                    self._close_received = True
+                    if code is not None:
+                        self.on_close(code, reason)
+                    if self.metrics is not None:
+                        self.metrics.closed()
+                    if self.recorder is not None:
+                        self.recorder.flush()
+                    return
+                error = websocket.WebSocketConnectionClosedException(
+                    'Connection closed. Code : {}; Reason : {}'.format(code, reason))
+            elif opcode is not None:
+                yield ''
+                continue
+
+            while True:
+                if self._ended:
+                    return
+                if attempts >= self.max_reconnects:
+                    self.on_error(error)
+                    return
+                time.sleep(self.reconnect_backoff * 2 ** attempts)
+                attempts += 1
+                try:
+                    self._reconnect()
+                    break
+                except (websocket.WebSocketException, OSError) as e:
+                    error = e
+
+    def _reconnect(self):
+        """Starts a new streaming job at the end of the last final hypothesis and sends the
+        audio after it again"""
+        with self._send_lock:
+            _quietly(self.client.shutdown)
+            start_ts = self.url_options.get('start_ts') or 0
+            acknowledged = 0
+            if self._last_final_end is not None:
+                acknowledged = int(round((self._last_final_end - start_ts) *
+                                         self.bytes_per_second))
+                acknowledged -= acknowledged % self.frame_size
+            replay_start = self._bytes_sent - len(self._replay)
+            acknowledged = min(max(acknowledged, replay_start), self._bytes_sent)
+
+            url_options = dict(self.url_options,
+                               start_ts=start_ts + acknowledged / float(self.bytes_per_second))
+            client = _WebSocket(enable_multithread=True)
+            if self.metrics is not None:
+                self.metrics.connecting()
+            client.connect(_build_streaming_url(self.base_url, self.access_token, self.config,
+                                                **url_options))
+            self.client = client
+            self.reconnects += 1
+
+            offset = acknowledged - replay_start
+            piece_size = self.bytes_per_second // 10
+            piece = bytearray(max(self.frame_size, piece_size - piece_size % self.frame_size))
+            while offset < len(self._replay):
+                size = self._replay.peek_into(piece, offset=offset)
+                client.send_binary(bytes(piece[:size]))
+                offset += size
+            if self._eos_sent:
+                client.send('EOS')
+
+    def _deduplicate(self, hypothesis):
+        """Returns the hypothesis without the audio already finalized, or None if all of it
+        was"""
+        last_end = self._last_final_end
+        if last_end is None:
+            return hypothesis
+        end_ts = hypothesis.get('end_ts')
+        if end_ts is not None and end_ts <= last_end + _EPSILON:
+            return None
+        ts = hypothesis.get('ts')
+        if ts is None or ts >= last_end - _EPSILON:
+            return hypothesis
+
+        elements = hypothesis.get('elements', [])
+        timed = False
+        for index, element in enumerate(elements):
+            if element.get('end_ts') is None:
+                continue
+            timed = True
+            if element['end_ts'] > last_end + _EPSILON:
+                return dict(hypothesis, ts=last_end, elements=elements[index:])
+        # elements without timings can not be trimmed
+        return None if timed else dict(hypothesis, ts=last_end)
+
+
+def _quietly(function, *args):
+    try:
+        function(*args)
+    except (websocket.WebSocketException, OSError):
+        pass
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Fixed size byte ring buffer"""
+
+
+class RingBuffer:
+    """FIFO of bytes stored in a bytearray allocated once.
+
+    Writing and reading copy into and out of the buffer, so audio can be coalesced or kept
+    around without allocating a new object per chunk.
+    """
+
+    def __init__(self, capacity):
+        """
+        :param capacity: number of bytes the buffer holds
+        :raises: ValueError
+        """
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def free(self):
+        """Number of bytes that can be written without overwriting"""
+        return self.capacity - self._length
+
+    def write(self, data, overwrite=False):
+        """Appends bytes to the buffer
+
+        :param data: bytes-like object
+        :param overwrite: whether to discard the oldest bytes when the buffer is full.
+            Otherwise only the bytes that fit are written
+        :returns: number of bytes of data written
+        """
+        data = memoryview(data).cast('B')
+        length = len(data)
+        if overwrite:
+            if length >= self.capacity:
+                self._view[:] = data[length - self.capacity:]
+                self._start = 0
+                self._length = self.capacity
+                return length
+            self.skip(max(0, length - self.free))
+        else:
+            length = min(length, self.free)
+            data = data[:length]
+
+        end = (self._start + self._length) % self.capacity
+        first = min(length, self.capacity - end)
+        self._view[end:end + first] = data[:first]
+        self._view[:length - first] = data[first:]
+        self._length += length
+        return length
+
+    def peek_into(self, out, size=None, offset=0):
+        """Copies bytes into out without consuming them
+
+        :param out: writable bytes-like object
+        :param size: number of bytes to copy, by default as many as fit in out
+        :param offset: number of bytes to skip from the oldest byte
+        :returns: number of bytes copied
+        """
+        out = memoryview(out).cast('B')
+        available = max(0, self._length - offset)
+        size = min(available, len(out) if size is None else size)
+        start = (self._start + offset) % self.capacity
+        first = min(size, self.capacity - start)
+        out[:first] = self._view[start:start + first]
+        out[first:size] = self._view[:size - first]
+        return size
+
+    def read_into(self, out, size=None):
+        """Moves the oldest bytes into out
+
+        :param out: writable bytes-like object
+        :param size: number of bytes to move, by default as many as fit in out
+        :returns: number of bytes moved
+        """
+        size = self.peek_into(out, size)
+        self.skip(size)
+        return size
+
+    def read(self, size=None):
+        """Returns and consumes the oldest bytes
+
+        :param size: number of bytes to read, by default all of them
+        """
+        size = self._length if size is None else min(size, self._length)
+        start = self._start
+        if start + size <= self.capacity:
+            data = bytes(self._view[start:start + size])
+        else:
+            data = bytearray(size)
+            self.peek_into(data)
+            data = bytes(data)
+        self.skip(size)
+        return data
+
+    def skip(self, size):
+        """Discards the oldest bytes"""
+        size = min(size, self._length)
+        self._start = (self._start + size) % self.capacity
+        self._length -= size
+        if not self._length:
+            self._start = 0
+
+    def clear(self):
+        self._start = 0
+        self._length = 0
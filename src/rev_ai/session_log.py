@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""Recording of streaming sessions to a compact binary log, and their replay"""
+
+import json
+import struct
+import threading
+import time
+from collections import namedtuple
+
+from . import framing
+
+# magic bytes and version opening a session log
+MAGIC = b'RVSL\x01'
+SENT = 1
+RECEIVED = 2
+# set on the direction of records whose payload was not stored
+_OMITTED = 0x80
+# direction, opcode, seconds since the session started and payload length
+_RECORD = struct.Struct('<BBdI')
+_LENGTH = struct.Struct('<I')
+
+SessionRecord = namedtuple('SessionRecord', ['direction', 'opcode', 'time', 'size', 'data'])
+
+
+class SessionRecorder:
+    """Records the frames of a streaming session, passed to the start method of a streaming
+    client.
+
+    The log starts with MAGIC and the json of the session options, without the access
+    token. Each frame is then stored as a 14 byte header, holding its direction, opcode,
+    monotonic time since the session started and length, followed by its payload. Audio can
+    be left out with include_audio=False, in which case only its length is kept.
+    """
+
+    def __init__(self, file, include_audio=True):
+        """
+        :param file: path of the log, or binary file object to write it to
+        :param include_audio: whether to store the audio sent or only its length
+        """
+        self._owns_file = isinstance(file, str)
+        self.file = open(file, 'wb') if self._owns_file else file
+        self.include_audio = include_audio
+        self.records = 0
+        self._started = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def begin(self, info):
+        """Writes the header of the log. Called by the streaming client before connecting
+
+        :param info: json serializable dict describing the session
+        :raises: ValueError if a session was already recorded
+        """
+        if self._started is not None:
+            raise ValueError('a SessionRecorder records a single session')
+        header = json.dumps(info, sort_keys=True).encode('utf-8')
+        with self._lock:
+            self.file.write(MAGIC + _LENGTH.pack(len(header)) + header)
+            self._started = time.monotonic()
+
+    def sent(self, opcode, data):
+        """Records a frame sent to the server"""
+        if opcode == framing.OPCODE_BINARY and not self.include_audio:
+            self._write(SENT | _OMITTED, opcode, len(data), b'')
+        else:
+            self._write(SENT, opcode, len(data), data)
+
+    def received(self, opcode, data):
+        """Records a frame received from the server"""
+        self._write(RECEIVED, opcode, len(data), data)
+
+    def flush(self):
+        with self._lock:
+            self.file.flush()
+
+    def close(self):
+        """Flushes the log, and closes it if it was opened from a path"""
+        if self._owns_file:
+            self.file.close()
+        else:
+            self.flush()
+
+    def _write(self, direction, opcode, size, data):
+        if self._started is None:
+            self.begin({})
+        with self._lock:
+            self.file.write(_RECORD.pack(direction, opcode, time.monotonic() - self._started,
+                                         size))
+            self.file.write(data)
+            self.records += 1
+
+
+def read_session_log(file):
+    """Returns the options of a recorded session and an iterator of its SessionRecords
+
+    :param file: path of the log, or binary file object to read it from
+    :raises: ValueError if the file is not a session log
+    """
+    if isinstance(file, str):
+        with open(file, 'rb') as f:
+            content = f.read()
+    else:
+        content = file.read()
+    if not content.startswith(MAGIC):
+        raise ValueError('not a session log')
+    offset = len(MAGIC)
+    length, = _LENGTH.unpack_from(content, offset)
+    offset += _LENGTH.size
+    info = json.loads(content[offset:offset + length].decode('utf-8'))
+    return info, _records(memoryview(content), offset + length)
+
+
+def _records(content, offset):
+    while offset + _RECORD.size <= len(content):
+        direction, opcode, time_, size = _RECORD.unpack_from(content, offset)
+        offset += _RECORD.size
+        stored = 0 if direction & _OMITTED else size
+        if offset + stored > len(content):
+            # the last record of a log cut short
+            return
+        yield SessionRecord(direction & ~_OMITTED, opcode, time_, size,
+                            bytes(content[offset:offset + stored]))
+        offset += stored
+
+
+class ReplayWebSocket:
+    """Stands in for the websocket of a streaming client, returning the frames received in a
+    session log at their recorded times divided by speedup, or at once if speedup is None.
+
+    on_sent is called with the length of every audio frame sent before the message being
+    returned, at its time, so that StreamingMetrics measure the recorded latencies.
+    """
+
+    def __init__(self, records, speedup=1.0, on_sent=None):
+        if speedup is not None and speedup <= 0:
+            raise ValueError('speedup must be positive')
+        self.records = iter(records)
+        self.speedup = speedup
+        self.on_sent = on_sent
+        self.readlock = threading.Lock()
+        self.frames_sent = 0
+        self.frames_received = 0
+        self._started = None
+
+    def recv_data(self):
+        if self._started is None:
+            self._started = time.monotonic()
+        for record in self.records:
+            self._wait(record.time)
+            if record.direction == RECEIVED:
+                self.frames_received += 1
+                return record.opcode, record.data
+            self.frames_sent += 1
+            if self.on_sent is not None and record.opcode == framing.OPCODE_BINARY:
+                self.on_sent(record.size)
+        # a log cut short ends as a session closed without a close frame
+        return framing.OPCODE_CLOSE, b''
+
+    def send(self, *args):
+        pass
+
+    def send_binary(self, *args):
+        pass
+
+    def abort(self):
+        pass
+
+    def _wait(self, recorded):
+        if self.speedup is None:
+            return
+        delay = self._started + recorded / self.speedup - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def replay_session(client, file, speedup=1.0, parsed=False, metrics=None, vad=None):
+    """Feeds a recorded session through the response processing of a streaming client.
+
+    Responses are returned exactly as client.start would have returned them, with the
+    on_connected and on_close callbacks of the client called along the way.
+
+    :param client: RevAiStreamingClient whose callbacks receive the replayed session
+    :param file: path of the log, or binary file object to read it from
+    :param speedup: factor by which the session is accelerated, or None to replay it as
+        fast as it can be processed
+    :param parsed: whether to yield StreamingPartial and StreamingFinal objects
+    :param metrics: optional StreamingMetrics measuring the replayed session
+    :param vad: optional VoiceActivityGate the session was recorded with, whose offset map
+        is applied to the hypotheses
+    :returns: generator of the responses
+    """
+    info, records = read_session_log(file)
+    client.url_options = info.get('options', {})
+    client.metrics = metrics
+    client.vad = vad
+    client.recorder = None
+    if metrics is not None:
+        metrics.connecting(client.url_options.get('start_ts'))
+    client.client = ReplayWebSocket(records, speedup,
+                                    metrics.chunk_sent if metrics is not None else None)
+    return client._get_response_generator(parsed)
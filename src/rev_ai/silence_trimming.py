@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Removal of long silences from PCM WAV media before it is uploaded"""
+
+import io
+import wave
+
+from .audio import db_to_mean_square, frame_mean_squares
+from .models.asynchronous.offset_map import OffsetMap
+from .models.asynchronous.silence_trim_options import SilenceTrimOptions
+
+
+def trim_silence(source, options=None):
+    """Removes long silences from PCM WAV media.
+
+    :param source: path to a WAV file or a readable file-like object containing one
+    :param options: SilenceTrimOptions controlling what is considered a long silence
+    :returns: tuple of the trimmed WAV media as bytes and the OffsetMap which maps times in
+        the trimmed media back to the original media
+    :raises: ValueError if the source is not a PCM WAV file
+    """
+    options = options or SilenceTrimOptions()
+    try:
+        with wave.open(source, 'rb') as reader:
+            params = reader.getparams()
+            frames = reader.readframes(params.nframes)
+    except (wave.Error, EOFError) as err:
+        raise ValueError('silence trimming requires PCM WAV media: {}'.format(err))
+
+    rate = params.framerate
+    bytes_per_frame = params.sampwidth * params.nchannels
+    total_frames = len(frames) // bytes_per_frame
+    kept = _find_kept_ranges(frames, params, options)
+
+    segments = []
+    trimmed_frames = 0
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as writer:
+        writer.setparams(params)
+        view = memoryview(frames)
+        for start, end in kept:
+            segments.append((trimmed_frames / rate, start / rate))
+            writer.writeframes(view[start * bytes_per_frame:end * bytes_per_frame])
+            trimmed_frames += end - start
+        view.release()
+    if not segments and total_frames:
+        segments.append((0.0, 0.0))
+
+    return output.getvalue(), OffsetMap(segments)
+
+
+def _find_kept_ranges(frames, params, options):
+    """Returns the ranges of audio frames, as (start, end) pairs, left once silences are cut"""
+    rate = params.framerate
+    total_frames = len(frames) // (params.sampwidth * params.nchannels)
+    window = max(1, int(round(rate * options.frame_seconds)))
+    padding = int(round(rate * options.padding_seconds))
+    min_silence = int(round(rate * options.min_silence_seconds))
+    threshold = db_to_mean_square(options.threshold_db, params.sampwidth)
+
+    mean_squares = frame_mean_squares(frames, params.sampwidth, window * params.nchannels)
+
+    kept = []
+    position = 0
+    silence_start = None
+    for index, mean_square in enumerate(mean_squares + [None]):
+        if mean_square is not None and mean_square < threshold:
+            if silence_start is None:
+                silence_start = index * window
+            continue
+        if silence_start is not None:
+            silence_end = min(index * window, total_frames)
+            if silence_end - silence_start >= min_silence:
+                cut_start = silence_start + padding
+                if cut_start > position:
+                    kept.append((position, cut_start))
+                position = silence_end - padding
+            silence_start = None
+    if total_frames > position:
+        kept.append((position, total_frames))
+    return kept
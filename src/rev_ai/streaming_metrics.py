@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""Latency and throughput metrics of streaming sessions"""
+
+import bisect
+import threading
+import time
+
+# upper bounds, in seconds, of the buckets of latency histograms
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+                           60.0)
+
+
+class Histogram:
+    """Counts of observations in fixed buckets, which can be merged across sessions"""
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        """
+        :param buckets: sorted upper bounds of the buckets. Larger observations are counted
+            in an overflow bucket
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """Adds the observations of another histogram with the same buckets"""
+        if other.buckets != self.buckets:
+            raise ValueError('histograms must have the same buckets')
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.sum += other.sum
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def quantile(self, q):
+        """Returns the upper bound of the bucket holding the q quantile, or the maximum for
+        the overflow bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], self.counts))
+        }
+
+
+class MetricsRegistry:
+    """Aggregates the metrics of many streaming sessions. Safe to share between threads."""
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.connect_seconds = Histogram(buckets)
+        self.partial_latency = Histogram(buckets)
+        self.final_latency = Histogram(buckets)
+        self.sessions = 0
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        self.messages_received = 0
+        self._lock = threading.Lock()
+
+    def record(self, name, value):
+        with self._lock:
+            getattr(self, name).record(value)
+
+    def add_session(self, metrics):
+        """Adds the counters of an ended session"""
+        with self._lock:
+            self.sessions += 1
+            self.bytes_sent += metrics.bytes_sent
+            self.frames_sent += metrics.frames_sent
+            self.messages_received += metrics.messages_received
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'sessions': self.sessions,
+                'bytes_sent': self.bytes_sent,
+                'frames_sent': self.frames_sent,
+                'messages_received': self.messages_received,
+                'connect_seconds': self.connect_seconds.to_dict(),
+                'partial_latency': self.partial_latency.to_dict(),
+                'final_latency': self.final_latency.to_dict()
+            }
+
+
+class StreamingMetrics:
+    """Metrics of one streaming session, passed to the start method of a streaming client.
+
+    Latencies are measured from the moment the audio a hypothesis ends at was sent to the
+    moment the hypothesis was received, which requires a MediaConfig of raw audio.
+
+    on_metric is called with the StreamingMetrics, the name and the value of every
+    observation: connect_seconds, partial_latency, final_latency and queue_depth.
+    """
+
+    def __init__(self, config=None, on_metric=None, registry=None,
+                 buckets=DEFAULT_LATENCY_BUCKETS):
+        """
+        :param config: MediaConfig of the audio sent, used to compute latencies
+        :param on_metric: optional function called with each observation
+        :param registry: optional MetricsRegistry aggregating many sessions
+        :param buckets: upper bounds of the buckets of the latency histograms
+        """
+        self.bytes_per_second = config.get_bytes_per_second() if config else None
+        self.on_metric = on_metric
+        self.registry = registry
+        self.start_ts = None
+        self.connect_seconds = None
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        self.messages_received = 0
+        self.queue_depth = None
+        self.max_queue_depth = 0
+        self.partial_latency = Histogram(buckets)
+        self.final_latency = Histogram(buckets)
+        self.connect_started = None
+        self.connected_at = None
+        self.last_message_at = None
+        self.closed_at = None
+        # cumulative seconds of audio sent, and when each chunk was sent
+        self._audio_ends = []
+        self._sent_at = []
+        self._first = 0
+        self._lock = threading.Lock()
+
+    @property
+    def message_rate(self):
+        """Messages received per second since the session connected"""
+        if self.connected_at is None or self.last_message_at is None:
+            return None
+        elapsed = self.last_message_at - self.connected_at
+        return self.messages_received / elapsed if elapsed > 0 else None
+
+    def connecting(self, start_ts=None):
+        """Called when the websocket starts connecting"""
+        self.connect_started = time.monotonic()
+        if self.start_ts is None:
+            self.start_ts = start_ts or 0
+
+    def connected(self):
+        """Called when the connected message is received"""
+        self.connected_at = time.monotonic()
+        if self.connect_started is not None:
+            self.connect_seconds = self.connected_at - self.connect_started
+            self._observe('connect_seconds', self.connect_seconds)
+
+    def chunk_sent(self, size, queue_depth=None):
+        """Called when a chunk of audio is handed to the websocket"""
+        now = time.monotonic()
+        with self._lock:
+            self.bytes_sent += size
+            self.frames_sent += 1
+            if self.bytes_per_second:
+                self._audio_ends.append(self.bytes_sent / float(self.bytes_per_second))
+                self._sent_at.append(now)
+        if queue_depth is not None:
+            self.queue_depth = queue_depth
+            self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+            self._observe('queue_depth', queue_depth)
+
+    def message_received(self, hypothesis):
+        """Called with each decoded hypothesis"""
+        now = time.monotonic()
+        self.messages_received += 1
+        self.last_message_at = now
+        end_ts = hypothesis.get('end_ts')
+        type_ = hypothesis.get('type')
+        if end_ts is None or not self.bytes_per_second or type_ not in ('partial', 'final'):
+            return
+        with self._lock:
+            audio_end = end_ts - (self.start_ts or 0)
+            index = bisect.bisect_left(self._audio_ends, audio_end - 1e-9, self._first)
+            if index >= len(self._sent_at):
+                return
+            latency = now - self._sent_at[index]
+            if type_ == 'final':
+                # later hypotheses only cover audio after this final
+                self._first = index
+                if self._first > 1024:
+                    del self._audio_ends[:self._first]
+                    del self._sent_at[:self._first]
+                    self._first = 0
+        if type_ == 'final':
+            self.final_latency.record(latency)
+            self._observe('final_latency', latency)
+        else:
+            self.partial_latency.record(latency)
+            self._observe('partial_latency', latency)
+
+    def closed(self):
+        """Called when the session ends"""
+        if self.closed_at is not None:
+            return
+        self.closed_at = time.monotonic()
+        if self.registry is not None:
+            self.registry.add_session(self)
+
+    def to_dict(self):
+        return {
+            'connect_seconds': self.connect_seconds,
+            'bytes_sent': self.bytes_sent,
+            'frames_sent': self.frames_sent,
+            'messages_received': self.messages_received,
+            'message_rate': self.message_rate,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'partial_latency': self.partial_latency.to_dict(),
+            'final_latency': self.final_latency.to_dict()
+        }
+
+    def _observe(self, name, value):
+        if self.registry is not None and name != 'queue_depth':
+            self.registry.record(name, value)
+        if self.on_metric is not None:
+            self.on_metric(self, name, value)
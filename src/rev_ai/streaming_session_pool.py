@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+"""Pool running many streaming sessions on one asyncio event loop"""
+
+import asyncio
+import time
+
+from . import framing
+from .asyncstreamingclient import AsyncRevAiStreamingClient
+
+# marks the end of the audio of a session
+_END = object()
+
+# options of AsyncRevAiStreamingClient.start applied to the audio rather than to the url
+_STREAM_OPTIONS = ('chunk_seconds', 'vad', 'converter')
+
+
+class BandwidthLimiter:
+    """Token bucket shared by the sessions of a pool to cap the bytes sent per second"""
+
+    def __init__(self, bytes_per_second, burst_seconds=0.1):
+        """
+        :param bytes_per_second: number of bytes allowed per second
+        :param burst_seconds: seconds of bandwidth that can be used at once after idling
+        """
+        if bytes_per_second <= 0:
+            raise ValueError('bytes_per_second must be positive')
+        self.bytes_per_second = bytes_per_second
+        self.burst = bytes_per_second * burst_seconds
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    async def acquire(self, size):
+        """Waits until size bytes can be sent. Requests are served in the order they were made
+        since waiting requests reserve their bytes ahead of time."""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.bytes_per_second)
+        self._updated = now
+        self._tokens -= size
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.bytes_per_second)
+
+
+class PooledStreamingSession:
+    """Streaming session of a StreamingSessionPool.
+
+    Audio is queued with send, and the responses are passed to the on_response callback of
+    the session as they arrive.
+    """
+
+    def __init__(self, client, on_response, queue_size, loop, limiter=None, metrics=None,
+                 job_id=None):
+        self.client = client
+        self.on_response = on_response
+        self.job_id = job_id
+        self.warm = job_id is not None
+        self.bytes_sent = 0
+        self.close_code = None
+        self.close_reason = None
+        self.error = None
+        self.closed = False
+        self.task = None
+        self.metrics = metrics
+        self._queue = asyncio.Queue(queue_size)
+        self._loop = loop
+        self._limiter = limiter
+
+    @property
+    def queue_depth(self):
+        """Number of chunks waiting to be sent"""
+        return self._queue.qsize()
+
+    async def send(self, chunk):
+        """Queues a chunk of audio, waiting while the queue of the session is full
+
+        :raises: ConnectionError if the session has ended
+        """
+        if self.closed:
+            raise ConnectionError('streaming session has ended')
+        await self._queue.put(chunk)
+
+    def send_threadsafe(self, chunk):
+        """Queues a chunk of audio from another thread
+
+        :returns: concurrent.futures.Future resolved once the chunk is queued
+        """
+        return asyncio.run_coroutine_threadsafe(self.send(chunk), self._loop)
+
+    async def finish(self):
+        """Sends the audio queued followed by EOS, and waits for the last responses"""
+        if not self.closed:
+            await self._queue.put(_END)
+        await self.wait()
+
+    async def abort(self):
+        """Ends the session immediately"""
+        await self.client.end()
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def wait(self):
+        """Waits until the session has ended, raising the error that ended it, if any"""
+        await asyncio.shield(self.task)
+
+    async def __aiter__(self):
+        while True:
+            chunk = await self._queue.get()
+            if chunk is _END:
+                return
+            if self._limiter is not None:
+                await self._limiter.acquire(len(chunk))
+            self.bytes_sent += len(chunk)
+            yield chunk
+
+    def _on_connected(self, job_id):
+        self.job_id = job_id
+
+    def _on_close(self, code, reason):
+        self.close_code = code
+        self.close_reason = reason
+
+    def _on_error(self, error):
+        self.error = error
+
+
+class StreamingSessionPool:
+    """Runs many streaming sessions concurrently on one asyncio event loop, without a thread
+    per session.
+
+    At most max_sessions run at once; opening more waits until one ends. When
+    max_bytes_per_second is set, the audio of all sessions is sent within that bandwidth.
+
+    Connections can be opened ahead of time with prewarm, so that open hands out a session
+    whose handshake and connected message are already done. Warm connections are not counted
+    in max_sessions.
+    """
+
+    def __init__(self,
+                 access_token,
+                 max_sessions=100,
+                 max_bytes_per_second=None,
+                 queue_size=64,
+                 version='v1'):
+        """
+        :param access_token: access token which authorizes all requests and
+            links them to your account. Generated on the settings page of your
+            account dashboard on Rev AI.
+        :param max_sessions: number of sessions running at once
+        :param max_bytes_per_second: optional cap of the audio sent by all sessions
+        :param queue_size: number of chunks queued per session before send waits
+        :param version: version of the streaming api to be used
+        """
+        if not access_token:
+            raise ValueError('access_token must be provided')
+        if max_sessions < 1:
+            raise ValueError('max_sessions must be at least 1')
+
+        self.access_token = access_token
+        self.max_sessions = max_sessions
+        self.queue_size = queue_size
+        self.base_url = 'wss://api.rev.ai/speechtotext/{}/stream'.format(version)
+        self.sessions = set()
+        self._limiter = BandwidthLimiter(max_bytes_per_second) if max_bytes_per_second else None
+        self._semaphore = None
+        # warm connections by _warm_key, as lists of (client, job id, connection time, task
+        # reading the connection while it is idle)
+        self._warm = {}
+        # prewarm settings by _warm_key, as (config, count, max_idle, connect options)
+        self._warm_targets = {}
+        self._warming = {}
+        self._warm_tasks = set()
+
+    @property
+    def active_sessions(self):
+        return len(self.sessions)
+
+    @property
+    def warm_connections(self):
+        """Number of connections waiting to be handed out by open"""
+        return sum(len(entries) for entries in self._warm.values())
+
+    async def prewarm(self, config, count=1, max_idle=10.0, **start_options):
+        """Connects count sessions ahead of time, which open hands out to sessions opened with
+        the same config and start options. Each one handed out is replaced in the background.
+
+        :param config: a MediaConfig object containing audio information
+        :param count: number of connections kept warm for these options
+        :param max_idle: seconds after which a warm connection is closed rather than handed
+            out, as the server may have given up on a session without audio
+        :param start_options: options of AsyncRevAiStreamingClient.start set in the url of
+            the session, such as metadata or language
+        :returns: number of warm connections for these options
+        """
+        if count < 1:
+            raise ValueError('count must be at least 1')
+        key = _warm_key(config, start_options)
+        self._warm_targets[key] = (config, count, max_idle, start_options)
+        await asyncio.gather(*self._refill(key))
+        return len(self._warm.get(key, ()))
+
+    async def open(self, config, on_response, parsed=False, metrics=None, **start_options):
+        """Starts a streaming session, waiting while max_sessions are running
+
+        :param config: a MediaConfig object containing audio information. The target config
+            of a converter given in start_options replaces it
+        :param on_response: function, or coroutine function, called with the session and
+            each response of the server
+        :param parsed: whether responses are StreamingPartial and StreamingFinal objects
+            instead of json strings
+        :param metrics: optional StreamingMetrics of the session, which also records the
+            depth of its audio queue
+        :param start_options: options of AsyncRevAiStreamingClient.start such as metadata,
+            language or detailed_partials
+        :returns: PooledStreamingSession
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_sessions)
+        await self._semaphore.acquire()
+
+        if start_options.get('converter') is not None:
+            config = start_options['converter'].target
+        warm = self._take_warm(config, start_options)
+        if warm is not None:
+            client, job_id = warm
+        else:
+            client, job_id = self._make_client(config), None
+        session = PooledStreamingSession(client, on_response, self.queue_size,
+                                         asyncio.get_running_loop(), self._limiter, metrics,
+                                         job_id)
+        client.on_connected = session._on_connected
+        client.on_close = session._on_close
+        client.on_error = session._on_error
+        self.sessions.add(session)
+        session.task = asyncio.ensure_future(self._run(session, parsed, start_options))
+        return session
+
+    async def join(self):
+        """Waits until every session has ended"""
+        while self.sessions:
+            await asyncio.wait([session.task for session in self.sessions])
+
+    async def close(self):
+        """Ends every session immediately, and closes the warm connections"""
+        self._close_warm()
+        await asyncio.gather(*[session.abort() for session in list(self.sessions)])
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.join()
+            self._close_warm()
+        else:
+            await self.close()
+
+    def _make_client(self, config):
+        client = AsyncRevAiStreamingClient(self.access_token, config)
+        client.base_url = self.base_url
+        return client
+
+    def _take_warm(self, config, start_options):
+        """Returns a warm (client, job id) for the options, or None, and starts replacing it"""
+        key = _warm_key(config, start_options)
+        entries = self._warm.get(key)
+        if not entries:
+            # connections dropped while idle are replaced once the options are used again
+            if key in self._warm_targets:
+                self._refill(key)
+            return None
+        max_idle = self._warm_targets[key][2]
+        now = time.monotonic()
+        taken = None
+        while entries and taken is None:
+            client, job_id, connected_at, watch_task = entries.pop(0)
+            # the server only sends small control frames to an idle session, which arrive
+            # whole, so the reader is waiting for the next frame rather than within one
+            watch_task.cancel()
+            if client.client.closed or now - connected_at > max_idle:
+                client.client.abort()
+            else:
+                taken = client, job_id
+        self._refill(key)
+        return taken
+
+    def _refill(self, key):
+        """Starts connecting the connections missing for the options of key
+
+        :returns: list of the tasks started
+        """
+        config, count, _, options = self._warm_targets[key]
+        missing = count - len(self._warm.get(key, ())) - self._warming.get(key, 0)
+        tasks = [asyncio.ensure_future(self._connect_warm(key, config, options))
+                 for _ in range(max(0, missing))]
+        self._warm_tasks.update(tasks)
+        for task in tasks:
+            task.add_done_callback(self._warm_tasks.discard)
+        return tasks
+
+    async def _connect_warm(self, key, config, options):
+        self._warming[key] = self._warming.get(key, 0) + 1
+        client = self._make_client(config)
+        client.on_connected = lambda job_id: None
+        client.on_error = lambda error: None
+        try:
+            job_id = await client.connect(**options)
+        except (ConnectionError, OSError, asyncio.TimeoutError):
+            # open connects cold until a later refill succeeds
+            return
+        finally:
+            self._warming[key] -= 1
+        watch_task = asyncio.ensure_future(self._watch_warm(key, client))
+        self._warm.setdefault(key, []).append((client, job_id, time.monotonic(), watch_task))
+
+    async def _watch_warm(self, key, client):
+        """Reads a warm connection while it is idle, so that pings are answered, and drops it
+        once the server closes it"""
+        try:
+            while True:
+                opcode, _ = await client.client.recv_data()
+                if opcode == framing.OPCODE_CLOSE:
+                    break
+        except (ConnectionError, OSError, asyncio.IncompleteReadError):
+            pass
+        client.client.abort()
+        self._warm[key] = [entry for entry in self._warm.get(key, ())
+                           if entry[0] is not client]
+
+    def _close_warm(self):
+        for task in list(self._warm_tasks):
+            task.cancel()
+        for entries in self._warm.values():
+            for client, _, _, watch_task in entries:
+                watch_task.cancel()
+                client.client.abort()
+        self._warm.clear()
+
+    async def _run(self, session, parsed, start_options):
+        try:
+            if session.warm:
+                stream_options = {name: start_options[name] for name in _STREAM_OPTIONS
+                                  if name in start_options}
+                if session.metrics is not None:
+                    session.metrics.connecting(start_options.get('start_ts'))
+                    session.metrics.connected()
+                    session.client.metrics = session.metrics
+                responses = session.client.stream(session, parsed=parsed, **stream_options)
+            else:
+                responses = await session.client.start(session, parsed=parsed,
+                                                       metrics=session.metrics,
+                                                       **start_options)
+            async for response in responses:
+                result = session.on_response(session, response)
+                if asyncio.iscoroutine(result):
+                    await result
+        except Exception as e:
+            session.error = e
+            raise
+        finally:
+            session.closed = True
+            # unblock producers waiting for room in the queue
+            while not session._queue.empty():
+                session._queue.get_nowait()
+            self.sessions.discard(session)
+            self._semaphore.release()
+
+
+def _warm_key(config, start_options):
+    """Returns the key of the warm connections matching a config and start options"""
+    options = tuple(sorted((name, value) for name, value in start_options.items()
+                           if name not in _STREAM_OPTIONS and value is not None))
+    return config.get_content_type_string(), options
@@ -5,13 +5,95 @@ import websocket
 import threading
 import six
 import json
+from collections import namedtuple
 from . import __version__
+from . import framing
+from .audio import byte_view
+from .audio_file import AudioFile
+from .models.streaming.hypothesis import parse_streaming_response
+from .models.streaming.live_transcript import LiveTranscript
+from .audio_sender import AudioSender
+from .rechunker import AudioRechunker
 
 try:
     from urllib.parse import urlencode
 except ImportError:
     from urllib import urlencode
 
+FinishReport = namedtuple('FinishReport', ['responses', 'closed', 'eos_sent', 'seconds_sent',
+                                           'unfinalized_seconds'])
+
+
+def _build_streaming_url(base_url,
+                         access_token,
+                         config,
+                         metadata=None,
+                         custom_vocabulary_id=None,
+                         filter_profanity=None,
+                         remove_disfluencies=None,
+                         delete_after_seconds=None,
+                         detailed_partials=None,
+                         start_ts=None,
+                         transcriber=None,
+                         language=None,
+                         skip_postprocessing=None):
+    """Returns the url of a streaming job with its options as query parameters"""
+    url = base_url + '?' + urlencode({
+        'access_token': access_token,
+        'content_type': config.get_content_type_string(),
+        'user_agent': 'RevAi-PythonSDK/{}'.format(__version__)
+    })
+
+    if custom_vocabulary_id:
+        url += '&' + urlencode({'custom_vocabulary_id': custom_vocabulary_id})
+
+    if metadata:
+        url += '&' + urlencode({'metadata': metadata})
+
+    if filter_profanity:
+        url += '&' + urlencode({'filter_profanity': 'true'})
+
+    if remove_disfluencies:
+        url += '&' + urlencode({'remove_disfluencies': 'true'})
+
+    if delete_after_seconds is not None:
+        url += '&' + urlencode({'delete_after_seconds': delete_after_seconds})
+
+    if detailed_partials:
+        url += '&' + urlencode({'detailed_partials': 'true'})
+
+    if start_ts:
+        url += '&' + urlencode({'start_ts': start_ts})
+
+    if transcriber:
+        url += '&' + urlencode({'transcriber': transcriber})
+
+    if language:
+        url += '&' + urlencode({'language': language})
+
+    if skip_postprocessing:
+        url += '&' + urlencode({'skip_postprocessing': 'true'})
+
+    return url
+
+
+class _WebSocket(websocket.WebSocket):
+    """WebSocket sending audio frames encoded by framing into a buffer reused for every
+    frame, so that any bytes-like chunk is sent without being copied to bytes first"""
+
+    def __init__(self, *args, **kwargs):
+        websocket.WebSocket.__init__(self, *args, **kwargs)
+        self._encoder = framing.FrameEncoder()
+
+    def send_binary(self, payload):
+        mask_key = self.get_mask_key(4) if self.get_mask_key else None
+        with self.lock:
+            frame = self._encoder.encode(websocket.ABNF.OPCODE_BINARY, payload, mask_key)
+            length = len(frame)
+            while frame:
+                frame = frame[self._send(frame):]
+        return length
+
 
 def on_error(error):
     raise error
@@ -60,7 +142,27 @@ class RevAiStreamingClient:
         self.on_error = on_error
         self.on_close = on_close
         self.on_connected = on_connected
-        self.client = websocket.WebSocket(enable_multithread=True)
+        self.client = _WebSocket(enable_multithread=True)
+        self.metrics = None
+        self.vad = None
+        self.recorder = None
+        self._responses = None
+        self._response_source = None
+        self._buffer = None
+        # whether a session opened with connect is waiting for stream
+        self._connected = False
+        self._parsed = False
+        self._close_received = False
+        # whether the responses of the session stopped being read, because they were
+        # exhausted or an exception was raised while they were read
+        self._responses_ended = False
+        self._source = None
+        self._stop_sending = False
+        self._abandoned = False
+        self._eos_sent = False
+        self._bytes_per_second = config.get_bytes_per_second()
+        self._bytes_sent = 0
+        self._last_final_end = None
 
     def start(self,
               generator,
@@ -73,7 +175,14 @@ class RevAiStreamingClient:
               start_ts=None,
               transcriber=None,
               language=None,
-              skip_postprocessing=None):
+              skip_postprocessing=None,
+              parsed=False,
+              sender=None,
+              chunk_seconds=None,
+              metrics=None,
+              vad=None,
+              converter=None,
+              recorder=None):
         """Function to connect the websocket to the URL and start the response
             thread
         :param generator: generator object that yields binary audio data
@@ -87,57 +196,362 @@ class RevAiStreamingClient:
         :param transcriber: type of transcriber to use to transcribe the media file
         :param language: language to use for the streaming job
         :param skip_postprocessing: skip all text postprocessing on final hypotheses
+        :param parsed: whether to yield StreamingPartial and StreamingFinal objects instead of
+            the raw json strings. Each message is decoded only once either way
+        :param sender: optional AudioSender through which the audio of the generator is
+            queued and paced before it is sent
+        :param chunk_seconds: optional duration, computed from the config, to coalesce or
+            split the audio into before it is sent
+        :param metrics: optional StreamingMetrics recording the latencies and throughput of
+            this session
+        :param vad: optional VoiceActivityGate dropping long silences before the audio is
+            sent. Timestamps of the hypotheses returned are mapped back to the original audio
+        :param converter: optional AudioConverter the audio is converted with before anything
+            else. The session is started with the target config of the converter, which
+            replaces the config of the client
+        :param recorder: optional SessionRecorder logging the frames of this session so that
+            it can be replayed with session_log.replay_session
         """
-        url = self.base_url + '?' + urlencode({
-            'access_token': self.access_token,
-            'content_type': self.config.get_content_type_string(),
-            'user_agent': 'RevAi-PythonSDK/{}'.format(__version__)
-        })
-
-        if custom_vocabulary_id:
-            url += '&' + urlencode({'custom_vocabulary_id': custom_vocabulary_id})
-
-        if metadata:
-            url += '&' + urlencode({'metadata': metadata})
-
-        if filter_profanity:
-            url += '&' + urlencode({'filter_profanity': 'true'})
-
-        if remove_disfluencies:
-            url += '&' + urlencode({'remove_disfluencies': 'true'})
-
-        if delete_after_seconds is not None:
-            url += '&' + urlencode({'delete_after_seconds': delete_after_seconds})
-
-        if detailed_partials:
-            url += '&' + urlencode({'detailed_partials': 'true'})
+        if converter is not None:
+            self._set_config(converter.target)
+
+        self._open(metadata=metadata,
+                   custom_vocabulary_id=custom_vocabulary_id,
+                   filter_profanity=filter_profanity,
+                   remove_disfluencies=remove_disfluencies,
+                   delete_after_seconds=delete_after_seconds,
+                   detailed_partials=detailed_partials,
+                   start_ts=start_ts,
+                   transcriber=transcriber,
+                   language=language,
+                   skip_postprocessing=skip_postprocessing,
+                   metrics=metrics,
+                   recorder=recorder)
+
+        return self._stream(generator, parsed, sender, chunk_seconds, vad, converter)
+
+    def connect(self,
+                metadata=None,
+                custom_vocabulary_id=None,
+                filter_profanity=None,
+                remove_disfluencies=None,
+                delete_after_seconds=None,
+                detailed_partials=None,
+                start_ts=None,
+                transcriber=None,
+                language=None,
+                skip_postprocessing=None,
+                metrics=None,
+                recorder=None,
+                generator=None,
+                max_buffered_chunks=1024,
+                timeout=None):
+        """Connects the websocket and waits for the connected message, so that the audio
+            can be streamed with stream as soon as it is available
+        :param metadata: metadata to be attached to streaming job
+        :param custom_vocabulary_id: id of custom vocabulary to be used with this streaming job
+        :param filter_profanity: whether to mask profane words
+        :param remove_disfluencies: whether to exclude filler words like "uh"
+        :param delete_after_seconds: number of seconds after job completion when job is auto-deleted
+        :param detailed_partials: whether to receive timestamps and confidence scores
+        :param start_ts: number of seconds to offset all hypotheses timings
+        :param transcriber: type of transcriber to use to transcribe the media file
+        :param language: language to use for the streaming job
+        :param skip_postprocessing: skip all text postprocessing on final hypotheses
+        :param metrics: optional StreamingMetrics recording the latencies and throughput of
+            this session
+        :param recorder: optional SessionRecorder logging the frames of this session
+        :param generator: optional generator of the audio, read from a background thread
+            while connecting. Its audio is buffered and sent first when stream is called
+            without a generator
+        :param max_buffered_chunks: number of chunks buffered before the generator waits
+        :param timeout: optional seconds to wait for the connection and connected message
+        :returns: id of the streaming job, or None if connecting failed and on_error
+            returned
+        """
+        self._buffer = None
+        if generator is not None:
+            self._buffer = AudioSender(max_queue_size=max_buffered_chunks)
+            self._buffer.start_feeding(generator)
 
-        if start_ts:
-            url += '&' + urlencode({'start_ts': start_ts})
+        try:
+            self._open(metadata=metadata,
+                       custom_vocabulary_id=custom_vocabulary_id,
+                       filter_profanity=filter_profanity,
+                       remove_disfluencies=remove_disfluencies,
+                       delete_after_seconds=delete_after_seconds,
+                       detailed_partials=detailed_partials,
+                       start_ts=start_ts,
+                       transcriber=transcriber,
+                       language=language,
+                       skip_postprocessing=skip_postprocessing,
+                       metrics=metrics,
+                       recorder=recorder,
+                       timeout=timeout,
+                       raise_errors=True)
+            job_id = self._wait_connected()
+            self._connected = True
+        except Exception as e:
+            # nothing will send the audio buffered, so its generator is no longer read
+            if self._buffer is not None:
+                self._buffer.discard()
+                self._buffer = None
+            self.on_error(e)
+            return None
+        finally:
+            if timeout is not None:
+                self.client.settimeout(None)
+        return job_id
+
+    def stream(self,
+               generator=None,
+               parsed=False,
+               sender=None,
+               chunk_seconds=None,
+               vad=None,
+               converter=None):
+        """Starts the thread sending the audio of a session opened with connect
+        :param generator: generator object that yields binary audio data. Defaults to the
+            audio buffered from the generator given to connect
+        :param parsed: whether to yield StreamingPartial and StreamingFinal objects instead of
+            the raw json strings
+        :param sender: optional AudioSender through which the audio is paced
+        :param chunk_seconds: optional duration to coalesce or split the audio into
+        :param vad: optional VoiceActivityGate dropping long silences before the audio is sent
+        :param converter: optional AudioConverter the audio is converted with before anything
+            else. The session must have been connected with its target config
+        :returns: generator of the responses of the server
+        :raises: ValueError if no audio is given or connect was not called
+        """
+        if not self._connected:
+            raise ValueError('connect must be called before stream')
+        buffered = self._buffer
+        if generator is None:
+            generator = buffered
+        elif buffered is not None:
+            raise ValueError('audio was already given to connect')
+        if generator is None:
+            raise ValueError('generator must be provided')
+        if converter is not None:
+            converter.check_target(self.config)
+        self._buffer = None
+        self._connected = False
+        return self._stream(generator, parsed, sender, chunk_seconds, vad, converter)
+
+    def stream_file(self,
+                    path,
+                    speedup=1.0,
+                    config=None,
+                    chunk_seconds=0.1,
+                    max_queue_size=32,
+                    on_response=None,
+                    **start_options):
+        """Streams a WAV or raw PCM file, paced at speedup times real time, and returns the
+            transcript of its final hypotheses once the session closes. The file is
+            memory-mapped and its chunks are sent as slices of the mapping, without being read
+            into memory first. The config of the client is replaced by the one of the file
+        :param path: path to a WAV file, whose header describes the audio, or a raw file
+        :param speedup: factor by which the audio is sent faster than real time, or None to
+            send it as fast as the connection allows
+        :param config: MediaConfig of a raw file, which must provide the rate and a raw
+            format such as S16LE. Ignored for WAV files
+        :param chunk_seconds: duration of the chunks the file is sent in
+        :param max_queue_size: number of chunks read ahead of the pacing
+        :param on_response (optional): function to be called with the StreamingPartial or
+            StreamingFinal of each hypothesis as it arrives
+        :param start_options: other options of start, such as metadata, language, metrics or
+            recorder
+        :returns: Transcript of the final hypotheses
+        :raises: ValueError if the file is not PCM audio or speedup is not positive
+        """
+        if speedup is not None and speedup <= 0:
+            raise ValueError('speedup must be positive')
+        with AudioFile(path, config) as audio:
+            self._set_config(audio.config)
+            if speedup is None:
+                sender = AudioSender(audio.config, max_queue_size)
+            else:
+                sender = AudioSender(audio.config, max_queue_size, realtime=True,
+                                     speedup=speedup)
+            transcript = LiveTranscript()
+            for response in self.start(audio.chunks(chunk_seconds), parsed=True, sender=sender,
+                                       **start_options):
+                if transcript.update(response) is not None and on_response is not None:
+                    on_response(response)
+            if hasattr(self, 'request_thread'):
+                self.request_thread.join()
+        return transcript.to_transcript()
+
+    def _set_config(self, config):
+        """Sets the config of the audio streamed in the next sessions"""
+        self.config = config
+        self._bytes_per_second = config.get_bytes_per_second()
 
-        if transcriber:
-            url += '&' + urlencode({'transcriber': transcriber})
+    def _open(self, metrics=None, recorder=None, timeout=None, raise_errors=False,
+              **url_options):
+        """Builds the url of the session and connects the websocket"""
+        self._connected = False
+        self.url_options = url_options
+        url = _build_streaming_url(self.base_url, self.access_token, self.config,
+                                   **self.url_options)
 
-        if language:
-            url += '&' + urlencode({'language': language})
+        self.recorder = recorder
+        if recorder is not None:
+            recorder.begin({'content_type': self.config.get_content_type_string(),
+                            'options': self.url_options})
 
-        if skip_postprocessing:
-            url += '&' + urlencode({'skip_postprocessing': 'true'})
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.connecting(url_options.get('start_ts'))
 
         try:
-            self.client.connect(url)
+            if timeout is None:
+                self.client.connect(url)
+            else:
+                self.client.connect(url, timeout=timeout)
         except Exception as e:
+            if raise_errors:
+                raise
             self.on_error(e)
 
+    def _wait_connected(self):
+        """Reads the messages of the server until the connected message
+        :returns: id of the streaming job
+        :raises: WebSocketConnectionClosedException if the server closes the connection first
+        """
+        while True:
+            with self.client.readlock:
+                opcode, data = self.client.recv_data()
+            if self.recorder is not None:
+                self.recorder.received(opcode, data)
+            if opcode == websocket.ABNF.OPCODE_CLOSE:
+                code, reason = framing.decode_close_payload(data)
+                raise websocket.WebSocketConnectionClosedException(
+                    'Connection closed. Code : {}; Reason : {}'.format(code, reason))
+            if opcode == websocket.ABNF.OPCODE_TEXT:
+                data_dict = json.loads(data.decode('utf-8'))
+                if data_dict['type'] == 'connected':
+                    if self.metrics is not None:
+                        self.metrics.connected()
+                    self.on_connected(data_dict['id'])
+                    return data_dict['id']
+
+    def _stream(self, generator, parsed, sender, chunk_seconds, vad, converter):
+        """Wraps the generator in the audio processing requested and starts sending it"""
+        # the first AudioSender of the audio, which finish stops
+        self._source = generator if isinstance(generator, AudioSender) else sender
+        self._stop_sending = False
+        self._abandoned = False
+        self._eos_sent = False
+        self._close_received = False
+        self._bytes_sent = 0
+        self._last_final_end = None
+
+        if converter is not None and generator:
+            generator = converter.stream(generator)
+
+        self.vad = vad
+        if vad is not None and generator:
+            generator = vad.gate(generator)
+
+        if chunk_seconds is not None and generator:
+            # chunks sent straight from the rechunker can share its output buffer
+            generator = AudioRechunker(self.config, chunk_seconds,
+                                       reuse_buffer=sender is None).rechunk(generator)
+
+        if sender is not None and generator is not sender:
+            generator = sender.start_feeding(generator)
+
         self._start_send_data_thread(generator)
 
-        return self._get_response_generator()
+        self._parsed = parsed
+        return self._read_responses()
 
     def end(self):
         """Function to end the streaming service, close the websocket.
         """
+        self._connected = False
         self.client.abort()
 
+    def finish(self, timeout=None):
+        """Ends the session gracefully: stops reading the audio source, sends the audio
+            already queued followed by EOS, and reads the remaining responses until the
+            server closes the connection. The session is ended with end if that takes longer
+            than timeout. Called instead of, or after, iterating over the responses
+        :param timeout: optional seconds to wait for the server to close the connection
+        :returns: FinishReport holding the responses read, whether a close frame was received
+            from the server and EOS was sent in time, and the seconds of audio sent and of the audio
+            not covered by a final hypothesis, which are None unless the config is of raw
+            audio
+        """
+        self._connected = False
+        deadline = None
+        if timeout is not None:
+            deadline = threading.Timer(timeout, self._abandon)
+            deadline.daemon = True
+            deadline.start()
+
+        if self._source is not None:
+            threading.Thread(target=self._source.stop, daemon=True).start()
+        else:
+            self._stop_sending = True
+
+        pending = self._responses
+        if self._responses_ended and not self._close_received:
+            # reading was interrupted by an exception, such as a KeyboardInterrupt raised
+            # while waiting for a message, so the rest of the session is read afresh
+            pending = self._read_responses()
+
+        responses = []
+        try:
+            if pending is not None:
+                for response in pending:
+                    responses.append(response)
+        except (websocket.WebSocketException, OSError):
+            if not self._abandoned:
+                raise
+        finally:
+            if deadline is not None:
+                deadline.cancel()
+
+        closed = self._close_received
+        if hasattr(self, 'request_thread'):
+            if not closed:
+                self._abandon()
+            self.request_thread.join(None if closed else 0)
+
+        seconds_sent = unfinalized_seconds = None
+        if self._bytes_per_second:
+            start_ts = (getattr(self, 'url_options', None) or {}).get('start_ts') or 0
+            seconds_sent = self._bytes_sent / float(self._bytes_per_second)
+            finalized = (self._last_final_end or start_ts) - start_ts
+            unfinalized_seconds = max(0.0, seconds_sent - finalized)
+        return FinishReport(responses, closed, self._eos_sent, seconds_sent,
+                            unfinalized_seconds)
+
+    def _read_responses(self):
+        """Starts reading the responses of the session"""
+        self._responses_ended = False
+        source = self._get_response_generator(self._parsed)
+        self._responses = self._until_ended(source)
+        self._response_source = source
+        return self._responses
+
+    def _until_ended(self, source):
+        """Yields the responses of source and records when they stop being read"""
+        try:
+            yield from source
+        finally:
+            # responses of an earlier session finalized later must not mark this one
+            if source is self._response_source:
+                self._responses_ended = True
+
+    def _abandon(self):
+        """Ends a session that did not finish in time"""
+        self._abandoned = True
+        self._stop_sending = True
+        self.end()
+
     def _start_send_data_thread(self, generator):
         """Function to send binary audio data from a generator with threading
         :param generator: generator object that yields binary audio data
@@ -146,7 +560,7 @@ class RevAiStreamingClient:
             raise ValueError('generator must be provided')
 
         if hasattr(self, 'request_thread'):
-            if self.request_thread.isAlive():
+            if self.request_thread.is_alive():
                 raise RuntimeError("""Data is still being sent and will interfere
                     with the responses.""")
 
@@ -163,31 +577,73 @@ class RevAiStreamingClient:
         if not generator:
             raise ValueError('generator must be provided')
 
-        for chunk in generator:
-            self.client.send_binary(chunk)
-
-        self.client.send("EOS")
-
-    def _get_response_generator(self):
+        try:
+            for chunk in generator:
+                if self._abandoned:
+                    return
+                chunk = byte_view(chunk)
+                if self.metrics is not None:
+                    self.metrics.chunk_sent(len(chunk), getattr(generator, 'queue_depth', None))
+                if self.recorder is not None:
+                    self.recorder.sent(websocket.ABNF.OPCODE_BINARY, chunk)
+                self.client.send_binary(chunk)
+                if self._bytes_per_second:
+                    self._bytes_sent += len(chunk)
+                if self._stop_sending:
+                    break
+
+            if self._abandoned or self._close_received:
+                return
+            if self.recorder is not None:
+                self.recorder.sent(websocket.ABNF.OPCODE_TEXT, b'EOS')
+            self.client.send("EOS")
+        except (websocket.WebSocketConnectionClosedException, ConnectionError):
+            # the server closed the connection, which ends the responses of the session, so
+            # there is nothing left to send the audio to
+            return
+        self._eos_sent = True
+
+    def _get_response_generator(self, parsed=False):
         """A generator of responses from the server. Yields the data decoded.
+        :param parsed: whether to yield hypothesis objects instead of json strings
         """
         while True:
             with self.client.readlock:
                 opcode, data = self.client.recv_data()
+            if self.recorder is not None:
+                self.recorder.received(opcode, data)
             if opcode == websocket.ABNF.OPCODE_TEXT:
                 if six.PY3:
                     data = data.decode('utf-8')
                 data_dict = json.loads(data)
                 if data_dict['type'] == 'connected':
+                    if self.metrics is not None:
+                        self.metrics.connected()
                     self.on_connected(data_dict['id'])
+                    continue
+                if data_dict['type'] == 'final' and data_dict.get('end_ts') is not None:
+                    self._last_final_end = data_dict['end_ts']
+                if self.metrics is not None:
+                    self.metrics.message_received(data_dict)
+                if self.vad is not None:
+                    data_dict = self.vad.remap_hypothesis(
+                        data_dict, self.url_options.get('start_ts') or 0)
+                    data = json.dumps(data_dict)
+                if parsed:
+                    yield parse_streaming_response(data_dict)
                 else:
                     yield data
             elif opcode == websocket.ABNF.OPCODE_CLOSE:
+                self._close_received = True
                 if data and len(data) >= 2:
                     code = 256 * six.byte2int(data[0:1]) + \
                         six.byte2int(data[1:2])
                     reason = data[2:].decode('utf-8')
                     self.on_close(code, reason)
+                if self.metrics is not None:
+                    self.metrics.closed()
+                if self.recorder is not None:
+                    self.recorder.flush()
                 return
             else:
                 yield ''
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""Energy based voice activity gating of streamed audio"""
+
+from .audio import byte_view, db_to_mean_square, frame_mean_squares, pcm_format
+from .models.asynchronous.offset_map import OffsetMap
+from .ring_buffer import RingBuffer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# frames analysed at once, so that the samples decoded fit a work array allocated by the
+# constructor
+_BLOCK_FRAMES = 50
+
+
+class VoiceActivityGate:
+    """Drops long silences from streamed audio.
+
+    Audio is analysed in frames of frame_seconds. Once hangover_seconds have passed without
+    a frame louder than threshold_db, only one frame every keep_alive_seconds is sent so that
+    the session stays open. At the next loud frame the last pre_roll_seconds of audio are
+    sent ahead of it so that the start of speech is not clipped.
+
+    As the server only sees the audio sent, offset_map maps its timestamps back to the
+    timeline of the original audio. The streaming clients apply it to the hypotheses they
+    return.
+    """
+
+    def __init__(self,
+                 config,
+                 threshold_db=-45,
+                 frame_seconds=0.02,
+                 hangover_seconds=0.5,
+                 pre_roll_seconds=0.3,
+                 keep_alive_seconds=1.0):
+        """
+        :param config: MediaConfig of raw interleaved audio in one of the formats of
+            audio.PCM_FORMATS, such as S16LE or F32LE
+        :param threshold_db: level in dBFS below which a frame is silent
+        :param frame_seconds: duration of the frames analysed
+        :param hangover_seconds: seconds of silence sent after speech before gating starts
+        :param pre_roll_seconds: seconds of gated audio sent again at the onset of speech
+        :param keep_alive_seconds: seconds between the frames sent while gated
+        :raises: ValueError
+        """
+        self.sample_width, self.floating = pcm_format(config)
+        if not config.rate:
+            raise ValueError('config must provide the rate')
+        if frame_seconds <= 0:
+            raise ValueError('frame_seconds must be positive')
+        if hangover_seconds < 0 or pre_roll_seconds < 0 or keep_alive_seconds <= 0:
+            raise ValueError('hangover_seconds and pre_roll_seconds must not be negative, and '
+                             'keep_alive_seconds must be positive')
+
+        self.rate = int(config.rate)
+        self.channels = int(config.channels or 1)
+        self.frame_samples = max(1, int(round(self.rate * frame_seconds)))
+        self.frame_bytes = self.frame_samples * self.channels * self.sample_width
+        self.frame_duration = self.frame_samples / float(self.rate)
+        self.bytes_per_second = self.rate * self.channels * self.sample_width
+        self.threshold = db_to_mean_square(threshold_db, self.sample_width, self.floating)
+        self.hangover_frames = int(round(hangover_seconds / self.frame_duration))
+        self.pre_roll_frames = int(round(pre_roll_seconds / self.frame_duration))
+        self.keep_alive_frames = max(1, int(round(keep_alive_seconds / self.frame_duration)))
+
+        self.offset_map = OffsetMap([])
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.speaking = True
+        self._pre_roll = RingBuffer(max(1, self.pre_roll_frames) * self.frame_bytes)
+        self._carry = bytearray()
+        self._frame_index = 0
+        self._last_sent = -1
+        self._silent_frames = 0
+        self._work = None
+        if np is not None:
+            self._work = np.empty(_BLOCK_FRAMES * self.frame_samples * self.channels)
+
+    @property
+    def bytes_saved(self):
+        return self.bytes_in - self.bytes_out
+
+    def gate(self, generator):
+        """Yields the audio of an iterable to be sent, without long silences"""
+        for data in generator:
+            chunk = self.feed(data)
+            if chunk:
+                yield chunk
+        chunk = self.flush()
+        if chunk:
+            yield chunk
+
+    async def gate_async(self, generator):
+        """Yields the audio of an async iterable to be sent, without long silences"""
+        async for data in generator:
+            chunk = self.feed(data)
+            if chunk:
+                yield chunk
+        chunk = self.flush()
+        if chunk:
+            yield chunk
+
+    def feed(self, data):
+        """Analyses audio and returns the part of it, and of the pre-roll, to send"""
+        data = memoryview(byte_view(data))
+        self.bytes_in += len(data)
+        output = []
+        if self._carry:
+            needed = self.frame_bytes - len(self._carry)
+            self._carry.extend(data[:needed])
+            data = data[needed:]
+            if len(self._carry) < self.frame_bytes:
+                return b''
+            # frames are sent as views, so the completed frame keeps its own bytearray
+            carry, self._carry = self._carry, bytearray()
+            self._gate_frames(memoryview(carry), output)
+        whole = len(data) - len(data) % self.frame_bytes
+        self._carry.extend(data[whole:])
+        block_bytes = _BLOCK_FRAMES * self.frame_bytes
+        for start in range(0, whole, block_bytes):
+            self._gate_frames(data[start:min(start + block_bytes, whole)], output)
+        return b''.join(output)
+
+    def _gate_frames(self, data, output):
+        """Gates at most a block of whole frames, appending the audio to send to output"""
+        levels = frame_mean_squares(data, self.sample_width, self.frame_samples * self.channels,
+                                    self.floating, self._work)
+        for index, level in enumerate(levels):
+            frame = data[index * self.frame_bytes:(index + 1) * self.frame_bytes]
+            if level >= self.threshold:
+                if not self.speaking:
+                    self._send_pre_roll(output)
+                    self.speaking = True
+                self._silent_frames = 0
+            else:
+                self._silent_frames += 1
+                if self.speaking and self._silent_frames > self.hangover_frames:
+                    self.speaking = False
+            if self.speaking:
+                self._send(output, frame, self._frame_index)
+            else:
+                if self.pre_roll_frames:
+                    self._pre_roll.write(frame, overwrite=True)
+                if self._frame_index - self._last_sent >= self.keep_alive_frames:
+                    self._send(output, frame, self._frame_index)
+            self._frame_index += 1
+
+    def flush(self):
+        """Returns the audio left over that does not fill a frame, if speech is ongoing"""
+        carry, self._carry = bytes(self._carry), bytearray()
+        if not carry or not self.speaking:
+            return b''
+        output = []
+        self._send(output, carry, self._frame_index)
+        return b''.join(output)
+
+    def remap_hypothesis(self, hypothesis, start_ts=0):
+        """Returns a copy of a decoded hypothesis with timestamps on the original timeline
+
+        :param hypothesis: dict of a partial or final hypothesis
+        :param start_ts: start_ts the session was started with
+        """
+        def remap(timestamp, is_end=False):
+            if timestamp is None:
+                return None
+            return start_ts + self.offset_map.to_original(timestamp - start_ts, is_end)
+
+        remapped = dict(hypothesis)
+        if 'ts' in hypothesis:
+            remapped['ts'] = remap(hypothesis['ts'])
+        if 'end_ts' in hypothesis:
+            remapped['end_ts'] = remap(hypothesis['end_ts'], is_end=True)
+        if 'elements' in hypothesis:
+            remapped['elements'] = [
+                dict(element, ts=remap(element['ts']), end_ts=remap(element.get('end_ts'), True))
+                if 'ts' in element else element
+                for element in hypothesis['elements']]
+        return remapped
+
+    def _send_pre_roll(self, output):
+        frames = len(self._pre_roll) // self.frame_bytes
+        first = self._frame_index - frames
+        for index in range(first, self._frame_index):
+            frame = self._pre_roll.read(self.frame_bytes)
+            if index > self._last_sent:
+                self._send(output, frame, index)
+        self._pre_roll.clear()
+
+    def _send(self, output, frame, index):
+        if index != self._last_sent + 1 or not self.offset_map.segments:
+            self.offset_map.append(self.bytes_out / float(self.bytes_per_second),
+                                   index * self.frame_duration)
+        output.append(frame)
+        self.bytes_out += len(frame)
+        self._last_sent = index
@@ -2,5 +2,45 @@
 """Test configuration for pytest"""
 
 import pytest
+from src.rev_ai import audio, channel_fanout, framing
 from tests.fixtures.mock_session import mock_session, make_mock_response
 from tests.fixtures.mock_streaming_client import mock_streaming_client, mock_generator
+from tests.fixtures.numpy_backend import numpy_backend
+from tests.fixtures.pacing_clock import pacing_clock
+from tests.fixtures.streaming_server import streaming_server
+
+energy_backend = numpy_backend(audio)
+mask_backend = numpy_backend(framing)
+split_backend = numpy_backend(channel_fanout)
+
+
+def pytest_addoption(parser):
+    parser.addoption('--benchmark', action='store_true',
+                     help='also run the tests marked as benchmarks')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark: timing and memory measurements, only run '
+                                       'with --benchmark')
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--benchmark'):
+        return
+    skip = pytest.mark.skip(reason='benchmarks only run with --benchmark')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Lists the figures benchmarks recorded with record_property"""
+    reports = [report for report in terminalreporter.stats.get('passed', [])
+               if report.when == 'call' and report.user_properties and
+               'benchmark' in report.keywords]
+    if reports:
+        terminalreporter.section('benchmarks')
+        for report in reports:
+            terminalreporter.write_line(report.nodeid)
+            for name, value in report.user_properties:
+                terminalreporter.write_line('    {}: {}'.format(name, value))
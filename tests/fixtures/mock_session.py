@@ -21,12 +21,16 @@ def make_mock_response(mocker):
         response.status_code = status
         response.reason = 'Testing'
         response.url = url
+        # properties are patched on the class, and restored once the test ends so that real
+        # responses of later tests are not affected
         if text:
-            type(response).text = mocker.PropertyMock(return_value=text)
-            type(response).content = mocker.PropertyMock(return_value=text)
+            mocker.patch.object(requests.Response, 'text', new_callable=mocker.PropertyMock,
+                                return_value=text)
+            mocker.patch.object(requests.Response, 'content', new_callable=mocker.PropertyMock,
+                                return_value=text)
         if json_data:
             response.json = mocker.Mock(return_value=json_data)
-            type(response).content = mocker.PropertyMock(
-                return_value=str(json_data).encode('utf-8'))
+            mocker.patch.object(requests.Response, 'content', new_callable=mocker.PropertyMock,
+                                return_value=str(json_data).encode('utf-8'))
         return response
     return _mock_response
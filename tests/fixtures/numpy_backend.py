@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+def numpy_backend(module):
+    """Returns a fixture running a test once with NumPy and once with the pure python
+    fallback of a module, which imports numpy as np or sets it to None"""
+    @pytest.fixture(params=['numpy', 'python'])
+    def backend(request, monkeypatch):
+        if request.param == 'python':
+            monkeypatch.setattr(module, 'np', None)
+        elif module.np is None:
+            pytest.skip('numpy is not installed')
+        return request.param
+    return backend
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from src.rev_ai import audio_sender
+
+
+class PacingClock:
+    """Stands in for the time module of audio_sender. Time only passes when the sender
+    sleeps, and the durations it asked to sleep are recorded"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def pacing_clock(monkeypatch):
+    """Returns the PacingClock AudioSender paces the audio with during the test"""
+    clock = PacingClock()
+    monkeypatch.setattr(audio_sender, 'time', clock)
+    return clock
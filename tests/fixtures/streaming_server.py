@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from tests.helpers.streaming_server import StreamingServer
+
+
+@pytest.fixture
+def streaming_server():
+    """Returns a function starting a StreamingServer in a background thread with the given
+    options. The servers started are stopped after the test"""
+    servers = []
+
+    def start(**options):
+        servers.append(StreamingServer(**options).start_in_thread())
+        return servers[-1]
+    yield start
+    for server in servers:
+        server.stop_thread()
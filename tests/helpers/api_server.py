@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""Local HTTP server standing in for the Rev AI asynchronous and insights apis"""
+
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+REV_JSON_CONTENT_TYPE = 'application/vnd.rev.transcript.v1.0+json'
+CREATED_ON = '2018-05-05T23:23:22.29Z'
+WORDS = ('hello', 'world', 'this', 'is', 'a', 'synthetic', 'transcript', 'of', 'many', 'words')
+
+
+def synthetic_transcript(words, speakers=2, words_per_monologue=50):
+    """Returns the json of a transcript of the given number of words, each lasting 0.5 seconds
+    and followed by a space or, every tenth word, a period"""
+    monologues = []
+    for start in range(0, words, words_per_monologue):
+        elements = []
+        for index in range(start, min(words, start + words_per_monologue)):
+            elements.append({'type': 'text', 'value': WORDS[index % len(WORDS)],
+                             'ts': index * 0.5, 'end_ts': index * 0.5 + 0.4,
+                             'confidence': 0.9})
+            elements.append({'type': 'punct', 'value': '.' if index % 10 == 9 else ' '})
+        monologues.append({'speaker': (start // words_per_monologue) % speakers,
+                           'elements': elements})
+    return {'monologues': monologues}
+
+
+def transcript_text(transcript):
+    lines = []
+    for monologue in transcript['monologues']:
+        seconds = int(monologue['elements'][0]['ts'])
+        lines.append('Speaker {}    {:02d}:{:02d}:{:02d}    {}'.format(
+            monologue['speaker'], seconds // 3600, seconds // 60 % 60, seconds % 60,
+            ''.join(element['value'] for element in monologue['elements']).strip()))
+    return '\n\n'.join(lines) + '\n'
+
+
+def transcript_captions(transcript, content_type):
+    def timestamp(seconds, separator):
+        milliseconds = int(round(seconds * 1000))
+        return '{:02d}:{:02d}:{:02d}{}{:03d}'.format(
+            milliseconds // 3600000, milliseconds // 60000 % 60, milliseconds // 1000 % 60,
+            separator, milliseconds % 1000)
+
+    words = [element for monologue in transcript['monologues']
+             for element in monologue['elements'] if element['type'] == 'text']
+    separator = ',' if content_type == 'application/x-subrip' else '.'
+    cues = ['WEBVTT\n'] if separator == '.' else []
+    for number, start in enumerate(range(0, len(words), 10), 1):
+        line = words[start:start + 10]
+        cues.append('{}\n{} --> {}\n{}\n'.format(
+            number, timestamp(line[0]['ts'], separator), timestamp(line[-1]['end_ts'], separator),
+            ' '.join(word['value'] for word in line)))
+    return '\n'.join(cues)
+
+
+class ApiServer:
+    """In-process HTTP server emulating the endpoints used by the api clients.
+
+    Jobs of /speechtotext/v1/jobs, /speechtotext/v1/vocabularies and /{api}/{version}/jobs are
+    kept in memory and report in_progress for the first polls_to_complete polls, counting
+    both requests of the job and lists including it. Transcripts,
+    captions, summaries and translations are built from a synthetic transcript of
+    transcript_words words, encoded once and shared by all jobs.
+
+    Every response is delayed by latency seconds. fail queues error responses for matching
+    requests.
+    """
+
+    def __init__(self, latency=0, transcript_words=100, polls_to_complete=0, speakers=2):
+        self.latency = latency
+        self.polls_to_complete = polls_to_complete
+        self.jobs = {}
+        self.vocabularies = {}
+        self.requests = []
+        self.server = None
+        self.url = None
+        self._errors = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._set_transcript(transcript_words, speakers)
+
+    def _set_transcript(self, words, speakers):
+        transcript = synthetic_transcript(words, speakers)
+        self.transcript_json = json.dumps(transcript).encode('utf-8')
+        self.transcript_text = transcript_text(transcript).encode('utf-8')
+        self.captions = {content_type: transcript_captions(transcript, content_type)
+                         .encode('utf-8') for content_type in ('application/x-subrip',
+                                                               'text/vtt')}
+
+    def base_url(self, api='speechtotext', version='v1'):
+        """Returns the url to set as the base_url of a client of the given api"""
+        return '{}/{}/{}/'.format(self.url, api, version)
+
+    def fail(self, status, count=1, method=None, path=None, retry_after=None):
+        """Answers the next count requests matching method and the path regex with status
+
+        :param retry_after: optional value of the Retry-After header of the error responses
+        """
+        with self._lock:
+            self._errors.append([method, re.compile(path or ''), status, count, retry_after])
+
+    def start(self, host='127.0.0.1', port=0):
+        """Starts the server in a background thread"""
+        self.server = _Server((host, port), _handler(self))
+        self.url = 'http://{}:{}'.format(host, self.server.server_address[1])
+        self._thread = threading.Thread(target=self.server.serve_forever, args=(0.05,),
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def handle(self, method, path, headers, body):
+        """Returns the status, headers and body of the response to a request"""
+        url = urlparse(path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        with self._lock:
+            self.requests.append((method, url.path))
+            error = self._take_error(method, url.path)
+        if self.latency:
+            time.sleep(self.latency)
+        if error is not None:
+            status, retry_after = error
+            extra = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+            return self._json(status, {'title': 'Injected error', 'status': status}, extra)
+
+        for pattern, methods in _ROUTES:
+            match = pattern.match(url.path)
+            if match and method in methods:
+                return getattr(self, methods[method])(query, headers, body, **match.groupdict())
+        return self._json(404, {'title': 'Not found', 'status': 404})
+
+    def _take_error(self, method, path):
+        for error in self._errors:
+            if (error[0] is None or error[0] == method) and error[1].search(path):
+                error[3] -= 1
+                if not error[3]:
+                    self._errors.remove(error)
+                return error[2], error[4]
+        return None
+
+    @staticmethod
+    def _json(status, value, extra=None):
+        headers = {'Content-Type': 'application/json'}
+        headers.update(extra or {})
+        return status, headers, json.dumps(value).encode('utf-8')
+
+    def _new_job(self, api, body, headers):
+        options = {}
+        content_type = headers.get('Content-Type', '')
+        if content_type.startswith('application/json'):
+            options = json.loads(body.decode('utf-8') or '{}')
+        elif content_type.startswith('multipart/form-data'):
+            match = re.search(b'name="options"\r\n\r\n(.*?)\r\n--', body, re.S)
+            options = json.loads(match.group(1).decode('utf-8')) if match else {}
+        with self._lock:
+            id_ = 'job{}'.format(next(self._ids))
+            job = {'id': id_, 'created_on': CREATED_ON, 'status': 'in_progress', 'api': api,
+                   'polls': 0, 'metadata': options.get('metadata'), 'options': options}
+            self.jobs[id_] = job
+        return job
+
+    @staticmethod
+    def _job_json(job):
+        return {key: value for key, value in job.items()
+                if key not in ('api', 'polls', 'options')}
+
+    def _poll(self, job):
+        with self._lock:
+            job['polls'] += 1
+            if job['status'] == 'in_progress' and job['polls'] > self.polls_to_complete:
+                job['status'] = 'transcribed' if job['api'] == 'speechtotext' else 'completed'
+                job['completed_on'] = CREATED_ON
+        return job
+
+    def _finished_job(self, id_, api='speechtotext'):
+        job = self.jobs.get(id_)
+        if job is None or job['api'] != api:
+            return None, self._json(404, {'title': 'Job not found', 'status': 404})
+        if job['status'] == 'in_progress':
+            return None, self._json(409, {'title': 'Invalid job state', 'status': 409,
+                                          'current_value': 'in_progress'})
+        return job, None
+
+    def submit_job(self, query, headers, body, api='speechtotext', version='v1'):
+        return self._json(200, self._job_json(self._new_job(api, body, headers)))
+
+    def get_job(self, query, headers, body, id_, api='speechtotext', version='v1'):
+        job = self.jobs.get(id_)
+        if job is None or job['api'] != api:
+            return self._json(404, {'title': 'Job not found', 'status': 404})
+        return self._json(200, self._job_json(self._poll(job)))
+
+    def list_jobs(self, query, headers, body, api='speechtotext', version='v1'):
+        jobs = [job for job in self.jobs.values() if job['api'] == api][::-1]
+        if 'starting_after' in query:
+            ids = [job['id'] for job in jobs]
+            if query['starting_after'] in ids:
+                jobs = jobs[ids.index(query['starting_after']) + 1:]
+        limit = int(query.get('limit', 100))
+        return self._json(200, [self._job_json(self._poll(job)) for job in jobs[:limit]])
+
+    def delete_job(self, query, headers, body, id_, api='speechtotext', version='v1'):
+        if self.jobs.pop(id_, None) is None:
+            return self._json(404, {'title': 'Job not found', 'status': 404})
+        return 204, {}, b''
+
+    def get_transcript(self, query, headers, body, id_, language=None):
+        job, error = self._finished_job(id_)
+        if error:
+            return error
+        if headers.get('Accept') == 'text/plain':
+            return 200, {'Content-Type': 'text/plain'}, self.transcript_text
+        return 200, {'Content-Type': REV_JSON_CONTENT_TYPE}, self.transcript_json
+
+    def get_captions(self, query, headers, body, id_, language=None):
+        job, error = self._finished_job(id_)
+        if error:
+            return error
+        content_type = headers.get('Accept') or 'application/x-subrip'
+        if content_type not in self.captions:
+            return self._json(406, {'title': 'Not acceptable', 'status': 406})
+        return 200, {'Content-Type': content_type}, self.captions[content_type]
+
+    def get_summary(self, query, headers, body, id_):
+        job, error = self._finished_job(id_)
+        if error:
+            return error
+        summary = 'A synthetic transcript.'
+        if headers.get('Accept') == 'text/plain':
+            return 200, {'Content-Type': 'text/plain'}, summary.encode('utf-8')
+        return self._json(200, {'summary': summary})
+
+    def get_result(self, query, headers, body, id_, api, version):
+        job, error = self._finished_job(id_, api)
+        if error:
+            return error
+        if api == 'languageid':
+            return self._json(200, {'top_language': 'en', 'language_confidences': [
+                {'language': 'en', 'confidence': 0.9}, {'language': 'es', 'confidence': 0.1}]})
+        if api == 'sentiment_analysis':
+            return self._json(200, {'messages': [
+                {'content': 'hello world', 'score': 0.5, 'sentiment': 'positive',
+                 'offset': 0, 'length': 11}]})
+        return self._json(200, {'topics': [
+            {'topic_name': 'synthetic transcript', 'score': 0.9, 'informants': [
+                {'content': 'a synthetic transcript', 'offset': 0, 'length': 22}]}]})
+
+    def get_account(self, query, headers, body):
+        return self._json(200, {'email': 'test@rev.ai', 'balance_seconds': 3600})
+
+    def submit_vocabulary(self, query, headers, body):
+        with self._lock:
+            id_ = 'cv{}'.format(next(self._ids))
+            vocabulary = {'id': id_, 'created_on': CREATED_ON, 'status': 'in_progress',
+                          'polls': 0}
+            vocabulary.update(json.loads(body.decode('utf-8') or '{}'))
+            self.vocabularies[id_] = vocabulary
+        return self._json(200, self._vocabulary_json(vocabulary))
+
+    def get_vocabulary(self, query, headers, body, id_):
+        vocabulary = self.vocabularies.get(id_)
+        if vocabulary is None:
+            return self._json(404, {'title': 'Custom vocabulary not found', 'status': 404})
+        with self._lock:
+            vocabulary['polls'] += 1
+            if vocabulary['polls'] > self.polls_to_complete:
+                vocabulary['status'] = 'complete'
+        return self._json(200, self._vocabulary_json(vocabulary))
+
+    def list_vocabularies(self, query, headers, body):
+        vocabularies = list(self.vocabularies.values())[::-1][:int(query.get('limit', 100))]
+        return self._json(200, [self._vocabulary_json(vocabulary)
+                                for vocabulary in vocabularies])
+
+    def delete_vocabulary(self, query, headers, body, id_):
+        if self.vocabularies.pop(id_, None) is None:
+            return self._json(404, {'title': 'Custom vocabulary not found', 'status': 404})
+        return 204, {}, b''
+
+    @staticmethod
+    def _vocabulary_json(vocabulary):
+        return {key: value for key, value in vocabulary.items()
+                if key in ('id', 'created_on', 'status', 'metadata', 'completed_on')}
+
+
+# routes as (path pattern, {method: handler}), tried in order
+_ROUTES = [(re.compile('^/speechtotext/v1/' + pattern + '$'), methods) for pattern, methods in [
+    ('jobs', {'POST': 'submit_job', 'GET': 'list_jobs'}),
+    ('jobs/(?P<id_>[^/]+)', {'GET': 'get_job', 'DELETE': 'delete_job'}),
+    ('jobs/(?P<id_>[^/]+)/transcript', {'GET': 'get_transcript'}),
+    ('jobs/(?P<id_>[^/]+)/transcript/translation/(?P<language>[^/]+)', {'GET': 'get_transcript'}),
+    ('jobs/(?P<id_>[^/]+)/transcript/summary', {'GET': 'get_summary'}),
+    ('jobs/(?P<id_>[^/]+)/captions', {'GET': 'get_captions'}),
+    ('jobs/(?P<id_>[^/]+)/captions/translation/(?P<language>[^/]+)', {'GET': 'get_captions'}),
+    ('account', {'GET': 'get_account'}),
+    ('vocabularies/?', {'POST': 'submit_vocabulary', 'GET': 'list_vocabularies'}),
+    ('vocabularies/(?P<id_>[^/]+)', {'GET': 'get_vocabulary', 'DELETE': 'delete_vocabulary'}),
+]] + [(re.compile('^/(?P<api>[^/]+)/(?P<version>[^/]+)/' + pattern + '$'), methods)
+      for pattern, methods in [
+          ('jobs', {'POST': 'submit_job', 'GET': 'list_jobs'}),
+          ('jobs/(?P<id_>[^/]+)', {'GET': 'get_job', 'DELETE': 'delete_job'}),
+          ('jobs/(?P<id_>[^/]+)/result', {'GET': 'get_result'})]]
+
+
+class _Server(ThreadingHTTPServer):
+    # the default backlog of 5 drops concurrent connections, which are retried a second later
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def _handler(api_server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # headers and body are written separately, which would otherwise wait for an ack
+        disable_nagle_algorithm = True
+
+        def _respond(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            status, headers, content = api_server.handle(self.command, self.path,
+                                                         self.headers, body)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        do_GET = do_POST = do_DELETE = _respond
+
+        def log_message(self, *args):
+            pass
+    return Handler
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""Local websocket server speaking the Rev AI streaming protocol"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+
+from src.rev_ai import framing
+
+try:
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from urlparse import parse_qs, urlparse
+
+
+class StreamingSession:
+    """Audio and options received by the server during one websocket connection"""
+
+    def __init__(self, path):
+        self.path = path
+        self.query = {key: values[0] for key, values in parse_qs(urlparse(path).query).items()}
+        self.start_ts = float(self.query.get('start_ts', 0))
+        self.audio = bytearray()
+        self.binary_messages = 0
+        self.received_eos = False
+        self.finalized_bytes = 0
+        self.finals = 0
+        self.partials = 0
+        self.first_audio_at = None
+        self.last_audio_at = None
+        self.outbox = None
+
+    @property
+    def receive_rate(self):
+        """Bytes of audio received per second between the first and last binary message"""
+        if self.first_audio_at is None or self.last_audio_at <= self.first_audio_at:
+            return None
+        return len(self.audio) / (self.last_audio_at - self.first_audio_at)
+
+
+class StreamingServer:
+    """Websocket server answering audio with hypotheses.
+
+    A partial hypothesis is sent for every binary message. A final hypothesis is sent once
+    EOS is received, followed by a close frame.
+
+    When final_every is set, a final hypothesis covering the audio received since the
+    previous one is also sent every final_every binary messages, timed from the start_ts of
+    the session and bytes_per_second. disconnect_after lists, per session, the number of
+    binary messages after which the connection is dropped without a close frame.
+
+    When partial_interval is set, partial hypotheses are sent every partial_interval seconds
+    instead of for every binary message. Hypotheses, and the close frame following them, are
+    sent latency seconds after the message they answer was received. The connected message
+    is sent connect_latency seconds after the handshake. When idle_timeout is set, sessions
+    which receive no audio for that many seconds after connecting are closed.
+    """
+
+    def __init__(self, job_id='testid', close_code=1000, close_reason='End of input. Closing',
+                 final_every=None, bytes_per_second=32000, disconnect_after=None,
+                 partial_interval=None, latency=0, connect_latency=0, idle_timeout=None):
+        self.job_id = job_id
+        self.close_code = close_code
+        self.close_reason = close_reason
+        self.final_every = final_every
+        self.bytes_per_second = bytes_per_second
+        self.disconnect_after = list(disconnect_after or [])
+        self.partial_interval = partial_interval
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.idle_timeout = idle_timeout
+        self.sessions = []
+        self.server = None
+        self.url = None
+        self._loop = None
+        self._thread = None
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Starts listening on the current event loop"""
+        self.server = await asyncio.start_server(self._handle, host, port)
+        port = self.server.sockets[0].getsockname()[1]
+        self.url = 'ws://{}:{}/speechtotext/v1/stream'.format(host, port)
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def start_in_thread(self):
+        """Starts the server on an event loop in a background thread"""
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.stop())
+            self._loop.run_until_complete(_cancel_pending())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop_thread(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    async def _handle(self, reader, writer):
+        tasks = []
+        try:
+            session = await self._handshake(reader, writer)
+            self.sessions.append(session)
+            session.disconnect_after = self.disconnect_after.pop(0) \
+                if self.disconnect_after else None
+            if self.connect_latency:
+                await asyncio.sleep(self.connect_latency)
+            await self._send(writer, framing.OPCODE_TEXT, json.dumps(
+                {'type': 'connected', 'id': '{}{}'.format(self.job_id, len(self.sessions))
+                 if len(self.sessions) > 1 else self.job_id}))
+            if self.partial_interval:
+                tasks.append(asyncio.ensure_future(self._tick(session, writer)))
+            if self.latency:
+                session.outbox = asyncio.Queue()
+                tasks.append(asyncio.ensure_future(self._deliver(session, writer)))
+            await self._serve(session, reader, writer)
+            if session.outbox is not None:
+                session.outbox.put_nowait(None)
+                await tasks[-1]
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def _handshake(self, reader, writer):
+        request_line = (await reader.readline()).decode('latin-1').split(' ')
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1')
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        accept = base64.b64encode(hashlib.sha1(
+            (headers['sec-websocket-key'] + framing.HANDSHAKE_GUID).encode('ascii')).digest())
+        writer.write((
+            'HTTP/1.1 101 Switching Protocols\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            'Sec-WebSocket-Accept: {}\r\n\r\n').format(accept.decode('ascii')).encode('utf-8'))
+        await writer.drain()
+        return StreamingSession(request_line[1])
+
+    async def _serve(self, session, reader, writer):
+        while True:
+            if self.idle_timeout and not session.binary_messages:
+                try:
+                    opcode, data = await asyncio.wait_for(self._recv(reader), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    await self._send(writer, framing.OPCODE_CLOSE,
+                                     framing.encode_close_payload(1000, 'Idle session'))
+                    return
+            else:
+                opcode, data = await self._recv(reader)
+            if opcode == framing.OPCODE_BINARY:
+                session.audio.extend(data)
+                session.binary_messages += 1
+                session.last_audio_at = time.monotonic()
+                if session.first_audio_at is None:
+                    session.first_audio_at = session.last_audio_at
+                if session.binary_messages == session.disconnect_after:
+                    writer.transport.abort()
+                    return
+                if not self.partial_interval:
+                    await self._reply(session, writer, framing.OPCODE_TEXT,
+                                      self._partial(session))
+                if self.final_every and session.binary_messages % self.final_every == 0:
+                    await self._reply(session, writer, framing.OPCODE_TEXT,
+                                      self._timed_final(session))
+            elif opcode == framing.OPCODE_TEXT and data == b'EOS':
+                session.received_eos = True
+                if self.final_every:
+                    if session.finalized_bytes < len(session.audio):
+                        await self._reply(session, writer, framing.OPCODE_TEXT,
+                                          self._timed_final(session))
+                else:
+                    await self._reply(session, writer, framing.OPCODE_TEXT, json.dumps({
+                        'type': 'final', 'ts': 0, 'end_ts': 1,
+                        'elements': [{'type': 'text', 'value': 'final'}]}))
+                await self._reply(session, writer, framing.OPCODE_CLOSE,
+                                  framing.encode_close_payload(self.close_code, self.close_reason))
+                return
+            elif opcode == framing.OPCODE_CLOSE:
+                return
+
+    async def _reply(self, session, writer, opcode, payload):
+        if session.outbox is None:
+            await self._send(writer, opcode, payload)
+        else:
+            session.outbox.put_nowait((time.monotonic() + self.latency, opcode, payload))
+
+    async def _deliver(self, session, writer):
+        """Sends the replies of a session once their latency has passed"""
+        while True:
+            reply = await session.outbox.get()
+            if reply is None:
+                return
+            due, opcode, payload = reply
+            await asyncio.sleep(max(0, due - time.monotonic()))
+            await self._send(writer, opcode, payload)
+
+    async def _tick(self, session, writer):
+        """Sends a partial hypothesis every partial_interval seconds once audio arrives"""
+        while not session.received_eos:
+            await asyncio.sleep(self.partial_interval)
+            if session.binary_messages and not session.received_eos:
+                await self._reply(session, writer, framing.OPCODE_TEXT, self._partial(session))
+
+    @staticmethod
+    def _partial(session):
+        session.partials += 1
+        return json.dumps({
+            'type': 'partial', 'ts': 0, 'end_ts': 0,
+            'elements': [{'type': 'text', 'value': 'partial{}'.format(session.partials)}]})
+
+    def _timed_final(self, session):
+        ts = session.start_ts + session.finalized_bytes / float(self.bytes_per_second)
+        end_ts = session.start_ts + len(session.audio) / float(self.bytes_per_second)
+        session.finalized_bytes = len(session.audio)
+        session.finals += 1
+        return json.dumps({
+            'type': 'final', 'ts': round(ts, 6), 'end_ts': round(end_ts, 6),
+            'elements': [{'type': 'text', 'value': 'final{}'.format(session.finals),
+                          'ts': round(ts, 6), 'end_ts': round(end_ts, 6), 'confidence': 1.0}]})
+
+    @staticmethod
+    async def _send(writer, opcode, payload):
+        writer.write(framing.encode_frame(opcode, payload, mask=False))
+        await writer.drain()
+
+    @staticmethod
+    async def _recv(reader):
+        fin, opcode, masked, length = framing.parse_header(await reader.readexactly(2))
+        if length == 126:
+            length = struct.unpack('!H', await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', await reader.readexactly(8))[0]
+        mask_key = await reader.readexactly(4) if masked else None
+        data = await reader.readexactly(length)
+        if mask_key is not None:
+            data = framing.mask_payload(mask_key, data)
+        return opcode, data
+
+
+async def _cancel_pending():
+    """Ends the sessions still being served when the server stops"""
+    pending = asyncio.all_tasks() - {asyncio.current_task()}
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""Transport level tests and throughput benchmarks of the api clients against a local server"""
+
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from requests.exceptions import HTTPError
+
+from src.rev_ai.apiclient import RevAiAPIClient
+from src.rev_ai.custom_vocabularies_client import RevAiCustomVocabulariesClient
+from src.rev_ai.job_manager import JobManager
+from src.rev_ai.models import CaptionType, CustomVocabulary, JobStatus
+from src.rev_ai.topic_extraction_client import TopicExtractionClient
+from tests.helpers.api_server import ApiServer
+
+# requests made by each benchmark, spread over this many threads
+BENCHMARK_REQUESTS = 200
+BENCHMARK_THREADS = 8
+
+
+@pytest.fixture
+def api_server():
+    with ApiServer() as server:
+        yield server
+
+
+def make_client(server, client_class=RevAiAPIClient, api='speechtotext'):
+    client = client_class('token')
+    client.base_url = server.base_url(api)
+    if client_class is RevAiCustomVocabulariesClient:
+        client.base_url += 'vocabularies/'
+    return client
+
+
+def benchmark(function, requests=BENCHMARK_REQUESTS, threads=BENCHMARK_THREADS):
+    """Runs function(index) requests times and returns requests per second, p50 and p99
+    latency in seconds and the peak memory in bytes of one more call. Memory is traced
+    separately as tracing slows every allocation down."""
+    def timed(index):
+        start = time.perf_counter()
+        function(index)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = sorted(executor.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(requests)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'requests_per_second': requests / elapsed,
+            'p50': latencies[len(latencies) // 2],
+            'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+            'peak_memory': peak}
+
+
+def record_stats(record_property, stats):
+    """Records the figures of a benchmark, listed in the benchmarks section of the summary"""
+    record_property('requests per second', round(stats['requests_per_second']))
+    record_property('p50 seconds', round(stats['p50'], 4))
+    record_property('p99 seconds', round(stats['p99'], 4))
+    record_property('peak memory bytes', stats['peak_memory'])
+
+
+class TestApiServer:
+    def test_job_lifecycle(self, api_server):
+        api_server.polls_to_complete = 1
+        client = make_client(api_server)
+
+        job = client.submit_job_url(media_url='https://example.com/a.mp3', metadata='meta')
+
+        assert job.status == JobStatus.IN_PROGRESS
+        assert client.get_job_details(job.id).status == JobStatus.IN_PROGRESS
+        assert client.get_job_details(job.id).status == JobStatus.TRANSCRIBED
+        assert api_server.jobs[job.id]['options']['media_url'] == 'https://example.com/a.mp3'
+        assert [j.id for j in client.get_list_of_jobs()] == [job.id]
+        client.delete_job(job.id)
+        assert api_server.jobs == {}
+
+    def test_local_file_is_sent_as_multipart(self, api_server, tmp_path):
+        media = tmp_path / 'a.mp3'
+        media.write_bytes(b'\x00' * 1000)
+        client = make_client(api_server)
+
+        job = client.submit_job_local_file(str(media), metadata='meta')
+
+        assert api_server.jobs[job.id]['metadata'] == 'meta'
+
+    def test_results(self, api_server):
+        api_server.__init__(transcript_words=1000)
+        with api_server.start():
+            client = make_client(api_server)
+            job = client.submit_job_url(media_url='https://example.com/a.mp3')
+            client.get_job_details(job.id)
+
+            transcript = client.get_transcript_object(job.id)
+            text = client.get_transcript_text(job.id)
+            srt = client.get_captions(job.id)
+            vtt = client.get_captions(job.id, content_type=CaptionType.VTT)
+            summary = client.get_transcript_summary_object(job.id)
+            translation = client.get_translated_transcript_object(job.id, 'es')
+
+        assert sum(len(m.elements) for m in transcript.monologues) == 2000
+        assert text.startswith('Speaker 0    00:00:00    hello world')
+        assert srt.startswith('1\n00:00:00,000 --> 00:00:04,900\n')
+        assert vtt.startswith('WEBVTT\n')
+        assert summary.summary == 'A synthetic transcript.'
+        assert translation == transcript
+
+    def test_results_of_unfinished_job_conflict(self, api_server):
+        client = make_client(api_server)
+        job = client.submit_job_url(media_url='https://example.com/a.mp3')
+
+        with pytest.raises(HTTPError, match='409'):
+            client.get_transcript_text(job.id)
+
+    def test_custom_vocabularies(self, api_server):
+        client = make_client(api_server, RevAiCustomVocabulariesClient)
+
+        submitted = client.submit_custom_vocabularies([CustomVocabulary(['Rev AI'])])
+
+        assert submitted['status'] == 'in_progress'
+        assert client.get_custom_vocabularies_information(submitted['id'])['status'] == \
+            'complete'
+        assert [v['id'] for v in client.get_list_of_custom_vocabularies()] == [submitted['id']]
+        client.delete_custom_vocabulary(submitted['id'])
+        assert api_server.vocabularies == {}
+
+    def test_insights_api(self, api_server):
+        client = make_client(api_server, TopicExtractionClient, 'topic_extraction')
+
+        job = client.submit_job_from_text('a synthetic transcript')
+        assert client.get_job_details(job.id).status == JobStatus.COMPLETED
+        result = client.get_result_object(job.id)
+
+        assert result.topics[0].topic_name == 'synthetic transcript'
+        assert api_server.requests[0] == ('POST', '/topic_extraction/v1/jobs')
+
+    def test_error_injection(self, api_server):
+        client = make_client(api_server)
+        api_server.fail(503, count=2, method='POST', path='/jobs$')
+
+        for _ in range(2):
+            with pytest.raises(HTTPError, match='Injected error'):
+                client.submit_job_url(media_url='https://example.com/a.mp3')
+        assert client.submit_job_url(media_url='https://example.com/a.mp3').id
+
+    def test_latency(self, api_server):
+        api_server.latency = 0.05
+        client = make_client(api_server)
+
+        start = time.monotonic()
+        client.get_account()
+
+        assert time.monotonic() - start >= 0.05
+
+    def test_job_manager_retries_injected_errors(self, api_server):
+        api_server.polls_to_complete = 2
+        api_server.fail(500, count=1, path='/transcript$')
+        client = make_client(api_server)
+
+        with JobManager(poll_interval=0.01, retry_backoff=0.01) as manager:
+            futures = [manager.submit(client.submit_job_url, 'https://example.com/a.mp3')
+                       for _ in range(5)]
+            transcripts = [future.result(timeout=10) for future in futures]
+
+        assert all(len(transcript.monologues) == 2 for transcript in transcripts)
+
+
+@pytest.mark.benchmark
+class TestApiBenchmarks:
+    def test_submit_throughput(self, api_server, record_property):
+        client = make_client(api_server)
+
+        stats = benchmark(lambda index: client.submit_job_url(
+            media_url='https://example.com/{}.mp3'.format(index)))
+        record_stats(record_property, stats)
+
+        assert len(api_server.jobs) == BENCHMARK_REQUESTS + 1
+        assert stats['p50'] <= stats['p99']
+
+    def test_poll_throughput(self, api_server, record_property):
+        client = make_client(api_server)
+        ids = [client.submit_job_url(media_url='https://example.com/a.mp3').id
+               for _ in range(10)]
+
+        stats = benchmark(lambda index: client.get_job_details(ids[index % 10]))
+        record_stats(record_property, stats)
+
+        assert stats['requests_per_second'] > 0
+        assert sum(job['polls'] for job in api_server.jobs.values()) == BENCHMARK_REQUESTS + 1
+
+    def test_fetch_throughput_of_large_transcripts(self, record_property):
+        with ApiServer(transcript_words=10000) as server:
+            client = make_client(server)
+            job = client.submit_job_url(media_url='https://example.com/a.mp3')
+            client.get_job_details(job.id)
+
+            stats = benchmark(lambda index: client.get_transcript_object(job.id),
+                              requests=10, threads=4)
+        record_stats(record_property, stats)
+
+        # a 10000 word transcript is over a megabyte of json
+        assert len(server.transcript_json) > 1000000
+        assert stats['peak_memory'] > len(server.transcript_json)
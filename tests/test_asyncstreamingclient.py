@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the asynchronous streaming client"""
+
+import asyncio
+import json
+import pytest
+
+from src.rev_ai.aiowebsocket import WebSocketHandshakeError
+from src.rev_ai.asyncstreamingclient import AsyncRevAiStreamingClient
+from src.rev_ai.models.streaming import MediaConfig, StreamingElement, StreamingFinal, \
+    StreamingPartial
+from tests.helpers.streaming_server import StreamingServer
+
+CONFIG = MediaConfig('audio/x-raw', 'interleaved', 16000, 'S16LE', 1)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def audio_chunks(count=3, size=3200):
+    for i in range(count):
+        await asyncio.sleep(0)
+        yield bytes([i]) * size
+
+
+async def stream(server, client, generator, **options):
+    await server.start()
+    client.base_url = server.url
+    try:
+        responses = await client.start(generator, **options)
+        return [response async for response in responses]
+    finally:
+        await server.stop()
+
+
+class TestAsyncStreamingClient:
+    def test_constructor_no_token_no_config(self):
+        with pytest.raises(ValueError):
+            AsyncRevAiStreamingClient('token', None)
+        with pytest.raises(ValueError):
+            AsyncRevAiStreamingClient(None, CONFIG)
+
+    def test_start_streams_audio_and_yields_responses(self):
+        server = StreamingServer()
+        connected, closed = [], []
+        client = AsyncRevAiStreamingClient('token', CONFIG,
+                                           on_connected=connected.append,
+                                           on_close=lambda code, reason: closed.append(code))
+
+        responses = run(stream(server, client, audio_chunks(), metadata='my metadata',
+                               detailed_partials=True))
+
+        assert [json.loads(r)['type'] for r in responses] == ['partial'] * 3 + ['final']
+        assert connected == ['testid']
+        assert closed == [1000]
+        session = server.sessions[0]
+        assert session.audio == b'\x00' * 3200 + b'\x01' * 3200 + b'\x02' * 3200
+        assert session.received_eos
+        assert session.query['metadata'] == 'my metadata'
+        assert session.query['detailed_partials'] == 'true'
+        assert session.query['content_type'] == CONFIG.get_content_type_string()
+
+    def test_start_accepts_sync_iterables(self):
+        server = StreamingServer()
+        client = AsyncRevAiStreamingClient('token', CONFIG, on_connected=lambda id_: None,
+                                           on_close=lambda code, reason: None)
+
+        responses = run(stream(server, client, [b'a' * 70000, b'b']))
+
+        assert len(responses) == 3
+        assert server.sessions[0].audio == b'a' * 70000 + b'b'
+
+    def test_start_parsed_yields_hypotheses(self):
+        server = StreamingServer()
+        client = AsyncRevAiStreamingClient('token', CONFIG, on_connected=lambda id_: None,
+                                           on_close=lambda code, reason: None)
+
+        responses = run(stream(server, client, audio_chunks(count=1), parsed=True))
+
+        assert responses == [
+            StreamingPartial(0, 0, [StreamingElement('text', 'partial1')]),
+            StreamingFinal(0, 1, [StreamingElement('text', 'final')])
+        ]
+
+    def test_many_sessions_share_one_loop(self):
+        server = StreamingServer()
+
+        async def session(index):
+            client = AsyncRevAiStreamingClient('token', CONFIG, on_connected=lambda id_: None,
+                                               on_close=lambda code, reason: None)
+            client.base_url = server.url
+            responses = await client.start(audio_chunks(2))
+            return [response async for response in responses]
+
+        async def main():
+            await server.start()
+            try:
+                return await asyncio.gather(*[session(i) for i in range(50)])
+            finally:
+                await server.stop()
+
+        results = run(main())
+
+        assert all(len(responses) == 3 for responses in results)
+        assert len(server.sessions) == 50
+
+    def test_generator_errors_are_raised(self):
+        server = StreamingServer()
+        client = AsyncRevAiStreamingClient('token', CONFIG, on_connected=lambda id_: None)
+
+        async def failing():
+            yield b'audio'
+            raise ZeroDivisionError()
+
+        with pytest.raises(ZeroDivisionError):
+            run(stream(server, client, failing()))
+
+    def test_start_failure_to_connect(self):
+        errors = []
+        client = AsyncRevAiStreamingClient('token', CONFIG, on_error=errors.append)
+        client.base_url = 'ws://127.0.0.1:1/stream'
+
+        with pytest.raises(OSError):
+            run(client.start(audio_chunks()))
+        assert len(errors) == 1
+
+    def test_handshake_rejected(self):
+        async def reject(reader, writer):
+            await reader.readline()
+            writer.write(b'HTTP/1.1 401 Unauthorized\r\nContent-Length: 3\r\n\r\nbad')
+            await writer.drain()
+            writer.close()
+
+        async def main():
+            server = await asyncio.start_server(reject, '127.0.0.1', 0)
+            client = AsyncRevAiStreamingClient('token', CONFIG, on_error=lambda e: None)
+            client.base_url = 'ws://127.0.0.1:{}/stream'.format(
+                server.sockets[0].getsockname()[1])
+            try:
+                await client.start(audio_chunks())
+            finally:
+                server.close()
+
+        with pytest.raises(WebSocketHandshakeError) as err:
+            run(main())
+        assert err.value.status == 401
+
+    def test_connect_then_stream(self):
+        server = StreamingServer(connect_latency=0.05)
+        connected = []
+        client = AsyncRevAiStreamingClient('token', CONFIG, on_connected=connected.append,
+                                           on_close=lambda code, reason: None)
+
+        async def main():
+            await server.start()
+            client.base_url = server.url
+            try:
+                job_id = await client.connect(language='en')
+                assert connected == [job_id]
+                responses = client.stream(audio_chunks(), parsed=True)
+                return [response async for response in responses]
+            finally:
+                await server.stop()
+
+        responses = run(main())
+
+        assert connected == ['testid']
+        assert isinstance(responses[-1], StreamingFinal)
+        assert server.sessions[0].query['language'] == 'en'
+        assert len(server.sessions[0].audio) == 9600
+
+    def test_connect_timeout_and_stream_without_connect(self):
+        server = StreamingServer(connect_latency=1)
+        client = AsyncRevAiStreamingClient('token', CONFIG)
+
+        async def main():
+            await server.start()
+            client.base_url = server.url
+            try:
+                with pytest.raises(asyncio.TimeoutError):
+                    await client.connect(timeout=0.05)
+            finally:
+                await server.stop()
+
+        with pytest.raises(ValueError):
+            AsyncRevAiStreamingClient('token', CONFIG).stream(audio_chunks())
+        run(main())
+        assert client.client.closed
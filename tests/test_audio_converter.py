@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for audio format conversion"""
+
+import asyncio
+import pytest
+
+from src.rev_ai.audio import np
+from src.rev_ai.asyncstreamingclient import AsyncRevAiStreamingClient
+from src.rev_ai.resilientstreamingclient import ResilientRevAiStreamingClient
+from src.rev_ai.streamingclient import RevAiStreamingClient
+from src.rev_ai.models.streaming import MediaConfig
+from tests.helpers.streaming_server import StreamingServer
+
+if np is None:
+    pytest.skip('numpy is not installed', allow_module_level=True)
+
+from src.rev_ai.audio_converter import AudioConverter  # noqa: E402
+
+F32_STEREO_48K = MediaConfig('audio/x-raw', 'interleaved', 48000, 'F32LE', 2)
+S16_MONO_16K = MediaConfig('audio/x-raw', 'interleaved', 16000, 'S16LE', 1)
+
+
+def tone(rate, frequency, seconds=1.0, channels=1, amplitude=0.5):
+    t = np.arange(int(rate * seconds)) / float(rate)
+    samples = amplitude * np.sin(2 * np.pi * frequency * t)
+    return np.repeat(samples[:, None], channels, axis=1)
+
+
+def chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def decode_s16(data):
+    return np.frombuffer(data, dtype='<i2') / 32768.0
+
+
+class TestAudioConverter:
+    def test_target_config_is_completed_from_source(self):
+        target = MediaConfig(rate=16000, audio_format='S16LE', channels=1)
+        converter = AudioConverter(F32_STEREO_48K, target)
+
+        assert converter.target.get_content_type_string() == \
+            'audio/x-raw;layout=interleaved;rate=16000;format=S16LE;channels=1'
+        assert (converter.up, converter.down) == (1, 3)
+
+    def test_constructor_validation(self):
+        with pytest.raises(ValueError):
+            AudioConverter(F32_STEREO_48K, S16_MONO_16K, method='cubic')
+        with pytest.raises(ValueError):
+            AudioConverter(MediaConfig('audio/x-raw', 'non-interleaved', 48000, 'F32LE', 2),
+                           S16_MONO_16K)
+        with pytest.raises(ValueError):
+            AudioConverter(F32_STEREO_48K, MediaConfig(rate=16000, channels=3))
+        with pytest.raises(ValueError, match='format'):
+            AudioConverter(MediaConfig('audio/x-raw', 'interleaved', 8000, 'MULAW', 1),
+                           S16_MONO_16K)
+
+    def test_downmix_resample_and_quantize(self):
+        converter = AudioConverter(F32_STEREO_48K, S16_MONO_16K)
+        data = tone(48000, 440, channels=2).astype('<f4').tobytes()
+
+        output = decode_s16(b''.join(converter.stream(chunks(data, 4001))))
+
+        assert len(output) == 16000
+        expected = tone(16000, 440)[:, 0]
+        assert np.abs(output[100:-100] - expected[100:-100]).max() < 1e-3
+        assert converter.bytes_in == len(data)
+        assert converter.bytes_out == 2 * 16000
+
+    def test_frequencies_above_target_nyquist_are_filtered(self):
+        converter = AudioConverter(F32_STEREO_48K, S16_MONO_16K)
+        data = tone(48000, 10000, channels=2).astype('<f4').tobytes()
+
+        output = decode_s16(b''.join(converter.stream([data])))
+
+        assert np.abs(output[100:-100]).max() < 0.01
+
+    @pytest.mark.parametrize('method', ['polyphase', 'linear'])
+    def test_fractional_ratio(self, method):
+        source = MediaConfig('audio/x-raw', 'interleaved', 44100, 'S16LE', 1)
+        converter = AudioConverter(source, MediaConfig(rate=16000), method=method)
+        data = (tone(44100, 300) * 32767).astype('<i2').tobytes()
+
+        output = decode_s16(b''.join(converter.stream(chunks(data, 3000))))
+
+        assert len(output) == 16000
+        expected = tone(16000, 300)[:, 0]
+        assert np.abs(output[200:-200] - expected[200:-200]).max() < 1e-3
+
+    def test_output_does_not_depend_on_chunk_sizes(self):
+        data = tone(48000, 440, seconds=0.3, channels=2).astype('<f4').tobytes()
+
+        whole = b''.join(AudioConverter(F32_STEREO_48K, S16_MONO_16K).stream([data]))
+        split = b''.join(AudioConverter(F32_STEREO_48K, S16_MONO_16K).stream(chunks(data, 7)))
+
+        assert split == whole
+
+    def test_chunks_are_converted_in_the_work_arrays_of_the_constructor(self):
+        converter = AudioConverter(F32_STEREO_48K, S16_MONO_16K)
+        names = ['_decoded', '_window', '_indices', '_scaled']
+        arrays = [getattr(converter, name) for name in names]
+        data = tone(48000, 440, seconds=1.0, channels=2).astype('<f4').tobytes()
+
+        output = converter.convert(data) + converter.flush()
+
+        assert len(output) == 2 * 16000
+        assert all(getattr(converter, name) is array for name, array in zip(names, arrays))
+
+    def test_mono_is_copied_to_every_channel(self):
+        source = MediaConfig('audio/x-raw', 'interleaved', 16000, 'S16LE', 1)
+        converter = AudioConverter(source, MediaConfig(channels=2))
+        data = (tone(16000, 440, seconds=0.1) * 32767).astype('<i2').tobytes()
+
+        output = np.frombuffer(converter.convert(data) + converter.flush(), dtype='<i2')
+
+        assert np.array_equal(output[0::2], output[1::2])
+        assert output[0::2].tobytes() == data
+
+    @pytest.mark.parametrize('audio_format', ['U8', 'S24LE', 'S32LE', 'F32LE'])
+    def test_sample_formats_round_trip(self, audio_format):
+        source = MediaConfig('audio/x-raw', 'interleaved', 16000, 'F32LE', 1)
+        samples = tone(16000, 440, seconds=0.05)[:, 0].astype('<f4')
+        encoded = AudioConverter(source, MediaConfig(audio_format=audio_format)).convert(
+            samples.tobytes())
+        target = MediaConfig('audio/x-raw', 'interleaved', 16000, audio_format, 1)
+
+        decoded = np.frombuffer(AudioConverter(target, source).convert(encoded), dtype='<f4')
+
+        tolerance = 1 / 64.0 if audio_format == 'U8' else 1e-4
+        assert np.abs(decoded - samples).max() < tolerance
+
+    def test_clipping(self):
+        source = MediaConfig('audio/x-raw', 'interleaved', 16000, 'F32LE', 1)
+        data = np.array([2.0, -2.0, 1.0, -1.0], dtype='<f4').tobytes()
+
+        output = np.frombuffer(AudioConverter(source, S16_MONO_16K).convert(data), dtype='<i2')
+
+        assert output.tolist() == [32767, -32768, 32767, -32768]
+
+    def test_connected_client_rejects_config_other_than_target(self):
+        converter = AudioConverter(F32_STEREO_48K, S16_MONO_16K)
+        client = RevAiStreamingClient('token', F32_STEREO_48K)
+        # as if connect had opened a session of the config of the client
+        client._connected = True
+
+        with pytest.raises(ValueError, match='target'):
+            client.stream(iter([b'']), converter=converter)
+
+    def test_async_client_streams_converted_audio(self):
+        converter = AudioConverter(F32_STEREO_48K, S16_MONO_16K)
+        data = tone(48000, 440, seconds=0.5, channels=2).astype('<f4').tobytes()
+
+        async def main():
+            server = StreamingServer()
+            await server.start()
+            # the session is started with the target config of the converter
+            client = AsyncRevAiStreamingClient('token', F32_STEREO_48K,
+                                               on_connected=lambda id_: None,
+                                               on_close=lambda code, reason: None)
+            client.base_url = server.url
+            try:
+                responses = await client.start(chunks(data, 3840), converter=converter)
+                [r async for r in responses]
+                return server
+            finally:
+                await server.stop()
+
+        server = asyncio.run(main())
+
+        assert len(server.sessions[0].audio) == 2 * 8000
+        assert server.sessions[0].query['content_type'] == \
+            converter.target.get_content_type_string()
+
+    def test_resilient_client_replays_converted_audio(self, streaming_server):
+        converter = AudioConverter(F32_STEREO_48K, S16_MONO_16K)
+        data = tone(48000, 440, seconds=0.5, channels=2).astype('<f4').tobytes()
+        server = streaming_server()
+        client = ResilientRevAiStreamingClient('token', F32_STEREO_48K, replay_seconds=1,
+                                               on_connected=lambda id_: None,
+                                               on_close=lambda code, reason: None)
+        client.base_url = server.url
+        list(client.start(chunks(data, 3840), converter=converter))
+        client.request_thread.join()
+
+        assert server.sessions[0].query['content_type'] == \
+            converter.target.get_content_type_string()
+        assert client.bytes_per_second == 32000
+        assert client._replay.capacity == 32000
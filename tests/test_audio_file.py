@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for memory-mapped audio files"""
+
+import struct
+import wave
+
+import pytest
+
+from src.rev_ai.audio_file import AudioFile
+from src.rev_ai.models.streaming import MediaConfig
+
+
+def write_wav(path, frames, rate=16000, channels=1, width=2):
+    with wave.open(str(path), 'wb') as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(width)
+        writer.setframerate(rate)
+        writer.writeframes(frames)
+    return str(path)
+
+
+def write_float_wav(path, samples, rate=8000, extensible=False):
+    data = struct.pack('<{}f'.format(len(samples)), *samples)
+    if extensible:
+        fmt = struct.pack('<HHIIHHHHI16s', 0xFFFE, 1, rate, rate * 4, 4, 32, 22, 32, 4,
+                          struct.pack('<H14s', 3, b'\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa'
+                                                  b'\x00\x38\x9b\x71'))
+    else:
+        fmt = struct.pack('<HHIIHH', 3, 1, rate, rate * 4, 4, 32)
+    # an odd sized chunk before the data is padded
+    chunks = [b'fmt ' + struct.pack('<I', len(fmt)) + fmt,
+              b'LIST' + struct.pack('<I', 3) + b'abc\x00',
+              b'data' + struct.pack('<I', len(data)) + data]
+    body = b'WAVE' + b''.join(chunks)
+    path.write_bytes(b'RIFF' + struct.pack('<I', len(body)) + body)
+    return str(path)
+
+
+class TestAudioFile:
+    def test_wav_header_describes_the_audio(self, tmp_path):
+        frames = bytes(range(256)) * 25
+        path = write_wav(tmp_path / 'call.wav', frames, rate=8000, channels=2)
+
+        with AudioFile(path) as audio:
+            assert audio.config.get_content_type_string() == \
+                'audio/x-raw;layout=interleaved;rate=8000;format=S16LE;channels=2'
+            assert audio.duration == 0.2
+            chunks = list(audio.chunks(0.075))
+
+            assert [len(chunk) for chunk in chunks] == [2400, 2400, 1600]
+            assert all(isinstance(chunk, memoryview) for chunk in chunks)
+            assert b''.join(chunks) == frames
+
+    def test_float_and_extensible_wav(self, tmp_path):
+        for extensible in (False, True):
+            path = write_float_wav(tmp_path / 'float.wav', [0.5, -0.5, 0.25],
+                                   extensible=extensible)
+
+            with AudioFile(path) as audio:
+                assert audio.config.format == 'F32LE'
+                assert audio.config.rate == 8000
+                assert bytes(audio.data) == struct.pack('<3f', 0.5, -0.5, 0.25)
+
+    def test_raw_file_requires_a_config(self, tmp_path):
+        path = tmp_path / 'call.raw'
+        path.write_bytes(b'\x01' * 3201)
+        config = MediaConfig('audio/x-raw', 'interleaved', 16000, 'S16LE', 1)
+
+        with AudioFile(str(path), config) as audio:
+            assert audio.config is config
+            # the incomplete last frame is left out
+            assert len(audio.data) == 3200
+            assert audio.duration == 0.1
+        with pytest.raises(ValueError):
+            AudioFile(str(path))
+        with pytest.raises(ValueError):
+            AudioFile(str(path), MediaConfig('audio/x-flac'))
+
+    def test_unsupported_wav_files(self, tmp_path):
+        path = write_wav(tmp_path / 'call.wav', b'\x00' * 40)
+        header = bytearray(open(path, 'rb').read())
+
+        # a-law samples
+        header[20:22] = struct.pack('<H', 6)
+        (tmp_path / 'alaw.wav').write_bytes(bytes(header))
+        with pytest.raises(ValueError):
+            AudioFile(str(tmp_path / 'alaw.wav'))
+        (tmp_path / 'short.wav').write_bytes(bytes(header[:36]))
+        with pytest.raises(ValueError):
+            AudioFile(str(tmp_path / 'short.wav'))
+
+    def test_chunks_of_empty_files(self, tmp_path):
+        path = write_wav(tmp_path / 'empty.wav', b'')
+        (tmp_path / 'empty.raw').write_bytes(b'')
+        config = MediaConfig('audio/x-raw', 'interleaved', 16000, 'S16LE', 1)
+
+        with AudioFile(path) as audio, AudioFile(str(tmp_path / 'empty.raw'), config) as raw:
+            assert list(audio.chunks()) == list(raw.chunks()) == []
+            with pytest.raises(ValueError):
+                list(audio.chunks(0))
+
+    def test_close_while_chunks_are_referenced(self, tmp_path):
+        path = write_wav(tmp_path / 'call.wav', b'\x01\x02' * 1600)
+
+        audio = AudioFile(path)
+        chunk = next(audio.chunks())
+        audio.close()
+
+        assert chunk.tobytes() == b'\x01\x02' * 1600
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the paced audio sender"""
+
+import threading
+import time
+import pytest
+
+from src.rev_ai.audio_sender import AudioSender
+from src.rev_ai.models.streaming import MediaConfig
+from src.rev_ai.streamingclient import RevAiStreamingClient
+from tests.helpers.streaming_server import StreamingServer
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# 32000 bytes per second
+CONFIG = MediaConfig('audio/x-raw', 'interleaved', 16000, 'S16LE', 1)
+
+
+class TestAudioSender:
+    def test_constructor_validation(self):
+        with pytest.raises(ValueError):
+            AudioSender(max_queue_size=0)
+        with pytest.raises(ValueError):
+            AudioSender(CONFIG, speedup=0)
+        with pytest.raises(ValueError, match='real-time'):
+            AudioSender(MediaConfig('audio/*'), realtime=True)
+
+    def test_yields_fed_chunks_in_order(self):
+        sender = AudioSender(CONFIG).start_feeding(bytes([i]) * 10 for i in range(5))
+
+        assert list(sender) == [bytes([i]) * 10 for i in range(5)]
+        assert sender.chunks_sent == 5
+        assert sender.bytes_sent == 50
+        assert sender.seconds_sent == 50 / 32000.0
+
+    def test_put_blocks_when_queue_is_full(self):
+        sender = AudioSender(max_queue_size=2)
+        sender.put(b'a')
+        sender.put(b'b')
+
+        with pytest.raises(queue.Full):
+            sender.put(b'c', timeout=0.05)
+        assert sender.queue_depth == 2
+        assert sender.max_queue_depth == 2
+        assert sender.blocked_seconds >= 0.05
+
+    def test_put_after_close_raises(self):
+        sender = AudioSender()
+        sender.close()
+
+        with pytest.raises(ValueError):
+            sender.put(b'a')
+        assert list(sender) == []
+
+    def test_generator_errors_are_raised_to_consumer(self):
+        def generator():
+            yield b'a'
+            raise IOError('microphone unplugged')
+        sender = AudioSender().start_feeding(generator())
+
+        with pytest.raises(IOError, match='unplugged'):
+            list(sender)
+
+    def test_realtime_pacing(self, pacing_clock):
+        # 4 chunks of 0.05 seconds each; each one after the first waits for the previous
+        sender = AudioSender(CONFIG, realtime=True)
+        sender.start_feeding([b'\x00' * 1600] * 4)
+
+        assert len(list(sender)) == 4
+        assert pacing_clock.sleeps == pytest.approx([0.05] * 3)
+        assert sender.lag_seconds == 0
+
+    def test_realtime_pacing_with_speedup(self, pacing_clock):
+        sender = AudioSender(CONFIG, realtime=True, speedup=10)
+        sender.start_feeding([b'\x00' * 3200] * 11)
+
+        list(sender)
+
+        assert pacing_clock.sleeps == pytest.approx([0.01] * 10)
+
+    def test_late_chunks_are_not_delayed(self, pacing_clock):
+        sender = AudioSender(CONFIG, realtime=True)
+        for _ in range(3):
+            sender.put(b'\x00' * 3200)
+        sender.close()
+        chunks = iter(sender)
+
+        next(chunks)
+        # the producer fell 0.25 seconds behind, so the next chunk is 0.15 seconds late
+        pacing_clock.now += 0.25
+        next(chunks)
+        assert sender.lag_seconds == pytest.approx(0.15)
+        next(chunks)
+
+        assert pacing_clock.sleeps == []
+
+    def test_live_producer_is_consumed_while_producing(self):
+        sender = AudioSender(max_queue_size=1)
+
+        def produce():
+            for i in range(20):
+                sender.put(bytes([i]))
+            sender.close()
+        producer = threading.Thread(target=produce)
+        producer.start()
+
+        assert b''.join(sender) == bytes(range(20))
+        producer.join()
+        assert sender.max_queue_depth == 1
+
+    def test_stop_ends_feeding_after_the_chunks_queued(self):
+        sender = AudioSender(max_queue_size=4)
+
+        def endless():
+            while True:
+                yield b'\x01'
+        sender.start_feeding(endless())
+        while sender.queue_depth < 4:
+            time.sleep(0.001)
+
+        stopping = threading.Thread(target=sender.stop)
+        stopping.start()
+        chunks = list(sender)
+        stopping.join()
+
+        assert 4 <= len(chunks) <= 6
+        sender._feed_thread.join(1)
+        assert not sender._feed_thread.is_alive()
+
+    def test_discard_releases_the_producer(self):
+        sender = AudioSender(max_queue_size=2)
+        producer = threading.Thread(target=sender.feed, args=[iter([b'\x01'] * 10)])
+        producer.start()
+        while sender.queue_depth < 2:
+            time.sleep(0.001)
+
+        sender.discard()
+        producer.join(1)
+
+        assert not producer.is_alive()
+        assert list(sender) == []
+        with pytest.raises(ValueError):
+            sender.put(b'\x01')
+
+    def test_streaming_client_sends_through_sender(self):
+        server = StreamingServer().start_in_thread()
+        client = RevAiStreamingClient('token', CONFIG, on_connected=lambda id_: None,
+                                      on_close=lambda code, reason: None)
+        client.base_url = server.url
+        sender = AudioSender(CONFIG, max_queue_size=2, realtime=True, speedup=20)
+        try:
+            responses = list(client.start(iter([b'\x01' * 3200] * 5), sender=sender))
+            client.request_thread.join()
+        finally:
+            server.stop_thread()
+
+        assert len(responses) == 6
+        assert server.sessions[0].audio == b'\x01' * 16000
+        assert sender.bytes_sent == 16000
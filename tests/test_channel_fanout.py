@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the multi-channel fan-out"""
+
+import threading
+import time
+
+import pytest
+
+from src.rev_ai.channel_fanout import ChannelSplitter, MultiChannelStreamingClient
+from src.rev_ai.models.streaming import MediaConfig, StreamingFinal
+
+STEREO = MediaConfig('audio/x-raw', 'interleaved', 16000, 'S16LE', 2)
+
+
+def interleave(channels, frames, width):
+    """Returns frames of samples whose bytes are the channel index plus 16 times the byte"""
+    return b''.join(bytes(channel + 16 * byte for byte in range(width))
+                    for _ in range(frames) for channel in range(channels))
+
+
+class TestChannelSplitter:
+    @pytest.mark.parametrize('audio_format, width, channels', [
+        ('S16LE', 2, 2), ('S24LE', 3, 2), ('F32LE', 4, 3), ('U8', 1, 4)])
+    def test_split(self, split_backend, audio_format, width, channels):
+        splitter = ChannelSplitter(MediaConfig('audio/x-raw', 'interleaved', 8000,
+                                               audio_format, channels))
+
+        parts = splitter.split(interleave(channels, 100, width))
+
+        assert splitter.channel_config.channels == 1
+        assert parts == [bytes(channel + 16 * byte for byte in range(width)) * 100
+                         for channel in range(channels)]
+
+    def test_incomplete_frames_are_kept(self, split_backend):
+        splitter = ChannelSplitter(STEREO)
+        data = interleave(2, 10, 2)
+
+        first = splitter.split(data[:7])
+        second = splitter.split(memoryview(data)[7:])
+
+        assert [len(part) for part in first] == [2, 2]
+        assert [a + b for a, b in zip(first, second)] == [b'\x00\x10' * 10, b'\x01\x11' * 10]
+
+    def test_config_validation(self):
+        with pytest.raises(ValueError):
+            ChannelSplitter(MediaConfig('audio/x-flac'))
+        with pytest.raises(ValueError):
+            ChannelSplitter(MediaConfig('audio/x-raw', 'non-interleaved', 16000, 'S16LE', 2))
+
+
+class TestMultiChannelStreamingClient:
+    def test_channels_stream_to_their_own_sessions(self, streaming_server):
+        server = streaming_server(final_every=2, bytes_per_second=32000)
+        connected = []
+        client = MultiChannelStreamingClient(
+            'token', STEREO, speakers=['Agent', 'Customer'],
+            on_connected=lambda channel, job_id: connected.append(channel),
+            on_close=lambda channel, code, reason: None)
+        for channel_client in client.clients:
+            channel_client.base_url = server.url
+        responses = list(client.start(iter([interleave(2, 1600, 2)] * 5), metadata='call'))
+        for channel_client in client.clients:
+            channel_client.request_thread.join()
+
+        assert sorted(connected) == [0, 1]
+        assert sorted(bytes(session.audio[:2]) for session in server.sessions) == \
+            [b'\x00\x10', b'\x01\x11']
+        assert all(len(session.audio) == 3200 * 5 for session in server.sessions)
+        assert all(session.query['content_type'].endswith('channels=1')
+                   for session in server.sessions)
+        finals = [r for r in responses if isinstance(r.hypothesis, StreamingFinal)]
+        assert sorted((r.channel, r.speaker) for r in finals) == \
+            [(0, 'Agent')] * 3 + [(1, 'Customer')] * 3
+        transcript = client.transcript.to_transcript()
+        assert [m.speaker for m in transcript.monologues] == [0, 1, 0, 1, 0, 1]
+        assert transcript.monologues[1].speaker_info.display_name == 'Customer'
+
+    def test_generator_errors_are_raised(self, streaming_server):
+        server = streaming_server()
+        client = MultiChannelStreamingClient('token', STEREO,
+                                             on_connected=lambda channel, job_id: None,
+                                             on_close=lambda channel, code, reason: None)
+        for channel_client in client.clients:
+            channel_client.base_url = server.url
+
+        def failing():
+            yield b'\x00' * 400
+            raise ZeroDivisionError()
+
+        with pytest.raises(ZeroDivisionError):
+            list(client.start(failing()))
+
+    def test_dropped_channel_does_not_stall_the_others(self, streaming_server, monkeypatch):
+        thread_errors = []
+        monkeypatch.setattr(threading, 'excepthook', thread_errors.append)
+        server = streaming_server(disconnect_after=[3])
+        client = MultiChannelStreamingClient('token', STEREO, max_queue_size=2,
+                                             on_connected=lambda channel, job_id: None,
+                                             on_close=lambda channel, code, reason: None)
+        for channel_client in client.clients:
+            channel_client.base_url = server.url
+        responses = []
+
+        start = time.monotonic()
+        with pytest.raises(Exception):
+            for response in client.start(iter([interleave(2, 1600, 2)] * 20)):
+                responses.append(response)
+
+        assert time.monotonic() - start < 5
+        assert sorted(len(session.audio) for session in server.sessions) == \
+            [3200 * 3, 3200 * 20]
+        assert not client.split_thread.is_alive()
+        healthy = [r.channel for r in responses if isinstance(r.hypothesis, StreamingFinal)]
+        assert len(healthy) == 1
+        for channel_client in client.clients:
+            channel_client.request_thread.join(5)
+        assert thread_errors == []
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for websocket framing"""
+
+import array
+import time
+import pytest
+import websocket
+
+from src.rev_ai import framing
+
+
+def cpu_seconds_per_megabyte(mask, size=32000, megabytes=4):
+    data = bytes(i % 251 for i in range(size))
+    count = megabytes * 1000000 // size
+    start = time.process_time()
+    for _ in range(count):
+        mask(b'\x01\x02\x03\x04', data)
+    return (time.process_time() - start) / megabytes
+
+
+class TestFraming:
+    @pytest.mark.parametrize('length', [0, 1, 3, 4, 125, 126, 255, 256, 257, 3203, 65535,
+                                        65536])
+    def test_mask_payload_round_trip(self, mask_backend, length):
+        data = bytes(i % 251 for i in range(length))
+        key = b'\x01\x02\x03\x04'
+
+        masked = framing.mask_payload(key, data)
+
+        assert len(masked) == length
+        assert framing.mask_payload(key, masked) == data
+        assert all(masked[i] == data[i] ^ key[i % 4] for i in range(min(length, 16)))
+
+    @pytest.mark.parametrize('length, header_length', [(125, 2), (126, 4), (65536, 10)])
+    def test_encode_header_lengths(self, length, header_length):
+        assert len(framing.encode_header(framing.OPCODE_BINARY, length)) == header_length
+        assert len(framing.encode_header(framing.OPCODE_BINARY, length, b'abcd')) == \
+            header_length + 4
+
+    def test_encode_frame_is_masked(self):
+        frame = framing.encode_frame(framing.OPCODE_TEXT, 'EOS')
+
+        fin, opcode, masked, length = framing.parse_header(frame)
+        assert (fin, opcode, masked, length) == (True, framing.OPCODE_TEXT, True, 3)
+        assert framing.mask_payload(frame[2:6], frame[6:]) == b'EOS'
+
+    def test_mask_payload_into_buffer(self, mask_backend):
+        data = bytes(i % 251 for i in range(1001))
+        key = b'\x05\x06\x07\x08'
+        out = bytearray(b'\xff' * 1010)
+
+        framing.mask_payload_into(key, data, out, offset=6)
+
+        assert out[:6] == b'\xff' * 6 and out[1007:] == b'\xff' * 3
+        assert bytes(out[6:1007]) == framing._mask_python(key, data)
+
+    def test_encode_frame_with_mask_key(self, mask_backend):
+        data = bytes(range(256)) * 4
+        key = b'abcd'
+
+        frame = framing.encode_frame(framing.OPCODE_BINARY, data, mask_key=key)
+
+        assert frame[:8] == framing.encode_header(framing.OPCODE_BINARY, len(data), key)
+        assert framing.mask_payload(key, frame[8:]) == data
+
+    @pytest.mark.parametrize('length', [10, 3200, 70000])
+    def test_frame_encoder_matches_websocket_client(self, mask_backend, length):
+        data = bytes(i % 251 for i in range(length))
+        expected = websocket.ABNF.create_frame(data, websocket.ABNF.OPCODE_BINARY)
+        expected.get_mask_key = lambda size: b'wxyz'
+        encoder = framing.FrameEncoder(capacity=1024)
+
+        frame = encoder.encode(framing.OPCODE_BINARY, memoryview(data), b'wxyz')
+
+        assert bytes(frame) == expected.format()
+        assert encoder.capacity >= len(frame)
+
+    def test_frame_encoder_reuses_its_buffer(self, mask_backend):
+        encoder = framing.FrameEncoder(capacity=1024)
+        samples = array.array('h', range(300))
+
+        first = bytes(encoder.encode(framing.OPCODE_BINARY, samples, b'abcd'))
+        second = encoder.encode(framing.OPCODE_BINARY, memoryview(samples)[::2], b'abcd')
+
+        assert framing.mask_payload(b'abcd', first[8:]) == samples.tobytes()
+        assert framing.mask_payload(b'abcd', second[8:]) == samples[::2].tobytes()
+        assert encoder.capacity == 1024
+
+    @pytest.mark.benchmark
+    def test_mask_cpu_per_megabyte(self, record_property):
+        if framing.np is None:
+            pytest.skip('numpy is not installed')
+        numpy_seconds = cpu_seconds_per_megabyte(framing.mask_payload)
+        python_seconds = cpu_seconds_per_megabyte(framing._mask_python)
+        record_property('numpy CPU seconds per MB', round(numpy_seconds, 6))
+        record_property('python CPU seconds per MB', round(python_seconds, 6))
+
+        assert numpy_seconds < python_seconds
+
+    def test_close_payload(self):
+        payload = framing.encode_close_payload(1000, 'End of input. Closing')
+
+        assert framing.decode_close_payload(payload) == (1000, 'End of input. Closing')
+        assert framing.decode_close_payload(b'') == (None, None)
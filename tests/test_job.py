@@ -437,6 +437,35 @@ class TestJobEndpoints():
                 },
                 headers=client.default_headers)
 
+    def test_submit_job_media_with_success(self, mock_session, make_mock_response):
+        data = {
+            'id': JOB_ID,
+            'status': 'in_progress',
+            'created_on': CREATED_ON,
+            'metadata': METADATA
+        }
+        response = make_mock_response(url=JOB_ID_URL, json_data=data)
+        mock_session.request.return_value = response
+        client = RevAiAPIClient(TOKEN)
+
+        res = client.submit_job_media(b'media bytes', filename=FILENAME, metadata=METADATA)
+
+        assert res == Job(JOB_ID, CREATED_ON, JobStatus.IN_PROGRESS, metadata=METADATA)
+        call_kwargs = mock_session.request.call_args[1]
+        body = call_kwargs['data']
+        assert mock_session.request.call_args[0] == ("POST", JOBS_URL)
+        assert call_kwargs['headers']['Content-Type'] == body.content_type
+        assert call_kwargs['headers']['Authorization'] == client.default_headers['Authorization']
+        content = b''.join(bytes(chunk) for chunk in body)
+        assert len(body) == len(content)
+        assert json.dumps({'metadata': METADATA}).encode('utf-8') in content
+        assert 'filename="{}"'.format(FILENAME).encode('utf-8') in content
+        assert b'\r\n\r\nmedia bytes\r\n' in content
+
+    def test_submit_job_media_with_no_media(self, mock_session):
+        with pytest.raises(ValueError, match='media must be provided'):
+            RevAiAPIClient(TOKEN).submit_job_media(None)
+
     @pytest.mark.parametrize('filename', [None, ''])
     def test_submit_job_url_with_no_filename(self, filename, mock_session):
         with pytest.raises(ValueError, match='filename must be provided'):
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for JobManager"""
+
+import threading
+import pytest
+from requests.exceptions import ConnectionError, HTTPError
+
+from src.rev_ai.apiclient import RevAiAPIClient
+from src.rev_ai.job_manager import JobManager, JobFailedError, SummaryResult, \
+    TranslationResult, InsightsResult
+from src.rev_ai.models import Transcript, TopicExtractionResult
+from src.rev_ai.models.asynchronous.summarization_options import SummarizationOptions
+from src.rev_ai.topic_extraction_client import TopicExtractionClient
+
+TOKEN = 'token'
+CREATED_ON = '2018-05-05T23:23:22.29Z'
+TRANSCRIPT = {'monologues': [{'speaker': 0, 'elements': [
+    {'type': 'text', 'value': 'hello', 'ts': 0.5, 'end_ts': 1.0, 'confidence': 1}]}]}
+
+
+class FakeApi:
+    """Routes requests made through the mocked session to in memory jobs"""
+
+    def __init__(self, make_mock_response, polls_until_done=2):
+        self.make_mock_response = make_mock_response
+        self.polls_until_done = polls_until_done
+        self.jobs = {}
+        self.polls = {}
+        self.requests = []
+        self.failures = []
+        self.submit_failures = []
+        self.final_status = None
+        self.lock = threading.Lock()
+
+    def job_json(self, id_):
+        done = self.polls[id_] >= self.polls_until_done
+        job = dict(self.jobs[id_])
+        if done:
+            job['status'] = job.pop('final_status')
+        else:
+            job['status'] = 'in_progress'
+            job.pop('final_status')
+        for key in ('summarization',):
+            if key in job and done:
+                job[key] = dict(job[key], status='completed')
+        return job
+
+    def __call__(self, method, url, **kwargs):
+        with self.lock:
+            self.requests.append((method, url))
+            failures = self.submit_failures if method == 'POST' else self.failures
+            if failures:
+                raise failures.pop(0)
+            path = url.split('.ai/', 1)[1]
+            parts = path.split('?')[0].split('/')
+            if method == 'POST':
+                id_ = str(len(self.jobs) + 1)
+                final_status = self.final_status or \
+                    ('completed' if parts[0] == 'topic_extraction' else 'transcribed')
+                self.jobs[id_] = {'id': id_, 'created_on': CREATED_ON,
+                                  'final_status': final_status}
+                if 'summarization_config' in (kwargs.get('json') or {}):
+                    self.jobs[id_]['summarization'] = {'status': 'in_progress'}
+                self.polls[id_] = 0
+                return self.make_mock_response(json_data=self.job_json(id_))
+            if len(parts) == 3:
+                for id_ in self.polls:
+                    self.polls[id_] += 1
+                return self.make_mock_response(
+                    json_data=[self.job_json(id_) for id_ in reversed(list(self.jobs))])
+            id_ = parts[3]
+            if len(parts) == 4:
+                self.polls[id_] += 1
+                return self.make_mock_response(json_data=self.job_json(id_))
+            if parts[-1] == 'summary':
+                return self.make_mock_response(json_data={'summary': 'summary of ' + id_})
+            if parts[-1] == 'result':
+                return self.make_mock_response(json_data={'topics': []})
+            return self.make_mock_response(json_data=TRANSCRIPT)
+
+    def count(self, method, fragment):
+        return len([r for r in self.requests if r[0] == method and fragment in r[1]])
+
+
+@pytest.fixture
+def fake_api(mock_session, make_mock_response):
+    api = FakeApi(make_mock_response)
+    mock_session.request.side_effect = api
+    return api
+
+
+@pytest.mark.usefixtures('mock_session', 'make_mock_response')
+class TestJobManager:
+    def test_submit_resolves_to_transcript(self, fake_api):
+        client = RevAiAPIClient(TOKEN)
+
+        with JobManager(poll_interval=0.01) as manager:
+            futures = [manager.submit(client.submit_job_url, 'https://example.com/{}.mp3'.format(i))
+                       for i in range(5)]
+            results = [future.result(timeout=5) for future in futures]
+
+        assert all(result == Transcript.from_json(TRANSCRIPT) for result in results)
+        assert fake_api.count('POST', 'jobs') == 5
+        assert fake_api.count('GET', 'transcript') == 5
+
+    def test_status_refresh_is_batched(self, fake_api):
+        client = RevAiAPIClient(TOKEN)
+        fake_api.polls_until_done = 1
+
+        with JobManager(poll_interval=0.05, max_concurrent_submits=10) as manager:
+            futures = [manager.submit(client.submit_job_url, 'https://example.com/{}.mp3'.format(i))
+                       for i in range(10)]
+            for future in futures:
+                future.result(timeout=5)
+
+        assert fake_api.count('GET', 'jobs?limit=1000') >= 1
+        assert fake_api.count('GET', 'jobs/') - fake_api.count('GET', 'transcript') < 10
+
+    def test_summary_and_translation_results(self, fake_api):
+        client = RevAiAPIClient(TOKEN)
+
+        with JobManager(poll_interval=0.01) as manager:
+            future = manager.submit(client.submit_job_url, 'https://example.com/a.mp3',
+                                    summarization_config=SummarizationOptions(),
+                                    result=SummaryResult())
+            summary = future.result(timeout=5)
+            missing = manager.submit(client.submit_job_url, 'https://example.com/b.mp3',
+                                     result=TranslationResult('es'))
+            with pytest.raises(JobFailedError):
+                missing.result(timeout=5)
+
+        assert summary.summary == 'summary of 1'
+
+    def test_insights_result(self, fake_api):
+        client = TopicExtractionClient(TOKEN)
+
+        with JobManager(poll_interval=0.01) as manager:
+            result = manager.submit(client.submit_job_from_text, 'some text',
+                                    result=InsightsResult(threshold=0.5)).result(timeout=5)
+
+        assert result == TopicExtractionResult.from_json({'topics': []})
+        assert fake_api.count('GET', 'result?threshold=0.5') == 1
+
+    def test_failed_job_raises(self, fake_api):
+        client = RevAiAPIClient(TOKEN)
+        fake_api.final_status = 'failed'
+
+        with JobManager(poll_interval=0.01) as manager:
+            future = manager.submit(client.submit_job_url, 'https://example.com/a.mp3')
+            with pytest.raises(JobFailedError) as err:
+                future.result(timeout=5)
+
+        assert err.value.job.id == '1'
+
+    def test_transient_errors_are_retried(self, fake_api):
+        client = RevAiAPIClient(TOKEN)
+        fake_api.polls_until_done = 1
+
+        fake_api.failures = [ConnectionError('reset'), ConnectionError('reset')]
+
+        with JobManager(poll_interval=0.01, retry_backoff=0.01) as manager:
+            future = manager.submit(client.submit_job_url, 'https://example.com/a.mp3')
+            assert future.result(timeout=5) == Transcript.from_json(TRANSCRIPT)
+
+    def test_retries_run_out(self, fake_api):
+        client = RevAiAPIClient(TOKEN)
+        fake_api.failures = [ConnectionError('reset')] * 3
+
+        with JobManager(poll_interval=0.01, retry_backoff=0.01, max_retries=2) as manager:
+            future = manager.submit(client.submit_job_url, 'https://example.com/a.mp3')
+            with pytest.raises(ConnectionError):
+                future.result(timeout=5)
+
+    def test_submit_errors_are_not_retried(self, fake_api):
+        client = RevAiAPIClient(TOKEN)
+        fake_api.submit_failures = [ConnectionError('reset')]
+
+        with JobManager(poll_interval=0.01) as manager:
+            with pytest.raises(ConnectionError):
+                manager.submit(client.submit_job_url, 'https://example.com/a.mp3').result(5)
+
+        assert fake_api.count('POST', 'jobs') == 1
+
+    def test_submit_requires_bound_method(self):
+        with JobManager() as manager:
+            with pytest.raises(ValueError):
+                manager.submit(RevAiAPIClient.submit_job_url)
+
+    def test_submit_after_close(self):
+        manager = JobManager()
+        manager.close()
+
+        with pytest.raises(RuntimeError):
+            manager.submit(RevAiAPIClient(TOKEN).submit_job_url)
+
+    def test_close_without_wait_cancels(self, fake_api):
+        client = RevAiAPIClient(TOKEN)
+        fake_api.polls_until_done = 1000
+        manager = JobManager(poll_interval=0.01)
+        future = manager.submit(client.submit_job_url, 'https://example.com/a.mp3')
+
+        manager.close(wait=False)
+
+        assert future.cancelled()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for JobStore"""
+
+from datetime import datetime, timezone
+import pytest
+
+from src.rev_ai.apiclient import RevAiAPIClient
+from src.rev_ai.job_store import JobStore
+from src.rev_ai.models import Job, JobStatus, TopicExtractionJob
+from src.rev_ai.topic_extraction_client import TopicExtractionClient
+
+TOKEN = 'token'
+
+
+def make_job(index, status='transcribed', metadata=None):
+    job = {'id': 'job{:03d}'.format(index), 'status': status,
+           'created_on': '2024-01-{:02d}T00:00:{:02d}.00Z'.format(1 + index // 60, index % 60)}
+    if metadata:
+        job['metadata'] = metadata
+    return job
+
+
+class FakeJobList:
+    """Serves get_list_of_jobs_json pages, newest first, from a list of job json"""
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.calls = []
+
+    def __call__(self, limit=None, starting_after=None):
+        self.calls.append((limit, starting_after))
+        ordered = sorted(self.jobs, key=lambda job: job['created_on'], reverse=True)
+        start = 0
+        if starting_after is not None:
+            start = [job['id'] for job in ordered].index(starting_after) + 1
+        return [dict(job) for job in ordered[start:start + limit]]
+
+
+@pytest.fixture
+def store():
+    with JobStore(':memory:', page_size=10) as store:
+        yield store
+
+
+class TestJobStore:
+    def test_full_sync_and_query(self, store, mocker):
+        client = RevAiAPIClient(TOKEN)
+        jobs = [make_job(i, metadata='even' if i % 2 == 0 else 'odd') for i in range(25)]
+        jobs[3]['status'] = 'failed'
+        jobs[4]['status'] = 'failed'
+        mocker.patch.object(client, 'get_list_of_jobs_json', FakeJobList(jobs))
+
+        assert store.sync(client) == 25
+
+        failed = store.query(client, status=JobStatus.FAILED)
+        assert [job.id for job in failed] == ['job004', 'job003']
+        assert all(isinstance(job, Job) for job in failed)
+        assert [job.id for job in store.query(client, status='failed', metadata='odd')] == \
+            ['job003']
+        assert len(store.query(client, metadata='even')) == 13
+        assert len(store.query(client, limit=5)) == 5
+        assert store.query(client, limit=1)[0].id == 'job024'
+
+    def test_query_by_creation_date(self, store, mocker):
+        client = RevAiAPIClient(TOKEN)
+        mocker.patch.object(client, 'get_list_of_jobs_json',
+                            FakeJobList([make_job(i) for i in range(5)]))
+        store.sync(client)
+
+        since = datetime(2024, 1, 1, 0, 0, 2, tzinfo=timezone.utc)
+        jobs = store.query(client, since=since, until='2024-01-01T00:00:04')
+
+        assert [job.id for job in jobs] == ['job003', 'job002']
+
+    def test_incremental_sync_stops_at_newest_known_job(self, store, mocker):
+        client = RevAiAPIClient(TOKEN)
+        job_list = FakeJobList([make_job(i) for i in range(25)])
+        mocker.patch.object(client, 'get_list_of_jobs_json', job_list)
+        store.sync(client)
+        job_list.jobs.extend(make_job(i) for i in range(25, 28))
+        job_list.calls = []
+
+        assert store.sync(client) == 10
+        assert job_list.calls == [(10, None)]
+        assert store.query(client, limit=1)[0].id == 'job027'
+
+    def test_incremental_sync_refreshes_jobs_in_progress(self, store, mocker):
+        client = RevAiAPIClient(TOKEN)
+        jobs = [make_job(i) for i in range(25)]
+        jobs[2]['status'] = 'in_progress'
+        job_list = FakeJobList(jobs)
+        mocker.patch.object(client, 'get_list_of_jobs_json', job_list)
+        store.sync(client)
+        jobs[2]['status'] = 'transcribed'
+        job_list.calls = []
+
+        store.sync(client)
+
+        assert len(job_list.calls) == 3
+        assert store.query(client, status=JobStatus.IN_PROGRESS) == []
+
+    def test_apis_are_kept_apart(self, store, mocker):
+        client = RevAiAPIClient(TOKEN)
+        topic_client = TopicExtractionClient(TOKEN)
+        mocker.patch.object(client, 'get_list_of_jobs_json', FakeJobList([make_job(1)]))
+        mocker.patch.object(topic_client, 'get_list_of_jobs_json',
+                            FakeJobList([make_job(2, status='completed')]))
+
+        store.sync(client)
+        store.sync(topic_client)
+
+        assert [job.id for job in store.query(client)] == ['job001']
+        topic_jobs = store.query(topic_client)
+        assert [job.id for job in topic_jobs] == ['job002']
+        assert isinstance(topic_jobs[0], TopicExtractionJob)
+
+    def test_store_persists_to_file(self, tmp_path, mocker):
+        client = RevAiAPIClient(TOKEN)
+        mocker.patch.object(client, 'get_list_of_jobs_json', FakeJobList([make_job(1)]))
+        path = str(tmp_path / 'jobs.db')
+        with JobStore(path) as store:
+            store.sync(client)
+
+        with JobStore(path) as store:
+            assert [job.id for job in store.query(client)] == ['job001']
+
+    def test_no_path(self):
+        with pytest.raises(ValueError, match='path must be provided'):
+            JobStore(None)
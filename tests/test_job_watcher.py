@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for watch_jobs"""
+
+import asyncio
+import pytest
+
+from src.rev_ai.job_watcher import watch_jobs
+from src.rev_ai.models import Job, JobStatus
+
+CREATED_ON = '2018-05-05T23:23:22.29Z'
+
+
+class FakeClient:
+    """Client whose jobs progress through a list of statuses, one per refresh"""
+
+    def __init__(self, timelines, listed=None):
+        self.timelines = timelines
+        self.listed = set(timelines) if listed is None else listed
+        self.refreshes = dict.fromkeys(timelines, 0)
+        self.list_calls = []
+        self.detail_calls = []
+
+    def job(self, id_):
+        timeline = self.timelines[id_]
+        status = timeline[min(self.refreshes[id_], len(timeline) - 1)]
+        self.refreshes[id_] += 1
+        return Job(id_, CREATED_ON, status)
+
+    def get_list_of_jobs(self, limit=None, starting_after=None):
+        self.list_calls.append((limit, starting_after))
+        return [self.job(id_) for id_ in self.timelines if id_ in self.listed]
+
+    def get_job_details(self, id_):
+        self.detail_calls.append(id_)
+        return self.job(id_)
+
+
+def collect(client, ids, **kwargs):
+    async def run():
+        return [event async for event in watch_jobs(client, ids, **kwargs)]
+    return asyncio.run(run())
+
+
+class TestWatchJobs:
+    def test_yields_transitions_until_done(self):
+        client = FakeClient({
+            'a': [JobStatus.IN_PROGRESS, JobStatus.IN_PROGRESS, JobStatus.TRANSCRIBED],
+            'b': [JobStatus.IN_PROGRESS, JobStatus.FAILED]})
+
+        events = collect(client, ['a', 'b'], min_interval=0.01, max_interval=0.02)
+
+        assert [event[:3] for event in events if event[0] == 'a'] == [
+            ('a', None, JobStatus.IN_PROGRESS),
+            ('a', JobStatus.IN_PROGRESS, JobStatus.TRANSCRIBED)]
+        assert [event[:3] for event in events if event[0] == 'b'] == [
+            ('b', None, JobStatus.IN_PROGRESS),
+            ('b', JobStatus.IN_PROGRESS, JobStatus.FAILED)]
+        assert all(isinstance(event[3], Job) for event in events)
+
+    def test_due_jobs_are_refreshed_with_one_list_call(self):
+        client = FakeClient({id_: [JobStatus.TRANSCRIBED] for id_ in 'abcd'})
+
+        events = collect(client, list('abcd'), min_interval=0.01)
+
+        assert len(events) == 4
+        assert client.list_calls == [(1000, None)]
+        assert client.detail_calls == []
+
+    def test_jobs_missing_from_list_fall_back_to_details(self):
+        client = FakeClient({'a': [JobStatus.TRANSCRIBED], 'b': [JobStatus.TRANSCRIBED]},
+                            listed={'a'})
+
+        collect(client, ['a', 'b'], min_interval=0.01)
+
+        assert client.detail_calls == ['b']
+
+    def test_list_pages_are_followed(self):
+        client = FakeClient({'a': [JobStatus.TRANSCRIBED], 'b': [JobStatus.TRANSCRIBED],
+                             'c': [JobStatus.TRANSCRIBED]}, listed={'a', 'b'})
+
+        collect(client, ['a', 'c'], list_limit=2, max_list_pages=2, min_interval=0.01)
+
+        assert client.list_calls == [(2, None), (2, 'b')]
+        assert client.detail_calls == ['c']
+
+    def test_interval_backs_off_while_unchanged(self):
+        client = FakeClient({'a': [JobStatus.IN_PROGRESS] * 4 + [JobStatus.TRANSCRIBED]})
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            events = [event async for event in watch_jobs(
+                client, ['a'], min_interval=0.01, max_interval=1, backoff=2)]
+            return events, loop.time() - start
+
+        events, elapsed = asyncio.run(run())
+
+        assert len(events) == 2
+        assert elapsed >= 0.01 + 0.02 + 0.04 + 0.08
+
+    @pytest.mark.parametrize('kwargs', [{'min_interval': 0}, {'min_interval': 2, 'max_interval': 1},
+                                        {'backoff': 0.5}])
+    def test_invalid_arguments(self, kwargs):
+        with pytest.raises(ValueError):
+            collect(FakeClient({}), [], **kwargs)
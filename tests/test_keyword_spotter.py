@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for keyword spotting in streaming hypotheses"""
+
+import json
+import random
+import re
+import pytest
+
+from src.rev_ai.keyword_spotter import KeywordAutomaton, KeywordMatch, KeywordSpotter
+from src.rev_ai.models.streaming import StreamingFinal, StreamingElement
+
+PHRASES = ['credit card', 'card number', 'credit card number', 'number', 'Social Security']
+
+
+def partial(text):
+    return json.dumps({'type': 'partial', 'ts': 0, 'end_ts': 1, 'elements': [
+        {'type': 'text', 'value': word} for word in text.split()]})
+
+
+def final(text, ts=0.0):
+    elements = []
+    for index, word in enumerate(text.split()):
+        if index:
+            elements.append(StreamingElement('punct', ' '))
+        elements.append(StreamingElement('text', word, ts + index, ts + index + 0.5, 1.0))
+    return StreamingFinal(ts, ts + len(elements), elements)
+
+
+class TestKeywordAutomaton:
+    def test_scan_finds_overlapping_phrases(self):
+        automaton = KeywordAutomaton(PHRASES)
+
+        assert automaton.scan('My credit card number, please.') == \
+            ['credit card', 'credit card number', 'card number', 'number']
+        assert automaton.scan('my SOCIAL security') == ['Social Security']
+        assert automaton.scan('credit cards') == []
+        # a phrase is found when a longer one sharing its prefix is not
+        assert automaton.scan('credit card holder') == ['credit card']
+
+    def test_case_sensitive_and_duplicates(self):
+        automaton = KeywordAutomaton(['Refund', 'refund', 'refund'], case_sensitive=True)
+
+        assert automaton.phrases == ['Refund', 'refund']
+        assert automaton.scan('refund Refund REFUND') == ['refund', 'Refund']
+        assert KeywordAutomaton(['Refund', 'refund']).phrases == ['Refund']
+
+    def test_phrases_must_have_words(self):
+        with pytest.raises(ValueError):
+            KeywordAutomaton(['', ' ... '])
+
+
+class TestKeywordSpotter:
+    def test_partials_are_debounced(self):
+        spotter = KeywordSpotter(PHRASES)
+
+        assert spotter.update(partial('my credit')) == []
+        assert spotter.update(partial('my credit card')) == []
+        assert spotter.update(partial('my credit card is')) == \
+            [KeywordMatch('credit card', None, None, False)]
+        assert spotter.update(partial('my credit card is due')) == []
+        assert spotter.words_scanned == 5
+
+    def test_revised_partials_are_not_reported(self):
+        spotter = KeywordSpotter(['refund'])
+
+        assert spotter.update(partial('a refund')) == []
+        assert spotter.update(partial('a re fund')) == []
+        assert spotter.update(partial('a re fund now')) == []
+        assert spotter.update(final('a re fund now')) == []
+
+    def test_finals_are_reported_with_timestamps(self):
+        spotter = KeywordSpotter(PHRASES, debounce=0)
+
+        assert spotter.update(partial('read me')) == []
+        assert spotter.update(partial('read me the credit card')) == []
+        matches = spotter.update(final('read me the credit card number', ts=10))
+
+        assert matches == [KeywordMatch('credit card', 13, 14.5, True),
+                           KeywordMatch('credit card number', 13, 15.5, True),
+                           KeywordMatch('card number', 14, 15.5, True),
+                           KeywordMatch('number', 15, 15.5, True)]
+        # partials after a final start a new utterance
+        assert spotter.update(partial('number')) == []
+        assert spotter.matches == matches
+
+    def test_shared_automaton_and_other_messages(self):
+        automaton = KeywordAutomaton(PHRASES)
+        first, second = KeywordSpotter(automaton, debounce=1), KeywordSpotter(automaton)
+
+        assert first.update(partial('number')) == [KeywordMatch('number', None, None, False)]
+        assert second.update(partial('number')) == []
+        assert first.update('') == []
+        assert first.update('{"type": "connected", "id": "a"}') == []
+        with pytest.raises(ValueError):
+            KeywordSpotter(PHRASES, debounce=-1)
+
+    def test_incremental_spotting_finds_what_regex_finds(self):
+        words = ['word{}'.format(i) for i in range(2000)]
+        rng = random.Random(0)
+        phrases = [' '.join(rng.sample(words, rng.randint(1, 3))) for _ in range(5000)]
+        utterance = ' '.join(rng.choice(words) for _ in range(60))
+        partials = [partial(' '.join(utterance.split()[:count])) for count in range(1, 61)]
+        pattern = re.compile(r'\b(?:' + '|'.join(
+            re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True)) + r')\b')
+
+        spotter = KeywordSpotter(phrases, debounce=1)
+        for response in partials:
+            spotter.update(response)
+
+        # each partial adds one word, which is the only one scanned
+        assert spotter.words_scanned == 60
+        # regex alternation skips overlapping phrases, which the automaton also reports
+        assert set(m.phrase for m in spotter.matches) >= set(pattern.findall(utterance))
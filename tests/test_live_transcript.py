@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the live transcript"""
+
+import json
+
+import pytest
+
+from src.rev_ai.models.asynchronous import Element, Monologue, Transcript
+from src.rev_ai.models.streaming import LiveTranscript, MultiChannelLiveTranscript, \
+    StreamingPartial
+from src.rev_ai.models.streaming.hypothesis import parse_streaming_response
+
+
+def partial(*words):
+    return json.dumps({'type': 'partial', 'ts': 0, 'end_ts': 1,
+                       'elements': [{'type': 'text', 'value': word} for word in words]})
+
+
+FIRST_FINAL = {'type': 'final', 'ts': 0, 'end_ts': 1.2, 'elements': [
+    {'type': 'text', 'value': 'Hello', 'ts': 0.1, 'end_ts': 0.5, 'confidence': 0.9},
+    {'type': 'punct', 'value': ' '},
+    {'type': 'text', 'value': 'world', 'ts': 0.6, 'end_ts': 1.2, 'confidence': 0.8},
+    {'type': 'punct', 'value': '.'}]}
+SECOND_FINAL = {'type': 'final', 'ts': 1.5, 'end_ts': 2.0, 'elements': [
+    {'type': 'text', 'value': 'Bye', 'ts': 1.5, 'end_ts': 2.0, 'confidence': 1.0},
+    {'type': 'punct', 'value': '.'}]}
+
+
+class TestLiveTranscript:
+    def test_partials_replace_each_other(self):
+        live = LiveTranscript()
+
+        live.update(partial('hello'))
+        assert live.current_text() == 'hello'
+        live.update(partial('hello', 'word'))
+        assert live.current_text() == 'hello word'
+        assert live.final_text() == ''
+        assert live.elements == []
+
+    def test_finals_are_appended_and_clear_the_partial(self):
+        live = LiveTranscript()
+
+        live.update(partial('hello', 'word'))
+        live.update(json.dumps(FIRST_FINAL))
+        assert live.current_text() == 'Hello world.'
+        live.update(partial('bye'))
+        assert live.current_text() == 'Hello world. bye'
+        live.update(SECOND_FINAL)
+
+        assert live.current_text() == 'Hello world. Bye.'
+        assert live.partial is None
+        assert live.finals == 2
+        assert len(live.elements) == 6
+
+    def test_accepts_parsed_hypotheses_and_ignores_other_messages(self):
+        live = LiveTranscript()
+
+        assert live.update('') is None
+        assert live.update({'type': 'connected', 'id': 'testid'}) is None
+        hypothesis = live.update(parse_streaming_response(json.loads(partial('hi'))))
+
+        assert isinstance(hypothesis, StreamingPartial)
+        assert live.partial_text() == 'hi'
+
+    def test_current_text_is_cached_between_updates(self):
+        live = LiveTranscript()
+        live.update(FIRST_FINAL)
+
+        assert live.current_text() is live.current_text()
+
+    def test_text_since_follows_the_finals(self):
+        live = LiveTranscript()
+        shown = live.final_length
+
+        live.update(FIRST_FINAL)
+        assert live.text_since(shown) == 'Hello world.'
+        shown = live.final_length
+        assert live.text_since(shown) == ''
+        live.update(partial('bye'))
+        assert (live.text_since(shown), live.partial_text()) == ('', 'bye')
+        live.update(SECOND_FINAL)
+
+        assert live.text_since(shown) == ' Bye.'
+        assert live.text_since(3) == 'lo world. Bye.'
+        assert live.final_length == len(live.final_text())
+        with pytest.raises(ValueError):
+            live.text_since(live.final_length + 1)
+
+    def test_final_text_is_extended_rather_than_joined_again(self):
+        live = LiveTranscript()
+        live.update(FIRST_FINAL)
+        final_text = live.final_text()
+
+        live.update(partial('bye'))
+        assert live.final_text() is final_text
+        assert live.current_text() == final_text + ' bye'
+        live.update(SECOND_FINAL)
+        assert live.final_text() == final_text + ' Bye.'
+
+    def test_to_transcript(self):
+        live = LiveTranscript(speaker=1)
+        live.update(FIRST_FINAL)
+        live.update(partial('more'))
+
+        assert live.to_transcript() == Transcript([Monologue(1, [
+            Element('text', 'Hello', 0.1, 0.5, 0.9),
+            Element('punct', ' ', None, None, None),
+            Element('text', 'world', 0.6, 1.2, 0.8),
+            Element('punct', '.', None, None, None)])])
+        with_partial = live.to_transcript(include_partial=True)
+        assert with_partial.monologues[0].elements[-1] == Element('text', 'more', None, None, None)
+        assert with_partial.to_dict()['monologues'][0]['speaker'] == 1
+
+
+def final(ts, *words):
+    return {'type': 'final', 'ts': ts, 'end_ts': ts + 1, 'elements': [
+        {'type': 'text', 'value': word, 'ts': ts, 'end_ts': ts + 1, 'confidence': 1.0}
+        for word in words]}
+
+
+class TestMultiChannelLiveTranscript:
+    def test_finals_are_merged_by_timestamp(self):
+        live = MultiChannelLiveTranscript(2, speakers=['Agent', 'Customer'])
+
+        # the customer's session answers later than the agent's
+        live.update(0, final(0, 'hello'))
+        live.update(0, final(4, 'sure'))
+        live.update(1, final(2, 'hi'))
+        live.update(1, final(3, 'question'))
+        live.update(0, partial('one', 'moment'))
+
+        assert live.turns() == [(0, 'hello'), (1, 'hi question'), (0, 'sure')]
+        assert live.current_text() == 'Agent: hello\nCustomer: hi question\nAgent: sure\n' \
+            'Agent: one moment'
+        transcript = live.to_transcript()
+        assert [(m.speaker, m.speaker_info.display_name, [e.value for e in m.elements])
+                for m in transcript.monologues] == \
+            [(0, 'Agent', ['hello']), (1, 'Customer', ['hi', 'question']), (0, 'Agent', ['sure'])]
+        assert live.channels[1].final_text() == 'hi question'
+
+    def test_default_labels_and_validation(self):
+        live = MultiChannelLiveTranscript(3)
+        live.update(2, final(0, 'hey'))
+
+        assert live.current_text() == 'Speaker 2: hey'
+        assert live.to_transcript().monologues[0].speaker_info is None
+        assert live.update(1, '') is None
+        with pytest.raises(ValueError):
+            MultiChannelLiveTranscript(0)
+        with pytest.raises(ValueError):
+            MultiChannelLiveTranscript(2, speakers=['Agent'])
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """Unit tests for the media config class"""
 
+import pytest
 from src.rev_ai.models.streaming import MediaConfig
 
 
@@ -52,3 +53,19 @@ class TestMediaConfig():
         content_type_string = example_config.get_content_type_string()
 
         assert content_type_string == 'content_type;channels=CHANNELS'
+
+    @pytest.mark.parametrize('audio_format, sample_width', [
+        ('S16LE', 2), ('F32LE', 4), ('S24LE', 3), ('U8', 1), ('F64BE', 8), ('MP3', None), (None, None)
+    ])
+    def test_get_sample_width(self, audio_format, sample_width):
+        example_config = MediaConfig('audio/x-raw', 'interleaved', 16000, audio_format, 1)
+
+        assert example_config.get_sample_width() == sample_width
+
+    def test_get_bytes_per_second(self):
+        assert MediaConfig('audio/x-raw', 'interleaved', 16000, 'S16LE', 2) \
+            .get_bytes_per_second() == 64000
+        assert MediaConfig('audio/x-raw', 'interleaved', 8000, 'F32LE').get_bytes_per_second() \
+            == 32000
+        assert MediaConfig('audio/x-raw', 'interleaved', None, 'S16LE', 1) \
+            .get_bytes_per_second() is None
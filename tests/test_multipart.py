@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for MultipartMediaBody"""
+
+import io
+import mmap
+import pytest
+import tempfile
+
+from src.rev_ai.multipart import MultipartMediaBody
+
+OPTIONS = '{"metadata": "test"}'
+MEDIA = b'0123456789' * 10
+
+
+def strided(data):
+    """Returns a non-contiguous memoryview of the 16 bit samples of data, as every other
+    sample of a buffer in which they are followed by zeros"""
+    interleaved = bytearray(2 * len(data))
+    for start in range(0, len(data), 2):
+        interleaved[2 * start:2 * start + 2] = data[start:start + 2]
+    return memoryview(interleaved).cast('H')[::2]
+
+
+def parse_media(body_bytes, boundary):
+    parts = body_bytes.split('--{}'.format(boundary).encode('utf-8'))
+    options_part, media_part = parts[1], parts[2]
+    return options_part.split(b'\r\n\r\n', 1)[1][:-2], media_part.split(b'\r\n\r\n', 1)[1][:-2]
+
+
+class TestMultipartMediaBody:
+    @pytest.mark.parametrize('media', [MEDIA, bytearray(MEDIA), memoryview(MEDIA),
+                                       memoryview(MEDIA).cast('H'), strided(MEDIA)])
+    def test_buffer_media(self, media):
+        body = MultipartMediaBody(media, OPTIONS, chunk_size=7)
+
+        content = b''.join(bytes(chunk) for chunk in body)
+
+        assert len(body) == len(content)
+        assert parse_media(content, body.boundary) == (OPTIONS.encode('utf-8'), MEDIA)
+        assert b'filename="media"' in content
+
+    def test_mmap_media(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(MEDIA)
+            f.flush()
+            media = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            body = MultipartMediaBody(media, OPTIONS)
+
+            content = b''.join(bytes(chunk) for chunk in body)
+            media.close()
+
+        assert len(body) == len(content)
+        assert parse_media(content, body.boundary)[1] == MEDIA
+
+    def test_file_media_uses_remaining_length(self):
+        media = io.BytesIO(MEDIA)
+        media.seek(10)
+        body = MultipartMediaBody(media, OPTIONS, filename='test.wav', chunk_size=16)
+
+        content = b''.join(body)
+
+        assert len(body) == len(content)
+        assert parse_media(content, body.boundary)[1] == MEDIA[10:]
+        assert b'filename="test.wav"' in content
+
+    def test_iterable_media_has_unknown_length(self):
+        body = MultipartMediaBody((MEDIA[i:i + 3] for i in range(0, len(MEDIA), 3)), OPTIONS)
+
+        assert body.length is None
+        assert body
+        with pytest.raises(TypeError):
+            len(body)
+        assert parse_media(b''.join(body), body.boundary)[1] == MEDIA
+
+    def test_iterable_media_with_content_length(self):
+        body = MultipartMediaBody(iter([MEDIA]), OPTIONS, content_length=len(MEDIA))
+
+        assert len(body) == len(b''.join(body))
+
+    def test_body_can_only_be_iterated_once(self):
+        body = MultipartMediaBody(MEDIA, OPTIONS)
+        list(body)
+
+        with pytest.raises(RuntimeError):
+            list(body)
+
+    def test_content_type_contains_boundary(self):
+        body = MultipartMediaBody(MEDIA, OPTIONS)
+
+        assert body.content_type == 'multipart/form-data; boundary={}'.format(body.boundary)
+
+    def test_no_media(self):
+        with pytest.raises(ValueError, match='media must be provided'):
+            MultipartMediaBody(None, OPTIONS)
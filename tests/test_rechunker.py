@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the ring buffer and audio re-chunking"""
+
+import asyncio
+import pytest
+
+from src.rev_ai.asyncstreamingclient import AsyncRevAiStreamingClient
+from src.rev_ai.models.streaming import MediaConfig
+from src.rev_ai.rechunker import AudioRechunker
+from src.rev_ai.ring_buffer import RingBuffer
+from tests.helpers.streaming_server import StreamingServer
+
+# 32000 bytes per second, 2 bytes per frame
+CONFIG = MediaConfig('audio/x-raw', 'interleaved', 16000, 'S16LE', 1)
+
+
+class TestRingBuffer:
+    def test_write_and_read_wrap_around(self):
+        ring = RingBuffer(8)
+
+        assert ring.write(b'abcdef') == 6
+        assert ring.read(4) == b'abcd'
+        assert ring.write(b'ghijklmn') == 6
+        assert len(ring) == 8
+        assert ring.free == 0
+        assert ring.read() == b'efghijkl'
+        assert len(ring) == 0
+
+    def test_overwrite_keeps_newest_bytes(self):
+        ring = RingBuffer(4)
+        ring.write(b'abc')
+
+        ring.write(b'de', overwrite=True)
+        assert ring.read() == b'bcde'
+
+        ring.write(b'0123456789', overwrite=True)
+        assert ring.read() == b'6789'
+
+    def test_peek_and_read_into(self):
+        ring = RingBuffer(6)
+        ring.write(b'abcd')
+        ring.skip(3)
+        ring.write(b'efgh')
+        out = bytearray(3)
+
+        assert ring.peek_into(out, offset=2) == 3
+        assert out == b'fgh'
+        assert len(ring) == 5
+        assert ring.read_into(out) == 3
+        assert out == b'def'
+        assert ring.read() == b'gh'
+
+    def test_capacity_validation(self):
+        with pytest.raises(ValueError):
+            RingBuffer(0)
+
+
+class TestAudioRechunker:
+    def test_chunk_size_from_config(self):
+        assert AudioRechunker(CONFIG, chunk_seconds=0.1).chunk_size == 3200
+        stereo = MediaConfig('audio/x-raw', 'interleaved', 44100, 'S16LE', 2)
+        # rounded down to whole frames of 4 bytes
+        assert AudioRechunker(stereo, chunk_seconds=0.0101).chunk_size == 1780
+
+    def test_constructor_validation(self):
+        with pytest.raises(ValueError):
+            AudioRechunker(MediaConfig('audio/*'))
+        with pytest.raises(ValueError):
+            AudioRechunker(CONFIG, chunk_seconds=0)
+        with pytest.raises(ValueError):
+            AudioRechunker(chunk_size=0)
+
+    def test_coalesces_small_frames(self):
+        rechunker = AudioRechunker(CONFIG, chunk_seconds=0.1)
+        frames = [bytes([i]) * 320 for i in range(25)]
+
+        chunks = list(rechunker.rechunk(frames))
+
+        assert [len(chunk) for chunk in chunks] == [3200, 3200, 1600]
+        assert b''.join(chunks) == b''.join(frames)
+
+    def test_splits_large_blobs(self):
+        rechunker = AudioRechunker(chunk_size=1000)
+        blob = bytes(range(256)) * 20
+
+        chunks = list(rechunker.rechunk([blob, b'x']))
+
+        assert [len(chunk) for chunk in chunks] == [1000] * 5 + [121]
+        assert b''.join(chunks) == blob + b'x'
+
+    def test_reuse_buffer_yields_views_of_one_buffer(self):
+        rechunker = AudioRechunker(chunk_size=4, reuse_buffer=True)
+
+        chunks = []
+        for chunk in rechunker.rechunk([b'abcdef', b'ghij']):
+            assert isinstance(chunk, memoryview)
+            chunks.append(bytes(chunk))
+
+        assert chunks == [b'abcd', b'efgh', b'ij']
+
+    def test_rechunk_async(self):
+        async def frames():
+            for i in range(5):
+                yield bytes([i]) * 3
+
+        async def collect():
+            return [chunk async for chunk in AudioRechunker(chunk_size=4).rechunk_async(frames())]
+
+        assert asyncio.run(collect()) == [b'\x00\x00\x00\x01', b'\x01\x01\x02\x02',
+                                          b'\x02\x03\x03\x03', b'\x04\x04\x04']
+
+    def test_async_client_sends_rechunked_audio(self):
+        server = StreamingServer()
+        client = AsyncRevAiStreamingClient('token', CONFIG, on_connected=lambda id_: None,
+                                           on_close=lambda code, reason: None)
+
+        async def stream():
+            await server.start()
+            client.base_url = server.url
+            try:
+                responses = await client.start([b'\x01' * 320] * 30, chunk_seconds=0.1)
+                return [response async for response in responses]
+            finally:
+                await server.stop()
+
+        asyncio.run(stream())
+
+        assert server.sessions[0].binary_messages == 3
+        assert server.sessions[0].audio == b'\x01' * 9600
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the resilient streaming client"""
+
+import json
+import time
+import pytest
+
+from src.rev_ai.models.streaming import MediaConfig, StreamingFinal
+from src.rev_ai.resilientstreamingclient import ResilientRevAiStreamingClient
+from tests.helpers.streaming_server import StreamingServer
+
+# 32000 bytes per second
+CONFIG = MediaConfig('audio/x-raw', 'interleaved', 16000, 'S16LE', 1)
+CHUNK = 3200
+
+
+def make_client(connected=None, closed=None, **kwargs):
+    return ResilientRevAiStreamingClient(
+        'token', CONFIG,
+        on_connected=(connected if connected is not None else []).append,
+        on_close=lambda code, reason: (closed if closed is not None else []).append(code),
+        reconnect_backoff=0, **kwargs)
+
+
+def stream(server, client, chunks, **options):
+    server.start_in_thread()
+    client.base_url = server.url
+    try:
+        responses = list(client.start(iter(chunks), **options))
+        client.request_thread.join()
+        return responses
+    finally:
+        server.stop_thread()
+
+
+class TestResilientStreamingClient:
+    def test_constructor_requires_raw_config(self):
+        with pytest.raises(ValueError):
+            ResilientRevAiStreamingClient('token', MediaConfig('audio/*'))
+        with pytest.raises(ValueError):
+            ResilientRevAiStreamingClient('token', CONFIG, replay_seconds=0)
+
+    def test_streams_without_disconnection(self):
+        server = StreamingServer(final_every=4)
+        closed = []
+        client = make_client(closed=closed)
+
+        responses = stream(server, client, [b'\x01' * CHUNK] * 8, parsed=True)
+
+        finals = [r for r in responses if isinstance(r, StreamingFinal)]
+        assert [(f.timestamp, f.end_timestamp) for f in finals] == [(0, 0.4), (0.4, 0.8)]
+        assert client.reconnects == 0
+        assert closed == [1000]
+
+    def test_resumes_after_disconnection(self):
+        server = StreamingServer(final_every=4, disconnect_after=[10])
+        connected = []
+        client = make_client(connected=connected)
+        chunks = [bytes([i]) * CHUNK for i in range(20)]
+
+        responses = stream(server, client, chunks, parsed=True)
+
+        assert client.reconnects == 1
+        assert connected == ['testid', 'testid2']
+        resumed = server.sessions[1]
+        # the audio after the last final, at 0.8 seconds, is sent again
+        assert resumed.query['start_ts'] == '0.8'
+        assert bytes(resumed.audio) == b''.join(chunks[8:])
+        assert resumed.received_eos
+        finals = [r for r in responses if isinstance(r, StreamingFinal)]
+        assert [(f.timestamp, f.end_timestamp) for f in finals] == \
+            [(0, 0.4), (0.4, 0.8), (0.8, 1.2), (1.2, 1.6), (1.6, 2.0)]
+
+    def test_resumes_with_json_responses_and_start_ts(self):
+        server = StreamingServer(final_every=5, disconnect_after=[7])
+        client = make_client()
+
+        responses = stream(server, client, [b'\x01' * CHUNK] * 10, start_ts=10)
+
+        finals = [json.loads(r) for r in responses if json.loads(r)['type'] == 'final']
+        assert [(f['ts'], f['end_ts']) for f in finals] == [(10, 10.5), (10.5, 11)]
+        assert server.sessions[1].query['start_ts'] == '10.5'
+        assert len(server.sessions[1].audio) == 5 * CHUNK
+
+    def test_gives_up_after_max_reconnects(self):
+        server = StreamingServer(final_every=2, disconnect_after=[3, 1, 1])
+        errors = []
+        client = make_client(max_reconnects=2)
+        client.on_error = errors.append
+
+        stream(server, client, [b'\x01' * CHUNK] * 6)
+
+        assert len(server.sessions) == 3
+        assert len(errors) == 1
+
+    def test_finish_after_resuming(self):
+        server = StreamingServer(final_every=4, disconnect_after=[6]).start_in_thread()
+        client = make_client()
+        client.base_url = server.url
+
+        def microphone():
+            while True:
+                time.sleep(0.002)
+                yield b'\x01' * CHUNK
+        try:
+            for _ in client.start(microphone(), parsed=True):
+                if client.reconnects:
+                    break
+            report = client.finish(timeout=5)
+        finally:
+            server.stop_thread()
+
+        assert report.closed and report.eos_sent
+        assert report.unfinalized_seconds == 0
+        assert isinstance(report.responses[-1], StreamingFinal)
+        assert server.sessions[-1].received_eos
+
+    def test_deduplicate_trims_overlapping_finals(self):
+        client = make_client()
+        client._last_final_end = 1.0
+        overlapping = {'type': 'final', 'ts': 0.5, 'end_ts': 2.0, 'elements': [
+            {'type': 'text', 'value': 'old', 'ts': 0.5, 'end_ts': 1.0},
+            {'type': 'punct', 'value': ' '},
+            {'type': 'text', 'value': 'new', 'ts': 1.1, 'end_ts': 2.0},
+            {'type': 'punct', 'value': '.'}]}
+
+        assert client._deduplicate({'type': 'final', 'ts': 0.2, 'end_ts': 1.0}) is None
+        assert client._deduplicate(overlapping) == {'type': 'final', 'ts': 1.0, 'end_ts': 2.0,
+                                                    'elements': overlapping['elements'][2:]}
+        later = {'type': 'final', 'ts': 1.0, 'end_ts': 2.0, 'elements': []}
+        assert client._deduplicate(later) is later
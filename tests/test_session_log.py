@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for recording and replaying streaming sessions"""
+
+import io
+import time
+import pytest
+
+from src.rev_ai import framing
+from src.rev_ai.models.streaming import MediaConfig, StreamingFinal
+from src.rev_ai.session_log import RECEIVED, SENT, SessionRecorder, read_session_log, \
+    replay_session
+from src.rev_ai.streaming_metrics import StreamingMetrics
+from src.rev_ai.streamingclient import RevAiStreamingClient
+from tests.helpers.streaming_server import StreamingServer
+
+# 32000 bytes per second
+CONFIG = MediaConfig('audio/x-raw', 'interleaved', 16000, 'S16LE', 1)
+
+
+def make_client(closes):
+    return RevAiStreamingClient('token', CONFIG, on_connected=lambda id_: None,
+                                on_close=lambda code, reason: closes.append((code, reason)))
+
+
+def record_session(include_audio=True, **server_options):
+    """Streams 4 chunks to a local server and returns the responses and the log"""
+    server = StreamingServer(final_every=2, **server_options).start_in_thread()
+    client = make_client([])
+    client.base_url = server.url
+    log = io.BytesIO()
+    recorder = SessionRecorder(log, include_audio=include_audio)
+    try:
+        responses = list(client.start(iter([b'\x01' * 3200] * 4), metadata='meta',
+                                      recorder=recorder))
+        client.request_thread.join()
+    finally:
+        server.stop_thread()
+    return responses, log.getvalue()
+
+
+class TestSessionLog:
+    def test_records_frames_in_both_directions(self):
+        responses, log = record_session()
+
+        info, records = read_session_log(io.BytesIO(log))
+        records = list(records)
+
+        assert info['content_type'] == CONFIG.get_content_type_string()
+        assert info['options']['metadata'] == 'meta'
+        assert b'token' not in log
+        sent = [r for r in records if r.direction == SENT]
+        assert [r.data for r in sent] == [b'\x01' * 3200] * 4 + [b'EOS']
+        received = [r for r in records if r.direction == RECEIVED]
+        assert received[0].data.startswith(b'{"type": "connected"')
+        assert [r.data.decode('utf-8') for r in received[1:-1]] == responses
+        assert received[-1].opcode == framing.OPCODE_CLOSE
+        assert [r.time for r in records] == sorted(r.time for r in records)
+
+    def test_audio_can_be_left_out(self):
+        _, full = record_session()
+        _, compact = record_session(include_audio=False)
+
+        _, records = read_session_log(io.BytesIO(compact))
+        sent = [r for r in records if r.direction == SENT]
+
+        assert len(compact) < len(full) - 4 * 3000
+        assert [(r.size, r.data) for r in sent[:4]] == [(3200, b'')] * 4
+
+    def test_replay_yields_recorded_responses(self):
+        responses, log = record_session()
+        closes = []
+
+        replayed = list(replay_session(make_client(closes), io.BytesIO(log), speedup=None))
+
+        assert replayed == responses
+        assert closes == [(1000, 'End of input. Closing')]
+
+    def test_replay_parsed(self):
+        _, log = record_session()
+
+        replayed = list(replay_session(make_client([]), io.BytesIO(log), speedup=None,
+                                       parsed=True))
+
+        assert [type(r) for r in replayed].count(StreamingFinal) == 2
+
+    def test_replay_at_recorded_and_accelerated_speed(self):
+        _, log = record_session(latency=0.1)
+        _, records = read_session_log(io.BytesIO(log))
+        duration = list(records)[-1].time
+
+        start = time.monotonic()
+        list(replay_session(make_client([]), io.BytesIO(log)))
+        recorded_speed = time.monotonic() - start
+        start = time.monotonic()
+        list(replay_session(make_client([]), io.BytesIO(log), speedup=10))
+        accelerated = time.monotonic() - start
+
+        assert recorded_speed >= duration >= 0.1
+        assert accelerated < duration / 2
+
+    def test_replay_reproduces_latencies(self):
+        _, log = record_session(latency=0.05)
+        metrics = StreamingMetrics(CONFIG)
+
+        list(replay_session(make_client([]), io.BytesIO(log), metrics=metrics))
+
+        assert metrics.frames_sent == 4
+        assert metrics.final_latency.count == 2
+        assert metrics.final_latency.min >= 0.05
+
+    def test_truncated_log_ends_replay(self):
+        responses, log = record_session()
+
+        replayed = list(replay_session(make_client([]), io.BytesIO(log[:-40]), speedup=None))
+
+        assert replayed == responses[:len(replayed)]
+        assert replayed
+
+    def test_recorder_writes_to_path(self, tmp_path):
+        path = str(tmp_path / 'session.rvsl')
+        with SessionRecorder(path) as recorder:
+            recorder.begin({'options': {}})
+            recorder.received(framing.OPCODE_TEXT, b'{"type": "connected", "id": "a"}')
+
+        info, records = read_session_log(path)
+
+        assert info == {'options': {}}
+        assert len(list(records)) == 1
+        with pytest.raises(ValueError):
+            recorder.begin({})
+
+    def test_not_a_session_log(self):
+        with pytest.raises(ValueError):
+            read_session_log(io.BytesIO(b'RIFF'))
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for client side silence trimming"""
+
+import io
+import json
+import math
+import struct
+import wave
+import pytest
+
+from src.rev_ai.apiclient import RevAiAPIClient
+from src.rev_ai.models.asynchronous import Element, Monologue, Transcript, OffsetMap, \
+    SilenceTrimOptions
+from src.rev_ai.silence_trimming import trim_silence
+
+try:
+    from urllib.parse import urljoin
+except ImportError:
+    from urlparse import urljoin
+
+TOKEN = "token"
+JOBS_URL = urljoin(RevAiAPIClient.base_url, 'jobs')
+RATE = 8000
+
+
+def make_wav(sections, sample_width=2, channels=1):
+    """Builds a WAV file from (seconds, is_speech) sections"""
+    samples = []
+    for seconds, is_speech in sections:
+        for i in range(int(seconds * RATE)):
+            value = int(0.5 * math.sin(2 * math.pi * 440 * i / RATE) * 32767) if is_speech else 0
+            samples.extend([value] * channels)
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(sample_width)
+        writer.setframerate(RATE)
+        if sample_width == 2:
+            writer.writeframes(struct.pack('<{}h'.format(len(samples)), *samples))
+        else:
+            writer.writeframes(bytes(((s >> 8) + 128) & 0xff for s in samples))
+    return output.getvalue()
+
+
+def wav_duration(data):
+    with wave.open(io.BytesIO(data), 'rb') as reader:
+        return reader.getnframes() / reader.getframerate()
+
+
+class TestSilenceTrimming:
+    @pytest.mark.parametrize('sample_width, channels', [(2, 1), (2, 2), (1, 1)])
+    def test_trim_silence_cuts_long_silences(self, energy_backend, sample_width, channels):
+        media = make_wav([(1, True), (3, False), (1, True), (0.5, False), (1, True)],
+                         sample_width, channels)
+        options = SilenceTrimOptions(min_silence_seconds=1, padding_seconds=0.2)
+
+        trimmed, offset_map = trim_silence(io.BytesIO(media), options)
+
+        assert wav_duration(trimmed) == pytest.approx(3.9, abs=0.05)
+        assert offset_map.segments[0] == (0.0, 0.0)
+        assert offset_map.segments[1] == pytest.approx((1.2, 3.8), abs=0.05)
+        assert offset_map.to_original(2.0) == pytest.approx(4.6, abs=0.05)
+
+    def test_trim_silence_without_silence_keeps_media(self, energy_backend):
+        media = make_wav([(2, True)])
+
+        trimmed, offset_map = trim_silence(io.BytesIO(media))
+
+        assert wav_duration(trimmed) == 2
+        assert offset_map == OffsetMap([(0.0, 0.0)])
+
+    def test_trim_silence_not_wav(self):
+        with pytest.raises(ValueError, match='PCM WAV'):
+            trim_silence(io.BytesIO(b'ID3 not a wav file'))
+
+    def test_options_validation(self):
+        with pytest.raises(ValueError):
+            SilenceTrimOptions(frame_seconds=0)
+        with pytest.raises(ValueError):
+            SilenceTrimOptions(min_silence_seconds=0.2, padding_seconds=0.2)
+
+
+class TestOffsetMap:
+    def test_to_original(self):
+        offset_map = OffsetMap([(0, 0), (1, 5), (2, 10)])
+
+        assert offset_map.to_original(0.5) == 0.5
+        assert offset_map.to_original(1) == 5
+        assert offset_map.to_original(1, is_end=True) == 1
+        assert offset_map.to_original(2.5) == 10.5
+        assert offset_map.to_original(None) is None
+
+    def test_remap_transcript(self):
+        offset_map = OffsetMap([(0, 0), (1, 5)])
+        transcript = Transcript([Monologue(0, [
+            Element('text', 'hello', 0.5, 1, 0.9),
+            Element('punct', ' ', None, None, None),
+            Element('text', 'world', 1, 1.5, 0.8)])])
+
+        remapped = offset_map.remap_transcript(transcript)
+
+        assert remapped == Transcript([Monologue(0, [
+            Element('text', 'hello', 0.5, 1, 0.9),
+            Element('punct', ' ', None, None, None),
+            Element('text', 'world', 5, 5.5, 0.8)])])
+        assert transcript.monologues[0].elements[2].timestamp == 1
+
+    def test_to_dict_round_trip(self):
+        offset_map = OffsetMap([(0, 0), (1, 5)])
+
+        assert OffsetMap.from_json(json.loads(json.dumps(offset_map.to_dict()))) == offset_map
+
+
+@pytest.mark.usefixtures('mock_session', 'make_mock_response')
+class TestSubmitWithSilenceTrimming:
+    def test_submit_job_local_file_with_silence_trimming(self, tmp_path, mock_session,
+                                                         make_mock_response):
+        path = tmp_path / 'call.wav'
+        path.write_bytes(make_wav([(1, True), (3, False), (1, True)]))
+        data = {'id': '1', 'status': 'in_progress', 'created_on': '2018-05-05T23:23:22.29Z'}
+        mock_session.request.return_value = make_mock_response(url=JOBS_URL, json_data=data)
+        client = RevAiAPIClient(TOKEN)
+
+        job = client.submit_job_local_file(str(path), silence_trim_config=SilenceTrimOptions())
+
+        files = mock_session.request.call_args[1]['files']
+        assert files['media'][0] == str(path)
+        assert wav_duration(files['media'][1]) == pytest.approx(2.4, abs=0.05)
+        assert job.offset_map.to_original(1.5) == pytest.approx(4.1, abs=0.05)
+
+    def test_get_transcript_object_with_offset_map(self, mock_session, make_mock_response):
+        data = {'monologues': [{'speaker': 0, 'elements': [
+            {'type': 'text', 'value': 'hi', 'ts': 1.5, 'end_ts': 2, 'confidence': 1}]}]}
+        mock_session.request.return_value = make_mock_response(json_data=data)
+        client = RevAiAPIClient(TOKEN)
+
+        transcript = client.get_transcript_object('1', offset_map=OffsetMap([(0, 0), (1, 4)]))
+
+        assert transcript.monologues[0].elements[0].timestamp == 4.5
+        assert transcript.monologues[0].elements[0].end_timestamp == 5
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the streaming hypothesis models"""
+
+from src.rev_ai.models.streaming import StreamingElement, StreamingFinal, StreamingPartial
+from src.rev_ai.models.streaming.hypothesis import parse_streaming_response
+
+FINAL = {
+    'type': 'final',
+    'ts': 1.01,
+    'end_ts': 3.2,
+    'elements': [
+        {'type': 'text', 'value': 'hello', 'ts': 1.04, 'end_ts': 1.55, 'confidence': 0.9},
+        {'type': 'punct', 'value': ' '},
+        {'type': 'text', 'value': 'world', 'ts': 1.6, 'end_ts': 3.2, 'confidence': 0.8},
+        {'type': 'punct', 'value': '.'}
+    ]
+}
+PARTIAL = {
+    'type': 'partial',
+    'ts': 1.01,
+    'end_ts': 1.5,
+    'elements': [{'type': 'text', 'value': 'hello'}]
+}
+
+
+class TestStreamingHypothesis:
+    def test_parse_final(self):
+        final = parse_streaming_response(FINAL)
+
+        assert isinstance(final, StreamingFinal)
+        assert final.timestamp == 1.01
+        assert final.end_timestamp == 3.2
+        assert final.elements == [
+            StreamingElement('text', 'hello', 1.04, 1.55, 0.9),
+            StreamingElement('punct', ' '),
+            StreamingElement('text', 'world', 1.6, 3.2, 0.8),
+            StreamingElement('punct', '.')
+        ]
+
+    def test_parse_partial_without_details(self):
+        partial = parse_streaming_response(PARTIAL)
+
+        assert isinstance(partial, StreamingPartial)
+        assert partial.elements == [StreamingElement('text', 'hello')]
+        assert partial.elements[0].timestamp is None
+        assert partial.elements[0].confidence is None
+
+    def test_partial_and_final_are_not_equal(self):
+        assert StreamingPartial.from_json(FINAL) != StreamingFinal.from_json(FINAL)
+
+    def test_to_dict_round_trips(self):
+        assert parse_streaming_response(FINAL).to_dict() == FINAL
+        assert parse_streaming_response(PARTIAL).to_dict() == PARTIAL
+
+    def test_unknown_type_is_returned_unchanged(self):
+        response = {'type': 'unknown', 'value': 1}
+
+        assert parse_streaming_response(response) is response
+
+    def test_uses_slots(self):
+        final = parse_streaming_response(FINAL)
+
+        assert not hasattr(final, '__dict__')
+        assert not hasattr(final.elements[0], '__dict__')
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""Socket level load tests of the streaming clients against a local server"""
+
+import asyncio
+import socket
+import threading
+import time
+import tracemalloc
+import pytest
+import websocket
+
+from src.rev_ai import streamingclient
+from src.rev_ai.asyncstreamingclient import AsyncRevAiStreamingClient
+from src.rev_ai.audio_sender import AudioSender
+from src.rev_ai.models.streaming import MediaConfig
+from src.rev_ai.streaming_metrics import MetricsRegistry, StreamingMetrics
+from src.rev_ai.streamingclient import RevAiStreamingClient
+from tests.helpers.streaming_server import StreamingServer
+
+# 32000 bytes per second
+CONFIG = MediaConfig('audio/x-raw', 'interleaved', 16000, 'S16LE', 1)
+
+
+def traced_sends(send, chunk_size, count):
+    """Sends count slices of a memoryview to a socket pair after a warm up, and returns the
+    memory allocated and the peak of the memory traced while sending them"""
+    view = memoryview(bytearray(range(256)) * (chunk_size * (count + 10) // 256 + 1))
+    ws = streamingclient._WebSocket(enable_multithread=True)
+    ws.sock, peer = socket.socketpair()
+    ws.connected = True
+
+    def drain():
+        sink = bytearray(65536)
+        while peer.recv_into(sink):
+            pass
+    drainer = threading.Thread(target=drain, daemon=True)
+    drainer.start()
+    try:
+        for index in range(10):
+            send(ws, view[index * chunk_size:(index + 1) * chunk_size])
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        for index in range(10, count + 10):
+            send(ws, view[index * chunk_size:(index + 1) * chunk_size])
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        ws.sock.close()
+        drainer.join()
+        peer.close()
+    return current - start, peak - start
+
+
+def make_client(server, closes=None):
+    client = RevAiStreamingClient(
+        'token', CONFIG, on_connected=lambda id_: None,
+        on_close=lambda code, reason: closes.append((code, reason)) if closes is not None
+        else None)
+    client.base_url = server.url
+    return client
+
+
+class TestStreamingLoad:
+    @pytest.mark.benchmark
+    def test_throughput_of_unpaced_audio(self, streaming_server, record_property):
+        server = streaming_server(partial_interval=0.05)
+        client = make_client(server)
+        chunk = b'\x01' * 3200
+
+        start = time.monotonic()
+        responses = list(client.start(iter([chunk] * 1000)))
+        client.request_thread.join()
+        elapsed = time.monotonic() - start
+        record_property('seconds to send 100 seconds of audio', round(elapsed, 3))
+
+        # 100 seconds of audio, which has to be sent much faster than real time
+        assert len(server.sessions[0].audio) == 3200 * 1000
+        assert elapsed < 20
+        assert responses[-1].startswith('{"type": "final"')
+
+    @pytest.mark.benchmark
+    def test_sender_pacing_sets_receive_rate(self, streaming_server):
+        server = streaming_server()
+        client = make_client(server)
+        sender = AudioSender(CONFIG, realtime=True, speedup=4)
+
+        list(client.start(iter([b'\x00' * 1600] * 40), sender=sender))
+        client.request_thread.join()
+
+        # 2 seconds of audio sent at 4 times real time
+        assert server.sessions[0].receive_rate == pytest.approx(4 * 32000, rel=0.25)
+
+    def test_hypotheses_are_sent_at_configured_rate(self, streaming_server):
+        server = streaming_server(partial_interval=0.05)
+        client = make_client(server)
+        sender = AudioSender(CONFIG, realtime=True, speedup=2)
+
+        # 1 second of audio streamed over half a second
+        responses = list(client.start(iter([b'\x00' * 3200] * 10), sender=sender))
+        client.request_thread.join()
+
+        partials = [r for r in responses if '"partial"' in r]
+        assert 5 <= len(partials) <= 12
+        assert server.sessions[0].partials == len(partials)
+
+    def test_hypothesis_latency_is_measured(self, streaming_server):
+        server = streaming_server(final_every=2, latency=0.05)
+        client = make_client(server)
+        metrics = StreamingMetrics(CONFIG)
+
+        list(client.start(iter([b'\x00' * 3200] * 6), metrics=metrics))
+        client.request_thread.join()
+
+        assert metrics.final_latency.count == 3
+        assert metrics.final_latency.min >= 0.05
+        assert metrics.partial_latency.min >= 0.05
+
+    @pytest.mark.parametrize('code, reason', [
+        (1000, 'End of input. Closing'),
+        (1011, 'Internal server error'),
+        (4002, 'Insufficient credits')])
+    def test_close_codes_and_reasons(self, streaming_server, code, reason):
+        server = streaming_server(close_code=code, close_reason=reason, latency=0.01)
+        closes = []
+        client = make_client(server, closes)
+
+        responses = list(client.start(iter([b'\x00' * 3200] * 2)))
+        client.request_thread.join()
+
+        assert len(responses) == 3
+        assert closes == [(code, reason)]
+
+    @pytest.mark.benchmark
+    def test_cpu_per_megabyte_of_framing(self, streaming_server, monkeypatch, record_property):
+        chunk = bytes(i % 251 for i in range(32000))
+        for name, socket_class in [('websocket-client', websocket.WebSocket),
+                                   ('framing', streamingclient._WebSocket)]:
+            monkeypatch.setattr(streamingclient, '_WebSocket', socket_class)
+            server = streaming_server()
+            client = make_client(server)
+
+            start = time.process_time()
+            list(client.start(iter([chunk] * 250)))
+            client.request_thread.join()
+            # 8 MB of audio, with the time the local server spent receiving it
+            record_property('{} CPU seconds per MB sent'.format(name),
+                            round((time.process_time() - start) / 8, 4))
+
+            assert bytes(server.sessions[0].audio[:32000]) == chunk
+            assert len(server.sessions[0].audio) == 32000 * 250
+
+    @pytest.mark.benchmark
+    def test_allocations_per_chunk_stay_constant(self, mask_backend, record_property):
+        chunk_size = 32000
+        results = {}
+        for count in (100, 1000):
+            results[count] = traced_sends(lambda ws, chunk: ws.send_binary(chunk),
+                                          chunk_size, count)
+        # websocket-client needs bytes, and allocates the frame and its masked payload
+        copied = traced_sends(lambda ws, chunk: websocket.WebSocket.send_binary(
+            ws, bytes(chunk)), chunk_size, 100)
+        for count, (allocated, peak) in sorted(results.items()):
+            record_property('{} chunks allocated, peak bytes'.format(count), (allocated, peak))
+        record_property('websocket-client with bytes, allocated, peak bytes', copied)
+
+        # only small objects are allocated, independent of the payload and chunk count
+        assert results[1000][1] < chunk_size // 4
+        assert results[1000][0] < 1024
+        assert copied[1] > chunk_size
+
+    def test_memoryviews_of_any_format_are_streamed(self, streaming_server):
+        server = streaming_server()
+        client = make_client(server)
+        samples = memoryview(bytearray(range(256)) * 100).cast('h')
+        metrics = StreamingMetrics(CONFIG)
+
+        chunks = [samples[index:index + 1600] for index in range(0, len(samples), 1600)]
+        list(client.start(iter(chunks), metrics=metrics, chunk_seconds=0.02))
+        client.request_thread.join()
+
+        assert bytes(server.sessions[0].audio) == samples.tobytes()
+        assert metrics.bytes_sent == len(samples) * 2
+
+    def test_many_concurrent_sync_sessions(self, streaming_server):
+        server = streaming_server(final_every=5)
+        registry = MetricsRegistry()
+        results = {}
+
+        def stream(index):
+            client = make_client(server)
+            metrics = StreamingMetrics(CONFIG, registry=registry)
+            audio = bytes([index]) * 3200
+            responses = list(client.start(iter([audio] * 10), metrics=metrics))
+            client.request_thread.join()
+            results[index] = responses
+        threads = [threading.Thread(target=stream, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(server.sessions) == 20
+        assert sorted(bytes(session.audio[:1])[0] for session in server.sessions) == \
+            list(range(20))
+        assert all(len(responses) == 12 for responses in results.values())
+        assert registry.sessions == 20
+        assert registry.final_latency.count == 40
+
+    def test_many_concurrent_async_sessions(self):
+        async def stream(server, index):
+            client = AsyncRevAiStreamingClient('token', CONFIG, on_connected=lambda id_: None,
+                                               on_close=lambda code, reason: None)
+            client.base_url = server.url
+            responses = await client.start([bytes([index]) * 3200] * 10)
+            return [r async for r in responses]
+
+        async def main():
+            server = await StreamingServer(partial_interval=0.01, latency=0.01).start()
+            try:
+                return server, await asyncio.gather(*[stream(server, i) for i in range(100)])
+            finally:
+                await server.stop()
+
+        server, results = asyncio.run(main())
+
+        assert len(server.sessions) == 100
+        assert all(len(session.audio) == 32000 for session in server.sessions)
+        assert all(responses[-1].startswith('{"type": "final"') for responses in results)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the streaming metrics"""
+
+import asyncio
+import pytest
+
+from src.rev_ai import streaming_metrics
+from src.rev_ai.asyncstreamingclient import AsyncRevAiStreamingClient
+from src.rev_ai.models.streaming import MediaConfig
+from src.rev_ai.streaming_metrics import Histogram, MetricsRegistry, StreamingMetrics
+from src.rev_ai.streaming_session_pool import StreamingSessionPool
+from src.rev_ai.streamingclient import RevAiStreamingClient
+from tests.helpers.streaming_server import StreamingServer
+
+# 32000 bytes per second
+CONFIG = MediaConfig('audio/x-raw', 'interleaved', 16000, 'S16LE', 1)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(streaming_metrics.time, 'monotonic', fake)
+    return fake
+
+
+class TestHistogram:
+    def test_record_and_quantile(self):
+        histogram = Histogram((0.1, 0.5, 1.0))
+        for value in (0.05, 0.2, 0.3, 0.7, 3.0):
+            histogram.record(value)
+
+        assert histogram.counts == [1, 2, 1, 1]
+        assert histogram.count == 5
+        assert histogram.min == 0.05
+        assert histogram.max == 3.0
+        assert histogram.mean == pytest.approx(0.85)
+        assert histogram.quantile(0.5) == 0.5
+        assert histogram.quantile(1) == 3.0
+        assert Histogram().quantile(0.5) is None
+
+    def test_merge(self):
+        first, second = Histogram((1.0,)), Histogram((1.0,))
+        first.record(0.5)
+        second.record(2.0)
+        second.record(0.1)
+
+        first.merge(second)
+
+        assert first.counts == [2, 1]
+        assert (first.min, first.max, first.count) == (0.1, 2.0, 3)
+        with pytest.raises(ValueError):
+            first.merge(Histogram((2.0,)))
+
+
+class TestStreamingMetrics:
+    def test_connect_time_and_latencies(self, clock):
+        observations = []
+        metrics = StreamingMetrics(CONFIG, on_metric=lambda m, name, value:
+                                   observations.append((name, round(value, 6))))
+
+        metrics.connecting(start_ts=10)
+        clock.now += 0.25
+        metrics.connected()
+        # three chunks of 0.1 seconds sent 0.1 seconds apart
+        for _ in range(3):
+            metrics.chunk_sent(3200, queue_depth=2)
+            clock.now += 0.1
+        # audio up to 10.15 was in the second chunk, sent 0.2 seconds ago
+        metrics.message_received({'type': 'partial', 'ts': 10, 'end_ts': 10.15})
+        clock.now += 0.1
+        metrics.message_received({'type': 'final', 'ts': 10, 'end_ts': 10.3})
+
+        assert metrics.connect_seconds == pytest.approx(0.25)
+        assert metrics.partial_latency.max == pytest.approx(0.2)
+        assert metrics.final_latency.max == pytest.approx(0.2)
+        assert metrics.bytes_sent == 9600
+        assert metrics.frames_sent == 3
+        assert metrics.max_queue_depth == 2
+        assert metrics.message_rate == pytest.approx(2 / 0.4)
+        assert observations == [('connect_seconds', 0.25), ('queue_depth', 2),
+                                ('queue_depth', 2), ('queue_depth', 2),
+                                ('partial_latency', 0.2), ('final_latency', 0.2)]
+
+    def test_latency_requires_raw_config(self, clock):
+        metrics = StreamingMetrics(MediaConfig('audio/*'))
+        metrics.connecting()
+        metrics.chunk_sent(100)
+
+        metrics.message_received({'type': 'final', 'ts': 0, 'end_ts': 1})
+
+        assert metrics.final_latency.count == 0
+        assert metrics.messages_received == 1
+
+    def test_registry_aggregates_sessions(self, clock):
+        registry = MetricsRegistry()
+        for latency in (0.1, 0.3):
+            metrics = StreamingMetrics(CONFIG, registry=registry)
+            metrics.connecting()
+            metrics.chunk_sent(3200)
+            clock.now += latency
+            metrics.message_received({'type': 'final', 'ts': 0, 'end_ts': 0.1})
+            metrics.closed()
+            metrics.closed()
+
+        assert registry.sessions == 2
+        assert registry.bytes_sent == 6400
+        assert registry.final_latency.count == 2
+        assert registry.to_dict()['final_latency']['sum'] == pytest.approx(0.4)
+
+
+class TestClientMetrics:
+    def test_streaming_client_records_metrics(self):
+        server = StreamingServer(final_every=2).start_in_thread()
+        client = RevAiStreamingClient('token', CONFIG, on_connected=lambda id_: None,
+                                      on_close=lambda code, reason: None)
+        client.base_url = server.url
+        registry = MetricsRegistry()
+        metrics = StreamingMetrics(CONFIG, registry=registry)
+        try:
+            list(client.start(iter([b'\x00' * 3200] * 4), metrics=metrics))
+            client.request_thread.join()
+        finally:
+            server.stop_thread()
+
+        assert metrics.connect_seconds is not None
+        assert metrics.frames_sent == 4
+        assert metrics.messages_received == 6
+        assert metrics.final_latency.count == 2
+        assert metrics.partial_latency.count == 4
+        assert registry.sessions == 1
+        assert registry.connect_seconds.count == 1
+
+    def test_pool_records_queue_depth(self):
+        registry = MetricsRegistry()
+
+        async def main():
+            server = StreamingServer(final_every=2)
+            await server.start()
+            pool = StreamingSessionPool('token')
+            pool.base_url = server.url
+            try:
+                sessions = []
+                for _ in range(3):
+                    session = await pool.open(CONFIG, lambda session, response: None,
+                                              metrics=StreamingMetrics(CONFIG, registry=registry))
+                    for _ in range(4):
+                        await session.send(b'\x00' * 3200)
+                    sessions.append(session)
+                await asyncio.gather(*[session.finish() for session in sessions])
+                return sessions
+            finally:
+                await server.stop()
+
+        sessions = asyncio.run(main())
+
+        assert registry.sessions == 3
+        assert registry.final_latency.count == 6
+        assert registry.frames_sent == 12
+        assert all(session.metrics.max_queue_depth >= 1 for session in sessions)
+
+    def test_async_client_records_metrics(self):
+        metrics = StreamingMetrics(CONFIG)
+
+        async def main():
+            server = StreamingServer()
+            await server.start()
+            client = AsyncRevAiStreamingClient('token', CONFIG, on_connected=lambda id_: None,
+                                               on_close=lambda code, reason: None)
+            client.base_url = server.url
+            try:
+                responses = await client.start([b'\x00' * 3200] * 2, metrics=metrics)
+                return [response async for response in responses]
+            finally:
+                await server.stop()
+
+        asyncio.run(main())
+
+        assert metrics.bytes_sent == 6400
+        assert metrics.messages_received == 3
+        assert metrics.closed_at is not None
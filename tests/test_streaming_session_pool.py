@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the streaming session pool"""
+
+import asyncio
+import threading
+import time
+import pytest
+
+from src.rev_ai.models.streaming import MediaConfig, StreamingFinal
+from src.rev_ai.streaming_session_pool import BandwidthLimiter, StreamingSessionPool
+from tests.helpers.streaming_server import StreamingServer
+
+CONFIG = MediaConfig('audio/x-raw', 'interleaved', 16000, 'S16LE', 1)
+
+
+def run_with_server(test, **server_options):
+    async def main():
+        server = StreamingServer(**server_options)
+        await server.start()
+        try:
+            return await test(server)
+        finally:
+            await server.stop()
+    return asyncio.run(main())
+
+
+def make_pool(server, **kwargs):
+    pool = StreamingSessionPool('token', **kwargs)
+    pool.base_url = server.url
+    return pool
+
+
+class TestStreamingSessionPool:
+    def test_constructor_validation(self):
+        with pytest.raises(ValueError):
+            StreamingSessionPool(None)
+        with pytest.raises(ValueError):
+            StreamingSessionPool('token', max_sessions=0)
+        with pytest.raises(ValueError):
+            BandwidthLimiter(0)
+
+    def test_runs_many_sessions_with_their_own_callbacks(self):
+        responses = {}
+
+        async def test(server):
+            async with make_pool(server) as pool:
+                sessions = []
+                for i in range(20):
+                    responses[i] = []
+                    session = await pool.open(
+                        CONFIG, lambda session, response, i=i: responses[i].append(response),
+                        parsed=True, metadata='call{}'.format(i))
+                    sessions.append(session)
+                for i, session in enumerate(sessions):
+                    for _ in range(3):
+                        await session.send(bytes([i]) * 320)
+                await asyncio.gather(*[session.finish() for session in sessions])
+            return sessions
+
+        sessions = run_with_server(test)
+
+        for i, session in enumerate(sessions):
+            assert len(responses[i]) == 4
+            assert isinstance(responses[i][-1], StreamingFinal)
+            assert session.job_id.startswith('testid')
+            assert session.bytes_sent == 960
+            assert session.close_code == 1000
+            assert session.closed
+
+    def test_audio_reaches_the_right_session(self):
+        async def test(server):
+            pool = make_pool(server)
+            first = await pool.open(CONFIG, lambda session, response: None, metadata='first')
+            second = await pool.open(CONFIG, lambda session, response: None, metadata='second')
+            await second.send(b'b' * 10)
+            await first.send(b'a' * 10)
+            await first.finish()
+            await second.finish()
+            return {s.query['metadata']: bytes(s.audio) for s in server.sessions}
+
+        assert run_with_server(test) == {'first': b'a' * 10, 'second': b'b' * 10}
+
+    def test_max_sessions_waits_for_a_session_to_end(self):
+        async def test(server):
+            pool = make_pool(server, max_sessions=2)
+            first = await pool.open(CONFIG, lambda session, response: None)
+            await pool.open(CONFIG, lambda session, response: None)
+
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(pool.open(CONFIG, lambda session, response: None), 0.05)
+            assert pool.active_sessions == 2
+
+            await first.finish()
+            third = await asyncio.wait_for(pool.open(CONFIG, lambda s, r: None), 1)
+            assert pool.active_sessions == 2
+            await pool.close()
+            assert pool.active_sessions == 0
+            return third
+
+        assert run_with_server(test).closed
+
+    def test_bandwidth_is_shared_by_all_sessions(self):
+        async def test(server):
+            pool = make_pool(server, max_bytes_per_second=256000)
+            sessions = [await pool.open(CONFIG, lambda session, response: None)
+                        for _ in range(4)]
+            start = time.monotonic()
+            for session in sessions:
+                for _ in range(4):
+                    await session.send(b'\x00' * 3200)
+            await asyncio.gather(*[session.finish() for session in sessions])
+            return time.monotonic() - start
+
+        # 51200 bytes, of which 25600 can be sent at once
+        assert run_with_server(test) >= 0.09
+
+    def test_async_callbacks_and_threadsafe_sends(self):
+        responses = []
+
+        async def on_response(session, response):
+            await asyncio.sleep(0)
+            responses.append(response)
+
+        async def test(server):
+            pool = make_pool(server)
+            session = await pool.open(CONFIG, on_response)
+            producer = threading.Thread(target=lambda: [
+                session.send_threadsafe(b'\x00' * 100).result() for _ in range(5)])
+            producer.start()
+            await asyncio.get_running_loop().run_in_executor(None, producer.join)
+            await session.finish()
+            return session
+
+        session = run_with_server(test)
+
+        assert len(responses) == 6
+        assert session.bytes_sent == 500
+
+    def test_send_after_session_ended_raises(self):
+        async def test(server):
+            pool = make_pool(server)
+            session = await pool.open(CONFIG, lambda session, response: None)
+            await session.finish()
+            with pytest.raises(ConnectionError):
+                await session.send(b'\x00')
+
+        run_with_server(test)
+
+    def test_prewarmed_connections_are_handed_out(self):
+        responses = []
+
+        async def test(server):
+            async with make_pool(server) as pool:
+                assert await pool.prewarm(CONFIG, count=2, language='en') == 2
+                assert len(server.sessions) == 2
+
+                session = await pool.open(CONFIG, lambda s, r: responses.append(r),
+                                          parsed=True, language='en', chunk_seconds=0.01)
+                # the warm connection was handed out without connecting to the server again
+                connections = len(server.sessions)
+                await session.send(b'\x00' * 640)
+                await session.finish()
+                cold = await pool.open(CONFIG, lambda s, r: None, language='es')
+                await cold.finish()
+                # the connection handed out is replaced in the background
+                while pool.warm_connections < 2:
+                    await asyncio.sleep(0.01)
+                warm_sessions = len(server.sessions)
+            return session, connections, warm_sessions, pool
+
+        session, connections, warm_sessions, pool = run_with_server(test, connect_latency=0.1)
+
+        assert connections == 2
+        assert session.warm and session.job_id in ('testid', 'testid2')
+        assert isinstance(responses[-1], StreamingFinal)
+        assert warm_sessions == 4
+        assert pool.warm_connections == 0
+
+    def test_idle_warm_connections_are_not_handed_out(self):
+        async def test(server):
+            pool = make_pool(server)
+            await pool.prewarm(CONFIG, max_idle=0)
+            session = await pool.open(CONFIG, lambda s, r: None)
+            await session.finish()
+            await pool.close()
+            return session
+
+        session = run_with_server(test)
+
+        assert not session.warm
+        assert session.close_code == 1000
+
+    def test_warm_connections_closed_by_the_server_are_dropped(self):
+        async def test(server):
+            pool = make_pool(server)
+            await pool.prewarm(CONFIG, count=2)
+            assert pool.warm_connections == 2
+            await asyncio.sleep(0.3)
+            warm = pool.warm_connections
+            session = await pool.open(CONFIG, lambda s, r: None)
+            await session.send(b'\x00' * 640)
+            await session.finish()
+            await pool.close()
+            return warm, session
+
+        warm, session = run_with_server(test, idle_timeout=0.1)
+
+        assert warm == 0
+        assert not session.warm
+        assert session.close_code == 1000 and session.error is None
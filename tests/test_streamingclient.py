@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
 """Unit tests for the streaming client"""
 
+import threading
+import time
+import wave
 import pytest
 import six
 from src.rev_ai import __version__
-from src.rev_ai.models.streaming import MediaConfig
+from src.rev_ai.models.streaming import MediaConfig, StreamingElement, StreamingFinal, \
+    StreamingPartial
+from src.rev_ai.audio_sender import AudioSender
+from src.rev_ai.streaming_metrics import StreamingMetrics
 from src.rev_ai.streamingclient import RevAiStreamingClient
 
 try:
@@ -84,6 +90,24 @@ class TestStreamingClient():
             assert exp_responses[ind + 1] == response
         assert capsys.readouterr().out == exp_responses[2]
 
+    def test_start_parsed_yields_hypotheses(self, mock_streaming_client, mock_generator):
+        example_partial = b'{"type":"partial","ts":0.5,"end_ts":1.0,' \
+            b'"elements":[{"type":"text","value":"Test"}]}'
+        example_final = b'{"type":"final","ts":0.5,"end_ts":1.2,' \
+            b'"elements":[{"type":"text","value":"Test","ts":0.5,"end_ts":1.2,"confidence":0.9}]}'
+        data = [[0x1, b'{"type":"connected","id":"testid"}'],
+                [0x1, example_partial],
+                [0x1, example_final],
+                [0x8, b'\x03\xe8End of input. Closing']]
+        mock_streaming_client.client.recv_data.side_effect = data
+
+        responses = list(mock_streaming_client.start(mock_generator(), parsed=True))
+
+        assert responses == [
+            StreamingPartial(0.5, 1.0, [StreamingElement('text', 'Test')]),
+            StreamingFinal(0.5, 1.2, [StreamingElement('text', 'Test', 0.5, 1.2, 0.9)])
+        ]
+
     @pytest.mark.parametrize("metadata", ["my metadata"])
     @pytest.mark.parametrize("custom_vocabulary_id", ["customvocabid"])
     @pytest.mark.parametrize("filter_profanity", [True])
@@ -190,3 +214,261 @@ def validate_query_parameters(called_url, expected_query_dict):
     called_query_parameters = parse_qs(called_query_string)
     for key in expected_query_dict:
         assert called_query_parameters[key][0] == expected_query_dict[key]
+
+
+RAW_CONFIG = MediaConfig('audio/x-raw', 'interleaved', 16000, 'S16LE', 1)
+
+
+def make_connected_client(server, errors=None, **options):
+    connected = []
+    client = RevAiStreamingClient('token', RAW_CONFIG, on_connected=connected.append,
+                                  on_error=errors.append if errors is not None else None,
+                                  on_close=lambda code, reason: None)
+    client.base_url = server.url
+    job_id = client.connect(**options)
+    return client, job_id, connected
+
+
+class TestStreamingClientConnect:
+    def test_connect_waits_for_connected_message(self, streaming_server):
+        server = streaming_server(connect_latency=0.1)
+        metrics = StreamingMetrics(RAW_CONFIG)
+
+        client, job_id, connected = make_connected_client(server, metadata='meta',
+                                                          metrics=metrics)
+
+        # the job id only arrives with the connected message
+        assert job_id == 'testid'
+        assert connected == ['testid']
+        assert metrics.connect_seconds >= 0.1
+        assert server.sessions[0].query['metadata'] == 'meta'
+
+        responses = list(client.stream(iter([b'\x01' * 3200] * 2)))
+        client.request_thread.join()
+
+        assert len(responses) == 3
+        assert responses[-1].startswith('{"type": "final"')
+        assert connected == ['testid']
+        assert len(server.sessions[0].audio) == 6400
+
+    def test_audio_captured_while_connecting_is_sent(self, streaming_server):
+        server = streaming_server(connect_latency=0.1)
+        captured = threading.Event()
+
+        def microphone():
+            for i in range(5):
+                yield bytes([i]) * 320
+            captured.set()
+
+        client, _, _ = make_connected_client(server, generator=microphone())
+
+        assert captured.is_set()
+        responses = list(client.stream(parsed=True))
+        client.request_thread.join()
+
+        assert bytes(server.sessions[0].audio) == b''.join(bytes([i]) * 320 for i in range(5))
+        assert isinstance(responses[-1], StreamingFinal)
+
+    def test_stream_requires_connect_and_audio(self, streaming_server):
+        with pytest.raises(ValueError):
+            RevAiStreamingClient('token', RAW_CONFIG).stream(iter([b'']))
+
+        client, _, _ = make_connected_client(streaming_server())
+        with pytest.raises(ValueError):
+            client.stream()
+        client.end()
+
+        client, _, _ = make_connected_client(streaming_server(), generator=iter([b'']))
+        with pytest.raises(ValueError):
+            client.stream(iter([b'']))
+        client.end()
+
+    def test_stream_needs_a_new_connect_for_every_session(self, streaming_server):
+        server = streaming_server()
+        client, _, _ = make_connected_client(server)
+        list(client.stream(iter([b'\x01' * 3200])))
+        client.request_thread.join()
+
+        with pytest.raises(ValueError):
+            client.stream(iter([b'\x01' * 3200]))
+        client.connect()
+        client.end()
+        with pytest.raises(ValueError):
+            client.stream(iter([b'\x01' * 3200]))
+        list(client.start(iter([b'\x01' * 3200])))
+        client.request_thread.join()
+        with pytest.raises(ValueError):
+            client.stream(iter([b'\x01' * 3200]))
+        assert len(server.sessions) == 3
+
+    def test_connect_reports_errors(self, streaming_server):
+        errors = []
+        server = streaming_server(connect_latency=1)
+
+        _, job_id, connected = make_connected_client(server, errors, timeout=0.1)
+
+        assert job_id is None
+        assert connected == []
+        assert len(errors) == 1
+
+    def test_failed_connect_stops_reading_the_generator(self, streaming_server):
+        errors = []
+        feeding = []
+
+        def microphone():
+            feeding.append(threading.current_thread())
+            while True:
+                time.sleep(0.001)
+                yield b'\x01' * 320
+
+        client, job_id, _ = make_connected_client(streaming_server(connect_latency=1), errors,
+                                                  generator=microphone(), max_buffered_chunks=2,
+                                                  timeout=0.1)
+
+        assert job_id is None
+        assert len(errors) == 1
+        feeding[0].join(1)
+        assert not feeding[0].is_alive()
+        with pytest.raises(ValueError):
+            client.stream()
+
+
+def microphone(interval=0.005, size=320):
+    """Endless audio source producing a chunk every interval"""
+    while True:
+        time.sleep(interval)
+        yield b'\x01' * size
+
+
+def streaming_client(server):
+    client = RevAiStreamingClient('token', RAW_CONFIG, on_connected=lambda job_id: None,
+                                  on_close=lambda code, reason: None)
+    client.base_url = server.url
+    return client
+
+
+class TestStreamingClientFinish:
+    def test_finish_drains_the_last_final(self, streaming_server):
+        server = streaming_server(final_every=5)
+        client = streaming_client(server)
+
+        for response in client.start(microphone()):
+            if '"final"' in response:
+                break
+        report = client.finish(timeout=5)
+
+        assert report.closed and report.eos_sent
+        assert report.responses[-1].startswith('{"type": "final"')
+        assert report.unfinalized_seconds == 0
+        assert report.seconds_sent == len(server.sessions[0].audio) / 32000.0
+        assert server.sessions[0].received_eos
+        assert not client.request_thread.is_alive()
+
+    def test_finish_sends_the_audio_queued(self, streaming_server):
+        server = streaming_server(final_every=5)
+        client = streaming_client(server)
+        sender = AudioSender(RAW_CONFIG, realtime=True, speedup=20)
+        responses = client.start(microphone(interval=0.001, size=3200), sender=sender,
+                                 parsed=True)
+        next(responses)
+
+        report = client.finish(timeout=5)
+
+        assert report.closed and report.eos_sent
+        assert sender.queue_depth == 0
+        assert report.seconds_sent == sender.seconds_sent
+        assert report.unfinalized_seconds == 0
+        assert isinstance(report.responses[-1], StreamingFinal)
+
+    def test_finish_after_an_interrupted_receive(self, streaming_server):
+        server = streaming_server(final_every=5)
+        client = streaming_client(server)
+        responses = client.start(microphone())
+        next(responses)
+        recv_data = client.client.recv_data
+
+        def interrupted():
+            client.client.recv_data = recv_data
+            raise KeyboardInterrupt()
+        client.client.recv_data = interrupted
+        with pytest.raises(KeyboardInterrupt):
+            for _ in responses:
+                pass
+        report = client.finish(timeout=5)
+
+        assert report.closed and report.eos_sent
+        assert report.responses[-1].startswith('{"type": "final"')
+        assert report.unfinalized_seconds == 0
+        assert server.sessions[0].received_eos
+
+    def test_finish_gives_up_at_the_deadline(self, streaming_server):
+        server = streaming_server(final_every=2, latency=1)
+        client = streaming_client(server)
+        client.start(microphone(size=3200))
+        time.sleep(0.1)
+
+        report = client.finish(timeout=0.2)
+
+        # the server answers a second late, so the session was ended before it closed
+        assert not report.closed
+        assert report.responses == []
+        assert report.unfinalized_seconds == report.seconds_sent > 0
+        client.request_thread.join(1)
+        assert not client.request_thread.is_alive()
+
+
+class TestStreamingClientStreamFile:
+    def test_wav_file_is_paced_and_transcribed(self, streaming_server, tmp_path, pacing_clock):
+        server = streaming_server(final_every=5)
+        client = streaming_client(server)
+        path = str(tmp_path / 'call.wav')
+        with wave.open(path, 'wb') as writer:
+            writer.setnchannels(2)
+            writer.setsampwidth(2)
+            writer.setframerate(8000)
+            writer.writeframes(b'\x01\x02' * 16000)
+        hypotheses = []
+
+        transcript = client.stream_file(path, speedup=10, on_response=hypotheses.append,
+                                        metadata='meta')
+
+        # 10 chunks of 0.1 seconds, each one after the first sent 0.01 seconds later
+        assert pacing_clock.sleeps == pytest.approx([0.01] * 9)
+        session = server.sessions[0]
+        assert session.query['content_type'] == \
+            'audio/x-raw;layout=interleaved;rate=8000;format=S16LE;channels=2'
+        assert session.query['metadata'] == 'meta'
+        assert bytes(session.audio) == b'\x01\x02' * 16000
+        assert session.binary_messages == 10
+        assert [(e.value, e.timestamp, e.end_timestamp)
+                for e in transcript.monologues[0].elements] == \
+            [('final1', 0, 0.5), ('final2', 0.5, 1.0)]
+        assert sum(isinstance(h, StreamingFinal) for h in hypotheses) == 2
+        assert sum(isinstance(h, StreamingPartial) for h in hypotheses) == 10
+        assert not client.request_thread.is_alive()
+
+    def test_raw_file_can_be_sent_unpaced(self, streaming_server, tmp_path, pacing_clock):
+        server = streaming_server(final_every=4)
+        client = streaming_client(server)
+        path = tmp_path / 'call.raw'
+        path.write_bytes(b'\x01' * 64000)
+
+        transcript = client.stream_file(str(path), speedup=None, config=RAW_CONFIG,
+                                        chunk_seconds=0.25)
+
+        assert pacing_clock.sleeps == []
+        assert len(server.sessions[0].audio) == 64000
+        assert [e.value for e in transcript.monologues[0].elements] == ['final1', 'final2']
+        with pytest.raises(ValueError):
+            client.stream_file(str(path))
+
+    @pytest.mark.parametrize('speedup', [0, -1])
+    def test_speedup_must_be_positive(self, streaming_server, tmp_path, speedup):
+        server = streaming_server()
+        client = streaming_client(server)
+        path = tmp_path / 'call.raw'
+        path.write_bytes(b'\x01' * 3200)
+
+        with pytest.raises(ValueError):
+            client.stream_file(str(path), speedup=speedup, config=RAW_CONFIG)
+        assert server.sessions == []
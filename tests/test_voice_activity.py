@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for voice activity gating"""
+
+import asyncio
+import json
+import math
+import struct
+import pytest
+
+from src.rev_ai.asyncstreamingclient import AsyncRevAiStreamingClient
+from src.rev_ai.models.streaming import MediaConfig
+from src.rev_ai.voice_activity import VoiceActivityGate
+from tests.helpers.streaming_server import StreamingServer
+
+RATE = 8000
+S16 = MediaConfig('audio/x-raw', 'interleaved', RATE, 'S16LE', 1)
+F32 = MediaConfig('audio/x-raw', 'interleaved', RATE, 'F32LE', 1)
+
+
+def make_audio(sections, audio_format='S16LE'):
+    """Returns mono audio of (seconds, is_tone) sections"""
+    samples = []
+    for seconds, is_tone in sections:
+        for i in range(int(seconds * RATE)):
+            samples.append(0.5 * math.sin(2 * math.pi * 440 * i / RATE) if is_tone else 0.0)
+    if audio_format == 'F32LE':
+        return struct.pack('<{}f'.format(len(samples)), *samples)
+    return struct.pack('<{}h'.format(len(samples)), *[int(s * 32767) for s in samples])
+
+
+def chunks(data, size=1600):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestVoiceActivityGate:
+    def test_constructor_validation(self):
+        with pytest.raises(ValueError, match='format'):
+            VoiceActivityGate(MediaConfig('audio/x-raw', 'interleaved', RATE, 'MULAW', 1))
+        with pytest.raises(ValueError):
+            VoiceActivityGate(MediaConfig('audio/x-raw', 'interleaved', None, 'S16LE', 1))
+        with pytest.raises(ValueError):
+            VoiceActivityGate(S16, keep_alive_seconds=0)
+
+    @pytest.mark.parametrize('config', [S16, F32], ids=['S16LE', 'F32LE'])
+    def test_long_silence_is_reduced_to_keep_alive_frames(self, energy_backend, config):
+        gate = VoiceActivityGate(config, hangover_seconds=0.5, pre_roll_seconds=0.2,
+                                 keep_alive_seconds=1.0)
+        data = make_audio([(1, True), (10, False), (1, True)], config.format)
+
+        sent = b''.join(gate.gate(chunks(data)))
+
+        bytes_per_second = RATE * config.get_sample_width()
+        # 1s of speech, 0.5s of hangover, ~9 keep-alive frames, 0.2s of pre-roll, 1s of speech
+        assert len(sent) < 3 * bytes_per_second
+        assert len(sent) > 2.7 * bytes_per_second
+        assert gate.bytes_in == len(data)
+        assert gate.bytes_saved == len(data) - len(sent)
+
+    def test_offset_map_restores_original_times(self, energy_backend):
+        gate = VoiceActivityGate(S16, hangover_seconds=0.5, pre_roll_seconds=0.2,
+                                 keep_alive_seconds=1.0)
+        sent = b''.join(gate.gate(chunks(make_audio([(1, True), (10, False), (1, True)]))))
+        sent_seconds = len(sent) / (2.0 * RATE)
+
+        # the end of the audio sent is the end of the original audio
+        assert gate.offset_map.to_original(sent_seconds, is_end=True) == pytest.approx(12)
+        # speech resumes 11 seconds into the original audio, after the pre-roll
+        onset = sent_seconds - 1
+        assert gate.offset_map.to_original(onset) == pytest.approx(11)
+        assert gate.offset_map.to_original(onset - 0.2) == pytest.approx(10.8)
+        assert gate.offset_map.to_original(0.5) == pytest.approx(0.5)
+
+    def test_speech_is_sent_unchanged(self, energy_backend):
+        gate = VoiceActivityGate(S16)
+        data = make_audio([(2, True)])
+
+        assert b''.join(gate.gate(chunks(data, 999))) == data
+        # 2 seconds are gated in several blocks of frames
+        assert b''.join(VoiceActivityGate(S16).gate([data])) == data
+        assert gate.offset_map.segments == [(0.0, 0.0)]
+
+    def test_remap_hypothesis(self):
+        gate = VoiceActivityGate(S16)
+        gate.offset_map.append(0.0, 0.0)
+        gate.offset_map.append(1.0, 5.0)
+        hypothesis = {'type': 'final', 'ts': 10.5, 'end_ts': 11.5, 'elements': [
+            {'type': 'text', 'value': 'a', 'ts': 10.5, 'end_ts': 11.0, 'confidence': 1},
+            {'type': 'punct', 'value': '.'}]}
+
+        remapped = gate.remap_hypothesis(hypothesis, start_ts=10)
+
+        assert remapped['ts'] == 10.5
+        assert remapped['end_ts'] == 15.5
+        assert remapped['elements'][0]['end_ts'] == 10.0 + 1.0
+        assert remapped['elements'][1] == {'type': 'punct', 'value': '.'}
+        assert hypothesis['end_ts'] == 11.5
+
+    def test_async_client_gates_audio_and_remaps_timestamps(self):
+        gate = VoiceActivityGate(S16, hangover_seconds=0.2, pre_roll_seconds=0,
+                                 keep_alive_seconds=100)
+        data = make_audio([(0.5, True), (5, False), (0.5, True)])
+
+        async def main():
+            server = StreamingServer(final_every=1000, bytes_per_second=2 * RATE)
+            await server.start()
+            client = AsyncRevAiStreamingClient('token', S16, on_connected=lambda id_: None,
+                                               on_close=lambda code, reason: None)
+            client.base_url = server.url
+            try:
+                responses = await client.start(chunks(data), vad=gate)
+                return server, [json.loads(r) for r in [r async for r in responses]]
+            finally:
+                await server.stop()
+
+        server, responses = asyncio.run(main())
+
+        assert len(server.sessions[0].audio) < len(data) / 4
+        final = responses[-1]
+        assert final['type'] == 'final'
+        assert final['end_ts'] == pytest.approx(6)